@@ -0,0 +1,67 @@
+"""Benchmark the overhead of evaluating within a budget.
+
+Run from the repository root with:
+
+    PYTHONPATH=. python bench/bench_budgets.py [N]
+
+Times a recursive fib of N in the interpreter and a counting loop in
+compiled code, each without a budget and then within one too generous to
+run out, and prints how much slower the budget made them.
+
+The compiled loop is the worst case, since its iterations do so little
+that even counting them off a range is a large part of the work. Timings
+on a busy machine vary a lot, so run it a few times.
+"""
+
+import sys
+import time
+
+import wisp.budgets as budgets
+import wisp.jit as jit
+import wisp.parser as parser
+import wisp.prelude as prelude
+
+FIB = """(((((((2 n -) fib) ((1 n -) fib) +) else)
+           (1 (1 n eq?)) (0 (0 n eq?)) cond) (n) lambda) fib define)"""
+
+COUNT = """(((((((1 i +) recur) else) (i (n i eq?)) cond)
+             ((0 i)) loop) (n) lambda) count define)"""
+
+REPEATS = 7
+
+
+def best(form, env, **limits):
+    """Return the best time of evaluating the form, within any limits."""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        if limits:
+            budgets.evaluate(form, env, **limits)
+        else:
+            form.eval(env)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def compare(name, definition, call):
+    """Print the time of a call without and within a budget."""
+    env = prelude.env()
+    parser.read(' '.join(definition.split())).eval(env)
+    form = parser.read(call)
+    form.eval(env)
+    free = best(form, env)
+    limited = best(form, env, steps=10 ** 12, depth=10 ** 6, seconds=3600)
+    print('%-12s %8.3fs %8.3fs %+7.1f%%' % (
+        name, free, limited, (limited / free - 1) * 100))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 18
+    print('%-12s %9s %9s %8s' % ('', 'free', 'budget', 'overhead'))
+    compare('compiled', COUNT, '(%d count)' % (20000 * n))
+    jit.enabled = False
+    compare('interpreted', FIB, '(%d fib)' % n)
+
+
+if __name__ == '__main__':
+    main()
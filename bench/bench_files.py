@@ -0,0 +1,64 @@
+"""Benchmark reading lines through open-lines against plain python.
+
+Run from the repository root with:
+
+    PYTHONPATH=. python bench/bench_files.py [LINES]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import wisp.files as files
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+
+def plain_python(path):
+    """Count lines with a plain python loop over the file."""
+    count = 0
+    with open(path) as f:
+        for _ in f:
+            count += 1
+    return count
+
+
+def iter_lines(path):
+    """Count lines with the memory-mapped line iterator."""
+    count = 0
+    for _ in files.iter_lines(path):
+        count += 1
+    return count
+
+
+def open_lines(path):
+    """Count lines by walking the lazy sequence returned by open-lines."""
+    env = prelude.env()
+    lines = env[wtypes.Symbol('open-lines')].call([wtypes.String(path)], env)
+    count = 0
+    for _ in wtypes.iterate(lines):
+        count += 1
+    return count
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for i in range(n):
+                f.write('%d some log line of moderate length\n' % i)
+
+        for bench in (plain_python, iter_lines, open_lines):
+            start = time.perf_counter()
+            count = bench(path)
+            elapsed = time.perf_counter() - start
+            assert count == n
+            print('%-14s %12.0f lines/s' % (bench.__name__, n / elapsed))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
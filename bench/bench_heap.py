@@ -0,0 +1,73 @@
+"""Benchmark attaching to a heap against decoding a serialized copy.
+
+Run from the repository root with:
+
+    PYTHONPATH=. python bench/bench_heap.py [LENGTH]
+
+Each approach loads a vector of LENGTH integers and a list of a thousand
+symbols, and looks up the vector's length. Memory is what tracemalloc
+saw allocated while loading, which excludes the mapped pages the
+operating system shares between every process attached to the heap.
+"""
+
+import array
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import wisp.heap as heap
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.serialize as serialize
+import wisp.wtypes as wtypes
+
+
+def measure(load):
+    """Return the seconds and bytes taken loading the data."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    env = load()
+    parser.read('(v length)').eval(env)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    bindings = [
+        ('v', wtypes.Vector(array.array('q', range(n)))),
+        ('names', wtypes.List([wtypes.Symbol('s%d' % i)
+                               for i in range(1000)])),
+    ]
+    f = io.BytesIO()
+    serialize.dump_stream((val for _, val in bindings), f)
+    encoded = f.getvalue()
+
+    def decode():
+        env = prelude.env()
+        for (name, _), val in zip(bindings, serialize.Decoder(encoded)):
+            env.add_binding(wtypes.Symbol(name), val)
+        return env
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'data.heap')
+        heap.write(path, bindings)
+
+        def attach():
+            env = prelude.env()
+            env.heap = heap.Heap(path)
+            return env
+
+        print('%-8s %10s %12s' % ('load', 'seconds', 'bytes'))
+        for name, load in [('decode', decode), ('heap', attach)]:
+            seconds, size = measure(load)
+            print('%-8s %10.4f %12d' % (name, seconds, size))
+
+
+if __name__ == '__main__':
+    main()
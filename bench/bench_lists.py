@@ -0,0 +1,69 @@
+"""Benchmark the native list builtins against recursive wisp versions.
+
+Run from the repository root with:
+
+    PYTHONPATH=. python bench/bench_lists.py [LENGTH]
+
+The wisp versions recurse once per element, so the recursion limit is
+raised to let them get through long lists.
+"""
+
+import sys
+import time
+
+import wisp.parser as parser
+import wisp.prelude as prelude
+
+DEFINITIONS = [
+    """(((((((xs cdr) f my-map) ((xs car) f) cons) else)
+         (() (() xs eq?)) cond) (f xs) lambda) my-map define)""",
+    """((((((xs cdr) p my-filter) else)
+         ((((xs cdr) p my-filter) (xs car) cons) ((xs car) p))
+         (() (() xs eq?)) cond) (p xs) lambda) my-filter define)""",
+    """((((((xs cdr) ((xs car) acc f) f my-reduce) else)
+        (acc (() xs eq?)) cond) (f acc xs) lambda) my-reduce define)""",
+    """(((x 1 +) (x) lambda) inc define)""",
+    """(((0 (((2 x /) 2 *) x -) eq?) (x) lambda) even? define)""",
+]
+
+CALLS = [
+    ('map', '(xs inc map)', '(xs inc my-map)'),
+    ('filter', '(xs even? filter)', '(xs even? my-filter)'),
+    ('reduce', '(xs 0 + reduce)', '(xs 0 + my-reduce)'),
+]
+
+REPEATS = 3
+
+
+def best(source, env):
+    """Return the best time of evaluating the source."""
+    form = parser.read(source)
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        form.eval(env)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100 * n))
+    env = prelude.env()
+    for definition in DEFINITIONS:
+        parser.read(' '.join(definition.split())).eval(env)
+    parser.read('(((%s) quote) xs define)' % ' '.join(
+        map(str, range(n)))).eval(env)
+
+    print('%-8s %9s %9s %8s' % ('', 'native', 'wisp', 'speedup'))
+    for name, native, recursive in CALLS:
+        assert parser.read(native).eval(env) == \
+            parser.read(recursive).eval(env)
+        native_time = best(native, env)
+        recursive_time = best(recursive, env)
+        print('%-8s %8.4fs %8.4fs %7.1fx' % (
+            name, native_time, recursive_time, recursive_time / native_time))
+
+
+if __name__ == '__main__':
+    main()
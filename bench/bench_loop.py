@@ -0,0 +1,45 @@
+"""Benchmark a counting loop written with loop/recur.
+
+Run from the repository root with:
+
+    PYTHONPATH=. python bench/bench_loop.py [ITERATIONS]
+
+The interpreted loop is much slower, so is timed over a thousandth of the
+iterations and scaled up.
+"""
+
+import sys
+import time
+
+import wisp.jit as jit
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+COUNT = """(((((((1 i +) recur) else) (i (n i eq?)) cond)
+             ((0 i)) loop) (n) lambda) count define)"""
+
+
+def run(source, env):
+    """Parse and evaluate the given source in the environment."""
+    return parser.parse_expr.parse_strict(' '.join(source.split())).eval(env)
+
+
+def count(n):
+    """Time counting up to n with a loop."""
+    env = prelude.env()
+    run(COUNT, env)
+    start = time.perf_counter()
+    assert run('(%d count)' % n, env) == wtypes.Integer(n)
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    print('%-12s %8.2fs' % ('compiled', count(n)))
+    jit.enabled = False
+    print('%-12s %8.2fs' % ('interpreted', count(n // 1000) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark parsing a large source file across worker processes.
+
+Run from the repository root with:
+
+    PYTHONPATH=. python bench/bench_sources.py [FORMS]
+"""
+
+import os
+import sys
+import time
+
+import wisp.sources as sources
+
+WORKERS = (1, 2, 4, 8)
+
+
+def generate(n):
+    """Generate source text of n definitions, as in a rule bundle."""
+    return '\n'.join(
+        '((((x %d +) (x %d *) -) (x) lambda) rule%d define)'
+        % (i, i, i) for i in range(n)
+    )
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    text = generate(n)
+
+    start = time.perf_counter()
+    forms = sources.split_forms(text)
+    elapsed = time.perf_counter() - start
+    assert len(forms) == n
+    print('%-10s %12.0f forms/s' % ('scan', n / elapsed))
+
+    expected = None
+    for workers in WORKERS:
+        start = time.perf_counter()
+        parsed = sources.read_forms(text, workers)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = parsed
+        assert parsed == expected
+        print('%-10s %12.0f forms/s' % (
+            '%d worker%s' % (workers, 's' if workers > 1 else ''),
+            n / elapsed))
+    print('(%d cpus available)' % os.cpu_count())
+
+
+if __name__ == '__main__':
+    main()
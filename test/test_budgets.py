@@ -0,0 +1,87 @@
+"""Tests for evaluation budgets."""
+
+import pytest  # type: ignore
+
+import wisp.budgets as budgets
+import wisp.exceptions as exceptions
+import wisp.jit as jit
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+FOREVER = '((i recur) ((0 i)) loop)'
+
+
+def test_steps():
+    """Ensure each call counts as a step."""
+    env = prelude.env()
+    form = parser.read('((1 2 +) 3 +)')
+    assert budgets.evaluate(form, env, steps=2) == wtypes.Integer(6)
+    with pytest.raises(exceptions.BudgetExceeded, match='budget of 1 step'):
+        budgets.evaluate(form, env, steps=1)
+    assert env.budget is None
+
+
+@pytest.mark.parametrize('calls', [4, 1023, 1024, 1025, 3000])
+def test_steps_across_intervals(calls):
+    """Ensure the step limit is exact however many intervals it spans."""
+    env = prelude.env()
+    form = parser.read('(%s begin)' % ' '.join(['(0 0 +)'] * calls))
+    budgets.evaluate(form, env, steps=calls + 1)
+    with pytest.raises(exceptions.BudgetExceeded):
+        budgets.evaluate(form, env, steps=calls)
+
+
+def test_steps_compiled():
+    """Ensure loops handed to the JIT still count their iterations."""
+    env = prelude.env()
+    with pytest.raises(exceptions.BudgetExceeded):
+        budgets.evaluate(parser.read(FOREVER), env, steps=100000)
+
+
+def test_depth():
+    """Ensure the call stack may grow no deeper than the depth."""
+    env = prelude.env()
+    parser.read('((((1 n +) f) (n) lambda) f define)').eval(env)
+    parser.read('(((((((1 n -) g) 1 +) else) (0 (0 n eq?)) cond) (n)'
+                ' lambda) g define)').eval(env)
+    with pytest.raises(exceptions.BudgetExceeded, match='depth of 50'):
+        budgets.evaluate(parser.read('(0 f)'), env, depth=50)
+    assert len(env.frames) == 1
+    assert budgets.evaluate(
+        parser.read('(49 g)'), env, depth=50) == wtypes.Integer(49)
+
+
+def test_depth_compiled(monkeypatch):
+    """Ensure compiled lambdas count against the depth and the steps."""
+    monkeypatch.setattr(jit, 'enabled', True)
+    monkeypatch.setattr(jit, 'threshold', 2)
+    env = prelude.env()
+    parser.read('(((((((1 n -) down) 1 +) else) (0 (0 n eq?)) cond) (n)'
+                ' lambda) down define)').eval(env)
+    for _ in range(3):
+        parser.read('(10 down)').eval(env)
+    assert 'compiled' in env[wtypes.Symbol('down')].func.__name__
+    with pytest.raises(exceptions.BudgetExceeded, match='depth of 50'):
+        budgets.evaluate(parser.read('(400 down)'), env, depth=50)
+    assert len(env.frames) == 1
+    assert budgets.evaluate(
+        parser.read('(49 down)'), env, depth=50) == wtypes.Integer(49)
+    with pytest.raises(exceptions.BudgetExceeded, match='steps'):
+        budgets.evaluate(parser.read('(400 down)'), env, steps=100)
+
+
+def test_deadline():
+    """Ensure evaluation stops once the deadline has passed."""
+    env = prelude.env()
+    with pytest.raises(exceptions.BudgetExceeded, match='deadline'):
+        budgets.evaluate(parser.read(FOREVER), env, seconds=0.05)
+
+
+def test_nested():
+    """Ensure an outer budget is restored after an inner evaluation."""
+    env = prelude.env()
+    outer = budgets.Budget(steps=10)
+    env.budget = outer
+    budgets.evaluate(parser.read('(1 2 +)'), env, steps=1)
+    assert env.budget is outer
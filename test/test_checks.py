@@ -0,0 +1,39 @@
+"""Tests for reporting problems in source files."""
+
+import wisp.checks as checks
+
+SOURCE = '''(((((2 n -) fib) ((1 n -) fib) +) (n) lambda) fib define)
+
+(((x y (3 2 1 g) +) (x) lambda) f define)
+
+(((a b +) (a b) lambda) g define)
+(((1 2 3) quote) (3 2 car) undefined)
+'''
+
+
+def test_report(tmp_path):
+    """Ensure problems are listed by line, counting later definitions."""
+    path = tmp_path / 'source.wisp'
+    path.write_text(SOURCE)
+    assert sorted(checks.report(str(path))) == sorted([
+        '%s:line 3: unbound symbol y' % path,
+        '%s:line 3: g called with 3 arguments, requires 2' % path,
+        '%s:line 6: unbound symbol undefined' % path,
+        '%s:line 6: car called with 2 arguments, requires 1' % path,
+    ])
+
+
+def test_report_macros(tmp_path):
+    """Ensure macros defined by the file are expanded when checking."""
+    path = tmp_path / 'source.wisp'
+    path.write_text('(((x quote) quote) (x) q defmacro)\n(y q)\n(z (1 q) +)\n')
+    assert checks.report(str(path)) == [
+        '%s:line 3: unbound symbol z' % path,
+    ]
+
+
+def test_report_syntax_error(tmp_path):
+    """Ensure forms which can't be parsed are reported."""
+    path = tmp_path / 'source.wisp'
+    path.write_text('(1 x define)\n(1 #x)\n')
+    assert len(checks.report(str(path))) == 1
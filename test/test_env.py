@@ -99,3 +99,41 @@ def test_local_global_scope():
     env.pop_frame()
     assert env.global_scope() == {'a': wtypes.String('apple')}
     assert env.local_scope() == {}
+
+
+def test_capture():
+    """Ensure captured locals are shared through cells."""
+    env = wisp.env.Environment({'g': wtypes.String('global')})
+    env.add_frame({
+        'a': wtypes.String('apple'), 'b': wtypes.String('banana')
+    })
+
+    cells = env.capture(['a', 'g', 'missing'])
+    assert list(cells) == ['a']
+    assert isinstance(env.local_scope()['a'], wisp.env.Cell)
+
+    # lookups see through cells, and sets update them
+    assert env[wtypes.Symbol('a')] == wtypes.String('apple')
+    env[wtypes.Symbol('a')] = wtypes.String('apricot')
+    assert cells['a'].val == wtypes.String('apricot')
+
+    # capturing again shares the same cell
+    assert env.capture(['a'])['a'] is cells['a']
+
+
+def test_capture_global_scope():
+    """Ensure nothing is captured from the global scope."""
+    env = wisp.env.Environment({'g': wtypes.String('global')})
+    assert env.capture(['g']) == {}
+
+
+def test_empty_cells():
+    """Ensure empty cells are skipped until something is bound in them."""
+    env = wisp.env.Environment({'a': wtypes.String('global')})
+    cell = wisp.env.Cell()
+    env.add_frame({'a': cell})
+
+    assert env[wtypes.Symbol('a')] == wtypes.String('global')
+    env.add_binding(wtypes.Symbol('a'), wtypes.String('local'))
+    assert cell.val == wtypes.String('local')
+    assert env[wtypes.Symbol('a')] == wtypes.String('local')
@@ -0,0 +1,86 @@
+"""Tests for streaming file input."""
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.files as files
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+
+def test_iter_lines(tmp_path):
+    """Ensure lines are read without their line endings."""
+    path = tmp_path / 'lines.txt'
+    path.write_bytes(b'one\ntwo\r\n\nthree')
+
+    assert list(files.iter_lines(str(path))) == [
+        wtypes.String('one'),
+        wtypes.String('two'),
+        wtypes.String(''),
+        wtypes.String('three'),
+    ]
+
+
+def test_iter_lines_empty(tmp_path):
+    """Ensure empty files have no lines."""
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+
+    assert list(files.iter_lines(str(path))) == []
+
+
+def test_iter_lines_missing(tmp_path):
+    """Ensure we raise an exception for missing files."""
+    with pytest.raises(exceptions.WispException):
+        files.iter_lines(str(tmp_path / 'missing.txt'))
+
+
+def test_iter_lines_bad_encoding(tmp_path):
+    """Ensure undecodable lines raise an exception naming the file."""
+    path = tmp_path / 'latin.txt'
+    path.write_bytes(b'caf\xe9\n')
+
+    with pytest.raises(exceptions.WispException, match='latin.txt'):
+        list(files.iter_lines(str(path)))
+    with pytest.raises(exceptions.WispException, match='latin.txt'):
+        list(files.iter_chunks(str(path), 2))
+
+
+def test_iter_chunks(tmp_path):
+    """Ensure files are split into fixed-size chunks."""
+    path = tmp_path / 'chunks.txt'
+    path.write_text('abcdefg')
+
+    assert list(files.iter_chunks(str(path), 3)) == [
+        wtypes.String('abc'),
+        wtypes.String('def'),
+        wtypes.String('g'),
+    ]
+
+    with pytest.raises(exceptions.WispException):
+        files.iter_chunks(str(path), 0)
+
+
+def test_open_lines(tmp_path):
+    """Ensure open-lines returns a lazy sequence of lines."""
+    path = tmp_path / 'lines.txt'
+    path.write_text('one\ntwo\n')
+    env = prelude.env()
+
+    lines = env[wtypes.Symbol('open-lines')].call(
+        [wtypes.String(str(path))], env
+    )
+    assert isinstance(lines, wtypes.LazySeq)
+    assert lines == wtypes.List([wtypes.String('one'), wtypes.String('two')])
+
+
+def test_read_chunks(tmp_path):
+    """Ensure read-chunks returns a lazy sequence of chunks."""
+    path = tmp_path / 'chunks.txt'
+    path.write_text('abcd')
+    env = prelude.env()
+
+    chunks = env[wtypes.Symbol('read-chunks')].call(
+        [wtypes.String(str(path)), wtypes.Integer(2)], env
+    )
+    assert chunks == wtypes.List([wtypes.String('ab'), wtypes.String('cd')])
@@ -0,0 +1,99 @@
+"""Tests for interning values and structural hashes."""
+
+import array
+
+import pytest  # type: ignore
+
+import wisp.hashcons as hashcons
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+
+def run(source, env):
+    """Parse and evaluate a line of wisp source."""
+    return parser.read(source).eval(env)
+
+
+@pytest.fixture
+def interning():
+    """Turn interning on, restoring the setting after."""
+    enabled = hashcons.enabled
+    hashcons.enabled = True
+    yield
+    hashcons.enabled = enabled
+
+
+def test_intern():
+    """Ensure structurally equal values are shared."""
+    a = parser.read('(1 (a "b") #t)')
+    b = parser.read('(1 (a "b") #t)')
+    assert a is not b
+    assert hashcons.intern(a) is hashcons.intern(b)
+    assert hashcons.intern(a) is not hashcons.intern(parser.read('(1 2)'))
+
+
+def test_intern_keeps_distinct_types_apart():
+    """Ensure equal python values of different wisp types aren't shared."""
+    assert hashcons.intern(wtypes.Integer(1)) is not hashcons.intern(
+        wtypes.Bool(True))
+    assert hashcons.intern(wtypes.String('a')) is not hashcons.intern(
+        wtypes.Symbol('a'))
+
+
+def test_intern_deeply_nested():
+    """Ensure lists nested past the recursion limit can be interned."""
+    source = '(' * 10000 + ')' * 10000
+    assert hashcons.intern(parser.read(source)) is hashcons.intern(
+        parser.read(source))
+
+
+def test_structural_hash():
+    """Ensure equal values hash the same, whatever their type."""
+    a = parser.read('((1 2) x)')
+    b = wtypes.List([
+        wtypes.Vector(array.array('q', [1, 2])), wtypes.Symbol('x')
+    ])
+    assert a == b
+    assert hashcons.structural_hash(a) == hashcons.structural_hash(b)
+    assert a.digest is not None
+    assert hashcons.structural_hash(parser.read('((1 3) x)')) != a.digest
+    lazy = wtypes.List([wtypes.LazySeq.from_iterable([])])
+    assert hashcons.structural_hash(lazy) is None
+
+
+def test_equal_lists_with_different_hashes():
+    """Ensure lists with cached hashes which differ are unequal."""
+    a = parser.read('(1 2 3)')
+    b = parser.read('(1 2 4)')
+    hashcons.structural_hash(a)
+    hashcons.structural_hash(b)
+    assert a != b
+    assert a == parser.read('(1 2 3)')
+
+
+def test_deeply_nested_equality():
+    """Ensure lists nested past the recursion limit can be compared."""
+    env = prelude.env()
+    source = '(' * 10000 + ')' * 10000
+    env.add_binding(wtypes.Symbol('a'), parser.read(source))
+    env.add_binding(wtypes.Symbol('b'), parser.read(source))
+    assert run('(a b eq?)', env) == wtypes.Bool(True)
+
+
+def test_quote_interns(interning):
+    """Ensure quoted data is shared when interning is enabled."""
+    env = prelude.env()
+    run('(((1 (2 3)) quote) a define)', env)
+    run('(((1 (2 3)) quote) b define)', env)
+    a, b = env[wtypes.Symbol('a')], env[wtypes.Symbol('b')]
+    assert a is b
+    assert run('(((1 (2 4)) quote) a eq?)', env) == wtypes.Bool(False)
+    assert run('(((1 (2 3)) quote) a eq?)', env) == wtypes.Bool(True)
+
+
+def test_reader_interns_atoms(interning):
+    """Ensure the reader shares atoms when interning is enabled."""
+    val = parser.read('(abc abc 12 12)')
+    assert val.items[0] is val.items[1]
+    assert val.items[2] is val.items[3]
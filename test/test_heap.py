@@ -0,0 +1,99 @@
+"""Tests for shared heaps of wisp data."""
+
+import array
+import sys
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.heap as heap
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.runner as runner
+import wisp.wtypes as wtypes
+
+
+@pytest.fixture
+def heap_path(tmp_path):
+    """Write a heap of a list, a vector and a string, returning its path."""
+    path = str(tmp_path / 'data.heap')
+    heap.write(path, [
+        ('xs', wtypes.List([wtypes.Integer(1), wtypes.Symbol('a')])),
+        ('v', wtypes.Vector(array.array('q', [3, 1, 2]))),
+        ('s', wtypes.String('snowman ☃')),
+    ])
+    return path
+
+
+def test_heap_round_trip(heap_path):
+    """Ensure values are read back as they were written."""
+    shared = heap.Heap(heap_path)
+    assert len(shared) == 3
+    assert sorted(shared.names()) == ['s', 'v', 'xs']
+    assert 'xs' in shared and 'ys' not in shared
+    assert shared['xs'] == wtypes.List([wtypes.Integer(1),
+                                        wtypes.Symbol('a')])
+    assert shared['s'] == wtypes.String('snowman ☃')
+    assert shared['xs'] is shared['xs']
+
+
+@pytest.mark.skipif(sys.byteorder == 'big',
+                    reason='vectors are copied to swap their byte order')
+def test_heap_vectors_in_place(heap_path):
+    """Ensure vectors are views onto the mapped file, not copies."""
+    vector = heap.Heap(heap_path)['v']
+    assert vector == wtypes.Vector(array.array('q', [3, 1, 2]))
+    assert isinstance(vector.data, memoryview) and vector.data.readonly
+
+
+def test_heap_lookup(heap_path):
+    """Ensure environments look up globals in their heap."""
+    env = prelude.env()
+    env.heap = heap.Heap(heap_path)
+    assert parser.read('(v sort)').eval(env) == wtypes.Vector(
+        array.array('q', [1, 2, 3]))
+    assert parser.read('(xs length)').eval(env) == wtypes.Integer(2)
+    parser.read('(2 xs set!)').eval(env)
+    assert parser.read('xs').eval(env) == wtypes.Integer(2)
+    assert env.heap['xs'] != wtypes.Integer(2)
+    with pytest.raises(exceptions.WispException):
+        parser.read('ys').eval(env)
+
+
+def test_heap_not_a_heap(tmp_path):
+    """Ensure other files are refused."""
+    path = tmp_path / 'other'
+    path.write_bytes(b'(1 2 3)')
+    with pytest.raises(exceptions.WispException):
+        heap.Heap(str(path))
+
+
+def test_build(tmp_path):
+    """Ensure a heap is built of the data source files define."""
+    source = tmp_path / 'data.wisp'
+    source.write_text('(((1 2 3) quote) xs define)\n'
+                      '(((x x *) (x) lambda) square define)\n'
+                      '((5 range) v define)')
+    path = str(tmp_path / 'data.heap')
+    assert sorted(heap.build(path, [str(source)])) == ['v', 'xs']
+    shared = heap.Heap(path)
+    assert shared['v'] == wtypes.Vector(array.array('q', range(5)))
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_run_files_with_heap(tmp_path, heap_path, jobs):
+    """Ensure every file run sees the heap, without sharing changes."""
+    paths = []
+    for name, source in [('a.wisp', '(3 v define)\nv'), ('b.wisp', 'v')]:
+        (tmp_path / name).write_text(source)
+        paths.append(str(tmp_path / name))
+    results = list(runner.run_files(paths, jobs, heap=heap_path))
+    assert [result.output for result in results] == ['3\n', '(3 1 2)\n']
+
+
+def test_main_python_error(tmp_path, capsys):
+    """Ensure a source failing with a non-wisp error is reported."""
+    source = tmp_path / 'bad.wisp'
+    source.write_text('(0 1 /)')
+    assert heap.main(str(tmp_path / 'bad.heap'), [str(source)]) == 1
+    assert capsys.readouterr().out.startswith('ZeroDivisionError: ')
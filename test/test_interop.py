@@ -0,0 +1,131 @@
+"""Tests for converting between python objects and wisp values."""
+
+import array
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.interop as interop
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+
+def run(source, env):
+    """Parse and evaluate a line of wisp source."""
+    return parser.parse_expr.parse_strict(source).eval(env)
+
+
+def test_to_wisp():
+    """Ensure nested python structures are wrapped as wisp values."""
+    assert interop.to_wisp([1, 'a', True, None, {'k': (2,)}]) == wtypes.List([
+        wtypes.Integer(1),
+        wtypes.String('a'),
+        wtypes.Bool(True),
+        wtypes.List([]),
+        wtypes.List([
+            wtypes.List([
+                wtypes.String('k'), wtypes.List([wtypes.Integer(2)])
+            ]),
+        ]),
+    ])
+
+
+def test_to_wisp_keeps_wisp_values():
+    """Ensure values which are already wrapped are not wrapped again."""
+    val = wtypes.List([wtypes.Integer(1)])
+    converted = interop.to_wisp([val, wtypes.Integer(2)])
+    assert converted.items[0] is val
+
+
+def test_to_wisp_deep_nesting():
+    """Ensure deeply nested structures don't hit the recursion limit."""
+    nested: list = []
+    for _ in range(100000):
+        nested = [nested]
+    val = interop.to_python(interop.to_wisp(nested))
+    for _ in range(100000):
+        val, = val
+    assert val == []
+
+
+def test_to_wisp_vectors_and_iterators():
+    """Ensure arrays become vectors and iterators lazy sequences."""
+    data = array.array('q', [1, 2])
+    assert interop.to_wisp(data).data is data
+    seq = interop.to_wisp(n for n in range(3))
+    assert isinstance(seq, wtypes.LazySeq)
+    assert interop.to_python(seq) == [0, 1, 2]
+
+
+def test_to_wisp_unrepresentable():
+    """Ensure values without a wisp type raise an exception."""
+    with pytest.raises(exceptions.WispException):
+        interop.to_wisp([1.5])
+
+
+def test_to_wisp_lazy():
+    """Ensure lazy conversion only wraps the elements which are realized."""
+    seq = interop.to_wisp([1, [2], object()], lazy=True)
+    assert isinstance(seq, wtypes.LazySeq)
+    first, rest = wtypes.uncons(seq)
+    assert first == wtypes.Integer(1)
+    second, rest = wtypes.uncons(rest)
+    assert isinstance(second, wtypes.LazySeq)
+    assert interop.to_python(second) == [2]
+    with pytest.raises(exceptions.WispException):
+        wtypes.uncons(rest)
+
+
+def test_to_python():
+    """Ensure wisp values are unwrapped into python objects."""
+    val = wtypes.List([
+        wtypes.Integer(1),
+        wtypes.Symbol('x'),
+        wtypes.Vector(array.array('q', [2, 3])),
+        wtypes.LazySeq.from_iterable([wtypes.Bool(False)]),
+    ])
+    assert interop.to_python(val) == [1, 'x', [2, 3], [False]]
+
+
+def test_register():
+    """Ensure python callables are called with unboxed arguments."""
+    env = prelude.env()
+
+    def total(*numbers):
+        return sum(numbers)
+
+    def pairs(items: list, sep: str = ':'):
+        return [sep.join(map(str, pair)) for pair in items]
+
+    interop.register(env, 'total', total)
+    interop.register(env, 'pairs', pairs)
+    assert run('(1 2 3 total)', env) == wtypes.Integer(6)
+    assert run('((((1 2) (3 4)) quote) pairs)', env) == wtypes.List([
+        wtypes.String('1:2'), wtypes.String('3:4')
+    ])
+    assert run('("-" (((1 2)) quote) pairs)', env) == wtypes.List([
+        wtypes.String('1-2')
+    ])
+
+
+def test_register_checks_arguments():
+    """Ensure registered callables check their argument count and types."""
+    env = prelude.env()
+
+    def square(n: int) -> int:
+        return n * n
+
+    def head(seq: wtypes.List) -> wtypes.Expression:
+        return seq.items[0]
+
+    interop.register(env, 'square', square)
+    interop.register(env, 'head', head)
+    assert run('(3 square)', env) == wtypes.Integer(9)
+    assert run('(((1 2) quote) head)', env) == wtypes.Integer(1)
+    with pytest.raises(exceptions.WispException):
+        run('(1 2 square)', env)
+    with pytest.raises(exceptions.WispException):
+        run('("a" square)', env)
+    with pytest.raises(exceptions.WispException):
+        run('(1 head)', env)
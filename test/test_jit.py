@@ -0,0 +1,112 @@
+"""Tests for compiling hot lambdas."""
+
+import math
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.jit as jit
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+FIB = """(((((((2 n -) fib) ((1 n -) fib) +) else)
+            (1 (1 n eq?)) (0 (0 n eq?)) cond) (n) lambda) fib define)"""
+
+FACT = """((((((acc n *) (1 n -) fact) else)
+             (acc (0 n eq?)) cond) (n acc) lambda) fact define)"""
+
+
+@pytest.fixture(autouse=True)
+def hot():
+    """Compile lambdas after a couple of calls, restoring settings after."""
+    enabled, threshold = jit.enabled, jit.threshold
+    jit.enabled, jit.threshold = True, 2
+    jit.reset_stats()
+    yield
+    jit.enabled, jit.threshold = enabled, threshold
+
+
+def test_compiles_hot_lambdas():
+    """Ensure hot lambdas are compiled and still compute the same thing."""
+    env = prelude.env()
+    run(FIB, env)
+
+    assert run('(10 fib)', env) == wtypes.Integer(55)
+    assert jit.stats()['compiled'] == 1
+    assert run('(15 fib)', env) == wtypes.Integer(610)
+
+
+def test_tail_calls_loop():
+    """Ensure self tail calls don't consume the python stack."""
+    env = prelude.env()
+    run(FACT, env)
+
+    res = run('(1 5000 fact)', env)
+    assert res == wtypes.Integer(math.factorial(5000))
+
+
+def test_compiles_hot_loops():
+    """Ensure hot loops switch to compiled code part way through."""
+    env = prelude.env()
+    run('(((((((i acc +) (step i +) recur) else) (acc (n i eq?)) cond)'
+        ' ((0 i) (0 acc)) loop) (step n) lambda) sum define)', env)
+
+    assert run('(1000 1 sum)', env) == wtypes.Integer(499500)
+    assert jit.stats()['compiled'] == 1
+    assert run('(10 2 sum)', env) == wtypes.Integer(20)
+    assert jit.stats()['compiled'] == 1
+
+
+def test_deoptimize_on_rebinding():
+    """Ensure rebinding globals the code depends on deoptimizes it."""
+    env = prelude.env()
+    run('(1 step define)', env)
+    run('((((((step n -) countdown) else) ("done" (0 n eq?)) cond)'
+        ' (n) lambda) countdown define)', env)
+
+    assert run('(3 countdown)', env) == wtypes.String('done')
+    assert jit.stats()['compiled'] == 1
+
+    run('(3 step set!)', env)
+    assert jit.stats()['deoptimized'] == 1
+    assert run('(9 countdown)', env) == wtypes.String('done')
+
+
+def test_guard_failure():
+    """Ensure arguments of unexpected types fall back to the interpreter."""
+    env = prelude.env()
+    run(FACT, env)
+    run('(1 3 fact)', env)
+
+    with pytest.raises(exceptions.WispException):
+        run('(1 "three" fact)', env)
+    assert jit.stats()['guard_failures'] == 1
+
+
+def test_unsupported_forms_stay_interpreted():
+    """Ensure bodies the compiler doesn't understand are interpreted."""
+    env = prelude.env()
+    run('(0 total define)', env)
+    run('((((n total +) total set!) (n) lambda) add define)', env)
+
+    for i in range(5):
+        run('(%d add)' % i, env)
+    assert run('total', env) == wtypes.Integer(10)
+    assert jit.stats()['compiled'] == 0
+    assert jit.stats()['bailouts'] == 1
+
+
+def test_disabled():
+    """Ensure nothing is compiled when the JIT is switched off."""
+    jit.enabled = False
+    env = prelude.env()
+    run(FIB, env)
+
+    assert run('(10 fib)', env) == wtypes.Integer(55)
+    assert jit.stats()['compiled'] == 0
+
+
+def run(source, env):
+    """Parse and evaluate the given source in the environment."""
+    return parser.parse_expr.parse_strict(' '.join(source.split())).eval(env)
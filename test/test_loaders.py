@@ -0,0 +1,177 @@
+"""Tests for the CSV and JSON loaders and writers."""
+
+import array
+import json
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.loaders as loaders
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+
+@pytest.fixture
+def people(tmp_path):
+    """Write a small CSV file of people."""
+    path = tmp_path / 'people.csv'
+    path.write_text('name,age,admin\nann,31,true\nbob,27,false\n')
+    return str(path)
+
+
+def test_load_csv(people):
+    """Ensure CSV rows are loaded as lists of strings."""
+    assert loaders.load_csv(people) == wtypes.List([
+        wtypes.List([
+            wtypes.String('ann'), wtypes.String('31'), wtypes.String('true')
+        ]),
+        wtypes.List([
+            wtypes.String('bob'), wtypes.String('27'), wtypes.String('false')
+        ]),
+    ])
+
+
+def test_load_csv_select_and_coerce(people):
+    """Ensure we can select and reorder columns and coerce their types."""
+    rows = loaders.load_csv(
+        people, ['admin', 'age'], {'admin': 'bool', 'age': 'int'}
+    )
+    assert rows == wtypes.List([
+        wtypes.List([wtypes.Bool(True), wtypes.Integer(31)]),
+        wtypes.List([wtypes.Bool(False), wtypes.Integer(27)]),
+    ])
+
+
+def test_load_csv_bad_columns(people):
+    """Ensure we raise exceptions for unknown columns and types."""
+    with pytest.raises(exceptions.WispException):
+        loaders.load_csv(people, ['height'])
+
+    with pytest.raises(exceptions.WispException):
+        loaders.load_csv(people, ['age'], {'age': 'float'})
+
+    with pytest.raises(exceptions.WispException):
+        loaders.load_csv(people, ['name'], {'name': 'int'})
+
+
+def test_load_bad_encoding(tmp_path):
+    """Ensure undecodable files raise an exception naming the file."""
+    path = tmp_path / 'latin.csv'
+    path.write_bytes(b'name\ncaf\xe9\n')
+
+    for load in (loaders.load_csv, loaders.load_csv_columns,
+                 loaders.load_json, loaders.iter_json_lines):
+        with pytest.raises(exceptions.WispException, match='latin.csv'):
+            list(load(str(path)))
+
+
+def test_load_csv_columns(people):
+    """Ensure integer columns are loaded compactly."""
+    columns = loaders.load_csv_columns(people, ['name', 'age'], {'age': 'int'})
+    name, age = columns.items
+
+    assert name == wtypes.List([
+        wtypes.String('name'),
+        wtypes.List([wtypes.String('ann'), wtypes.String('bob')]),
+    ])
+    assert age.items[1] == wtypes.Vector(array.array('q', [31, 27]))
+    assert age.items[1] == wtypes.List([
+        wtypes.Integer(31), wtypes.Integer(27)
+    ])
+
+
+def test_load_csv_short_rows(tmp_path):
+    """Ensure rows missing fields raise an exception naming the line."""
+    path = tmp_path / 'short.csv'
+    path.write_text('name,age\nann,31\nbob\n')
+
+    with pytest.raises(exceptions.WispException, match='short.csv:3'):
+        loaders.load_csv(str(path))
+    with pytest.raises(exceptions.WispException, match='short.csv:3'):
+        loaders.load_csv_columns(str(path), ['age'], {'age': 'int'})
+
+
+def test_load_csv_columns_big_integers(tmp_path):
+    """Ensure integer columns too big for a vector are kept boxed."""
+    path = tmp_path / 'big.csv'
+    path.write_text('n\n1\n%d\n' % 2 ** 70)
+
+    columns = loaders.load_csv_columns(str(path), types={'n': 'int'})
+    assert columns == wtypes.List([
+        wtypes.List([
+            wtypes.String('n'),
+            wtypes.List([wtypes.Integer(1), wtypes.Integer(2 ** 70)]),
+        ]),
+    ])
+
+
+def test_load_json(tmp_path):
+    """Ensure JSON documents are loaded as wisp values."""
+    path = tmp_path / 'doc.json'
+    path.write_text(json.dumps({'a': [1, 'two', True, None], 'b': 3.0}))
+
+    assert loaders.load_json(str(path)) == wtypes.List([
+        wtypes.List([
+            wtypes.String('a'),
+            wtypes.List([
+                wtypes.Integer(1),
+                wtypes.String('two'),
+                wtypes.Bool(True),
+                wtypes.List([]),
+            ]),
+        ]),
+        wtypes.List([wtypes.String('b'), wtypes.Integer(3)]),
+    ])
+
+
+def test_load_json_float(tmp_path):
+    """Ensure we refuse floats wisp can not represent."""
+    path = tmp_path / 'doc.json'
+    path.write_text('[1.5]')
+
+    with pytest.raises(exceptions.WispException):
+        loaders.load_json(str(path))
+
+
+def test_csv_round_trip(tmp_path, people):
+    """Ensure rows written to CSV can be loaded back."""
+    path = str(tmp_path / 'out.csv')
+    rows = loaders.load_csv(people, ['name', 'age'], {'age': 'int'})
+
+    assert loaders.write_csv(rows, path, header=['name', 'age']) == 2
+    assert loaders.load_csv(path, types={'age': 'int'}) == rows
+
+
+def test_json_lines_round_trip(tmp_path):
+    """Ensure lazy sequences stream out to JSON lines and back."""
+    path = str(tmp_path / 'out.jsonl')
+    records = wtypes.LazySeq.from_iterable(
+        wtypes.List([wtypes.Integer(i), wtypes.String('x')])
+        for i in range(3)
+    )
+
+    assert loaders.write_json_lines(records, path) == 3
+    assert list(loaders.iter_json_lines(path)) == [
+        wtypes.List([wtypes.Integer(i), wtypes.String('x')])
+        for i in range(3)
+    ]
+
+
+def test_load_csv_builtin(people):
+    """Ensure load-csv reads column specs from wisp lists."""
+    env = prelude.env()
+    rows = env[wtypes.Symbol('load-csv')].call([
+        wtypes.String(people),
+        wtypes.List([
+            wtypes.List([
+                wtypes.List([wtypes.String('age'), wtypes.Symbol('int')]),
+                wtypes.String('name'),
+            ]),
+            wtypes.Symbol('quote'),
+        ]),
+    ], env)
+
+    assert rows == wtypes.List([
+        wtypes.List([wtypes.Integer(31), wtypes.String('ann')]),
+        wtypes.List([wtypes.Integer(27), wtypes.String('bob')]),
+    ])
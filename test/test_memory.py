@@ -0,0 +1,102 @@
+"""Tests for memory snapshots and allocation tracking."""
+
+import gc
+import tracemalloc
+import weakref
+
+import pytest  # type: ignore
+
+import wisp.interop as interop
+import wisp.jit as jit
+import wisp.memory as memory
+import wisp.parser as parser
+import wisp.prelude as prelude
+
+
+def run(source, env):
+    """Parse and evaluate a line of wisp source."""
+    return parser.parse_expr.parse_strict(source).eval(env)
+
+
+def stats(val):
+    """Unwrap the (name value) pairs returned by memory-stats."""
+    return dict(interop.to_python(val))
+
+
+@pytest.fixture
+def tracking():
+    """Track allocations without compiling lambdas, stopping after."""
+    enabled = jit.enabled
+    jit.enabled = False
+    memory.start_tracking()
+    yield
+    memory.stop_tracking()
+    jit.enabled = enabled
+
+
+def test_snapshot_counts():
+    """Ensure snapshots count the live values of each type."""
+    env = prelude.env()
+    before = memory.snapshot(env)
+    run('(((%s) quote) data define)' % ' '.join(['7'] * 500), env)
+    after = memory.snapshot(env)
+    changes = memory.diff(before, after)
+    assert changes.counts['Integer'] >= 500
+    assert changes.sizes['Integer'] > 0
+    assert changes.global_bindings == 1
+
+
+def test_memory_stats():
+    """Ensure memory-stats reports the depth of the call stack."""
+    env = prelude.env()
+    assert stats(run('(memory-stats)', env))['depth'] == 1
+    run('(((memory-stats) () lambda) f define)', env)
+    result = stats(run('(f)', env))
+    assert result['depth'] == 2
+    assert result['global_bindings'] == len(env.global_scope())
+
+
+def test_closure_frames():
+    """Ensure snapshots count the cells captured by closures."""
+    env = prelude.env()
+    run('((((x y +) (y) lambda) (x) lambda) adder define)', env)
+    before = memory.snapshot(env)
+    run('((1 adder) inc define)', env)
+    changes = memory.diff(before, memory.snapshot(env))
+    assert changes.closures == 1
+    assert changes.closure_cells == 1
+
+
+def test_tracking(tracking):
+    """Ensure memory still held after a call is charged to the lambda."""
+    env = prelude.env()
+    interop.register(env, 'zeros', lambda n: [0] * n)
+    run('(((n zeros) (n) lambda) build define)', env)
+    run('(((n build) (n) lambda) outer define)', env)
+    run('((10000 outer) data define)', env)
+    allocations = memory.snapshot(env).allocations
+    assert allocations['build'] > 10000 * 40
+    assert allocations.get('outer', 0) < allocations['build'] // 10
+
+
+def test_tracking_keeps_existing_tracing():
+    """Ensure stopping tracking leaves tracing on if it was already on."""
+    tracemalloc.start()
+    try:
+        memory.start_tracking()
+        memory.stop_tracking()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_tracking_forgets_collected_lambdas(tracking):
+    """Ensure tracking doesn't keep the lambdas it charges alive."""
+    env = prelude.env()
+    function = run('((((x) quote) (x) lambda) make define)', env)
+    run('(1 make)', env)
+    ref = weakref.ref(env[function])
+    env.remove_binding(function)
+    gc.collect()
+    assert ref() is None
+    assert memory.snapshot(env).allocations.get('make') is None
@@ -1,5 +1,10 @@
 """Tests for the wisp parser."""
 
+import re
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
 import wisp.parser as parser
 import wisp.wtypes as wtypes
 
@@ -35,3 +40,32 @@ def test_parse_list():
         wtypes.Bool(False),
         wtypes.Symbol('+'),
     ])
+
+
+def test_read():
+    """Ensure the reader agrees with the parser."""
+    source = '(1    abc "a (b" #t #f (()) +)'
+    assert parser.read(' %s\n' % source) == parser.parse_expr.parse(source)
+
+
+def test_read_deeply_nested():
+    """Ensure lists nested past the recursion limit can be read."""
+    depth = 100000
+    val = parser.read('(' * depth + '1' + ')' * depth)
+    for _ in range(depth):
+        val, = val.items
+    assert val == wtypes.Integer(1)
+
+
+@pytest.mark.parametrize('source, error', [
+    ('(1 2', 'line 1, column 5: unterminated list'),
+    ('(1 2))', 'line 1, column 6: unexpected )'),
+    ('1 2', 'line 1, column 3: expected end of input'),
+    ('(1\n  "ab)', 'line 2, column 3: unterminated string'),
+    ('(1\n  2x)', 'line 2, column 3: invalid token 2x'),
+    ('  ', 'expected an expression'),
+])
+def test_read_errors(source, error):
+    """Ensure read errors say where they happened."""
+    with pytest.raises(exceptions.WispException, match=re.escape(error)):
+        parser.read(source)
@@ -1,8 +1,12 @@
 """Tests for prelude functions."""
 
+import gc
+import weakref
+
 import pytest  # type: ignore
 
 import wisp.exceptions as exceptions
+import wisp.parser as parser
 import wisp.prelude as prelude
 import wisp.wtypes as wtypes
 
@@ -400,6 +404,480 @@ def test_closures():
         env[wtypes.Symbol('x')]
 
 
+def test_delay_and_force():
+    """Ensure delayed expressions are evaluated once, when forced."""
+    env = prelude.env()
+    run('(0 count define)', env)
+    run('((((1 count +) count set!) delay) p define)', env)
+    assert run('count', env) == wtypes.Integer(0)
+
+    run('(p force)', env)
+    run('(p force)', env)
+    assert run('count', env) == wtypes.Integer(1)
+
+    # forcing a non-promise returns it as-is
+    assert run('(3 force)', env) == wtypes.Integer(3)
+
+
+def test_lazy_cons():
+    """Ensure lazy-cons can build infinite sequences."""
+    env = prelude.env()
+    run('(((((1 n +) ints) n lazy-cons) (n) lambda) ints define)', env)
+
+    assert run('(((((0 ints) cdr) cdr) cdr) car)', env) == wtypes.Integer(3)
+    assert run('((0 ints) atom?)', env) == wtypes.Bool(False)
+
+
+def test_lazy_seq_builtins():
+    """Ensure list builtins realize lazy sequences only as needed."""
+    env = prelude.env()
+    realized = []
+
+    def numbers():
+        for i in range(3):
+            realized.append(i)
+            yield wtypes.Integer(i)
+
+    env.add_binding(wtypes.Symbol('xs'),
+                    wtypes.LazySeq.from_iterable(numbers()))
+
+    assert run('(xs car)', env) == wtypes.Integer(0)
+    assert realized == [0]
+
+    assert run('((xs cdr) car)', env) == wtypes.Integer(1)
+    assert realized == [0, 1]
+
+    assert run('(xs 5 cons)', env) == wtypes.List([
+        wtypes.Integer(5),
+        wtypes.Integer(0),
+        wtypes.Integer(1),
+        wtypes.Integer(2),
+    ])
+
+    with pytest.raises(exceptions.WispException):
+        run('((((xs cdr) cdr) cdr) car)', env)
+
+
+def test_nested_closures():
+    """Ensure closures see variables from every enclosing lambda."""
+    env = prelude.env()
+    run('((((((z y +) x +) (z) lambda) (y) lambda) (x) lambda) f define)',
+        env)
+    assert run('(3 (2 (1 f)))', env) == wtypes.Integer(6)
+
+
+def test_closures_share_mutations():
+    """Ensure closures over the same variable see each other's set!s."""
+    env = prelude.env()
+    run('((((() ((0 x +) () lambda) cons)'
+        ' ((x ((1 x +) x set!) begin) () lambda) cons)'
+        ' (x) lambda) make-pair define)', env)
+    run('((0 make-pair) pair define)', env)
+    run('((pair car) inc define)', env)
+    run('(((pair cdr) car) get define)', env)
+
+    run('(inc)', env)
+    run('(inc)', env)
+    assert run('(get)', env) == wtypes.Integer(2)
+
+
+def test_closures_capture_only_free_variables():
+    """Ensure closures don't hold on to variables they never use."""
+    env = prelude.env()
+    run('((((0 x +) () lambda) (big x) lambda) make define)', env)
+    big = wtypes.List([wtypes.Integer(1), wtypes.Integer(2)])
+    ref = weakref.ref(big)
+    closure = env[wtypes.Symbol('make')].func([big, wtypes.Integer(1)], env)
+
+    del big
+    gc.collect()
+    assert ref() is None
+    assert closure.call([], env) == wtypes.Integer(1)
+
+
+def test_local_recursion():
+    """Ensure local lambdas can call themselves and each other."""
+    env = prelude.env()
+    run('((((n go) ((((((1 k -) go) else) ("done" (0 k eq?)) cond)'
+        ' (k) lambda) go define) begin) (n) lambda) f define)', env)
+    assert run('(3 f)', env) == wtypes.String('done')
+
+    run('((((n ev)'
+        ' ((((((1 k -) ev) else) (#f (0 k eq?)) cond) (k) lambda) od define)'
+        ' ((((((1 k -) od) else) (#t (0 k eq?)) cond) (k) lambda) ev define)'
+        ' begin) (n) lambda) even? define)', env)
+    assert run('(4 even?)', env) == wtypes.Bool(True)
+    assert run('(3 even?)', env) == wtypes.Bool(False)
+
+
+def test_lambda_receives_values():
+    """Ensure lambda arguments are evaluated exactly once."""
+    env = prelude.env()
+    assert run(
+        '(((1 2 3) quote) ((x car) (x) lambda))', env
+    ) == wtypes.Integer(1)
+
+
+# A macro which expands into a cond, counting its expansions in n.
+MY_IF = ' '.join("""
+(((((() (cond quote) cons)
+     ((() test cons) then cons) cons)
+    ((() (else quote) cons) e cons) cons)
+   ((1 n +) n set!)
+   begin)
+  (test then e)
+  my-if
+  defmacro)
+""".split())
+
+
+def test_defmacro():
+    """Ensure macros evaluate the expression they expand to."""
+    env = prelude.env()
+    run('(0 n define)', env)
+    assert run(MY_IF, env) == wtypes.Symbol('my-if')
+
+    assert run('("no" "yes" (1 1 eq?) my-if)', env) == wtypes.String('yes')
+    assert run('("no" "yes" (2 1 eq?) my-if)', env) == wtypes.String('no')
+
+
+def test_macros_expand_once():
+    """Ensure macro calls are expanded once, not on every evaluation."""
+    env = prelude.env()
+    run('(0 n define)', env)
+    run(MY_IF, env)
+
+    # lambda bodies are expanded when the lambda is defined
+    run('((("no" "yes" (x 1 eq?) my-if) (x) lambda) f define)', env)
+    assert run('n', env) == wtypes.Integer(1)
+    assert run('(1 f)', env) == wtypes.String('yes')
+    assert run('(2 f)', env) == wtypes.String('no')
+    assert run('n', env) == wtypes.Integer(1)
+
+    # other forms cache their expansion the first time they are evaluated
+    form = parser.parse_expr.parse_strict('("no" "yes" #t my-if)')
+    assert form.eval(env) == wtypes.String('yes')
+    assert form.eval(env) == wtypes.String('yes')
+    assert run('n', env) == wtypes.Integer(2)
+
+
+def test_closure_bodies_expand_once():
+    """Ensure lambdas created repeatedly reuse their body's expansion."""
+    env = prelude.env()
+    run('(0 n define)', env)
+    run(MY_IF, env)
+    run('(((("no" "yes" (x 1 eq?) my-if) (x) lambda) () lambda)'
+        ' make define)', env)
+
+    assert run('(1 (make))', env) == wtypes.String('yes')
+    assert run('(2 (make))', env) == wtypes.String('no')
+    assert run('n', env) == wtypes.Integer(1)
+
+    # the body is expanded again once the macro is redefined
+    form = parser.parse_expr.parse_strict(
+        '(("no" "yes" (x 1 eq?) my-if) (x) lambda)'
+    )
+    form.eval(env)
+    form.eval(env)
+    assert run('n', env) == wtypes.Integer(2)
+    run(MY_IF, env)
+    form.eval(env)
+    assert run('n', env) == wtypes.Integer(3)
+
+
+def test_macros_skip_quoted_forms():
+    """Ensure macro calls within quoted data are left alone."""
+    env = prelude.env()
+    run('(0 n define)', env)
+    run(MY_IF, env)
+
+    run('(((("no" "yes" #t my-if) quote) () lambda) f define)', env)
+    assert run('n', env) == wtypes.Integer(0)
+    assert run('(f)', env) == parser.parse_expr.parse_strict(
+        '("no" "yes" #t my-if)'
+    )
+
+
+def test_macroexpand():
+    """Ensure macroexpand returns the expansion of a macro call."""
+    env = prelude.env()
+    run('(0 n define)', env)
+    run(MY_IF, env)
+
+    assert run(
+        '((("no" "yes" #t my-if) quote) macroexpand)', env
+    ) == parser.parse_expr.parse_strict('(("no" else) ("yes" #t) cond)')
+    assert run('(((1 2 +) quote) macroexpand)', env) == wtypes.List([
+        wtypes.Integer(1), wtypes.Integer(2), wtypes.Symbol('+')
+    ])
+
+
+SUM = """(((((((i acc +) (1 i +) recur) else) (acc (n i eq?)) cond)
+            ((0 i) (0 acc)) loop) (n) lambda) sum define)"""
+
+
+def test_loop():
+    """Ensure loops rebind their variables on recur until they return."""
+    env = prelude.env()
+    run(SUM, env)
+    assert run('(10 sum)', env) == wtypes.Integer(45)
+    assert run('(0 sum)', env) == wtypes.Integer(0)
+
+
+def test_loop_global_scope():
+    """Ensure loops run at the top level without leaking bindings."""
+    env = prelude.env()
+    res = run('(((((i acc *) (1 i +) recur) else) (acc (5 i eq?)) cond)'
+              ' ((1 i) (1 acc)) loop)', env)
+    assert res == wtypes.Integer(24)
+    with pytest.raises(exceptions.WispException):
+        run('i', env)
+
+
+def test_loop_restores_bindings():
+    """Ensure loop variables shadow locals only for the loop's duration."""
+    env = prelude.env()
+    run('(((i (((((1 i +) recur) else) (i (3 i eq?)) cond) ((0 i)) loop)'
+        ' begin) (i) lambda) f define)', env)
+    assert run('(7 f)', env) == wtypes.Integer(7)
+
+
+def test_nested_loops():
+    """Ensure inner loops see the variables of outer loops."""
+    env = prelude.env()
+    run('(((((((((((j acc +) (1 j +) recur) else) (acc (i j eq?)) cond)'
+        ' ((0 j) (acc acc)) loop) (1 i +) recur) else) (acc (n i eq?)) cond)'
+        ' ((0 i) (0 acc)) loop) (n) lambda) triangle define)', env)
+    assert run('(5 triangle)', env) == wtypes.Integer(10)
+
+
+def test_misplaced_recur():
+    """Ensure recur outside the tail of a loop is rejected up front."""
+    env = prelude.env()
+    with pytest.raises(exceptions.WispException):
+        run('(((1 (i recur) +) ((0 i)) loop) () lambda)', env)
+    with pytest.raises(exceptions.WispException):
+        run('((n recur) (n) lambda)', env)
+    with pytest.raises(exceptions.WispException):
+        run('(((((i recur) (x) lambda) ((0 i)) loop)) () lambda)', env)
+    with pytest.raises(exceptions.WispException):
+        run('((1 (i recur) +) ((0 i)) loop)', env)
+
+
+def test_recur_outside_loop():
+    """Ensure recur raises an exception when there is no loop to rerun."""
+    env = prelude.env()
+    with pytest.raises(exceptions.WispException):
+        run('(5 recur)', env)
+
+
+def test_recur_arguments():
+    """Ensure recur must rebind every loop variable."""
+    env = prelude.env()
+    with pytest.raises(exceptions.WispException):
+        run('((i recur) ((0 i) (0 j)) loop)', env)
+
+
+def test_arity_checked_at_definition():
+    """Ensure calls to known functions are checked when a lambda is made."""
+    env = prelude.env()
+    with pytest.raises(exceptions.WispException, match='car called with 2'):
+        run('(((x (1 2 car)) (x) lambda) f define)', env)
+    run('(((x 1 +) (x) lambda) inc define)', env)
+    with pytest.raises(exceptions.WispException, match='inc called with 2'):
+        run('(((2 x inc) (x) lambda) g define)', env)
+
+
+def test_arity_checked_calls_skip_check():
+    """Ensure checked call sites record the function checked against."""
+    env = prelude.env()
+    form = parser.read('(((x car) (x) lambda) first define)')
+    assert prelude.check(form, env) == []
+    call = form.items[0].items[0]
+    assert call.checked is env[wtypes.Symbol('car')]
+    form.eval(env)
+    assert run('(((1 2) quote) first)', env) == wtypes.Integer(1)
+
+
+def test_arity_unknown_targets_checked_when_called():
+    """Ensure calls to parameters are still checked as they are made."""
+    env = prelude.env()
+    run('(((x f) (f x) lambda) call define)', env)
+    run('(((x x *) (x) lambda) square define)', env)
+    assert run('(3 square call)', env) == wtypes.Integer(9)
+    with pytest.raises(exceptions.WispException, match='called with 1'):
+        run('(3 cons call)', env)
+
+
+def test_check_unbound():
+    """Ensure check reports unbound symbols, outside of local bindings."""
+    env = prelude.env()
+    problems = prelude.check(
+        parser.read('(((x y +) (x) lambda) f define)'), env
+    )
+    assert [problem.message for problem in problems] == [
+        'unbound symbol y'
+    ]
+    form = parser.read(
+        '(((((z else) (i (x y eq?)) cond) ((0 i)) loop) (x) lambda) f define)'
+    )
+    assert prelude.check(form, env, {'y': wtypes.Symbol('y'),
+                                     'z': wtypes.Symbol('z')}) == []
+
+
+def test_map():
+    """Ensure map calls the function on the elements of each list."""
+    env = prelude.env()
+    assert run('(((1 2 3) quote) ((x 1 +) (x) lambda) map)', env) == \
+        parser.read('(2 3 4)')
+    assert run('(((4 5) quote) ((1 2 3) quote) + map)', env) == \
+        parser.read('(5 7)')
+    assert run('(() ((x 1 +) (x) lambda) map)', env) == wtypes.List([])
+    with pytest.raises(exceptions.WispException, match='requires 1'):
+        run('(((4 5) quote) ((1 2 3) quote) ((x) (x) lambda) map)', env)
+    with pytest.raises(exceptions.WispException):
+        run('(((1 2 3) quote) map)', env)
+
+
+def test_map_lazy():
+    """Ensure map over a lazy sequence realizes results as they are used."""
+    env = prelude.env()
+    run('(((((1 n +) ints) n lazy-cons) (n) lambda) ints define)', env)
+    assert run('((((0 ints) ((x x *) (x) lambda) map) cdr) car)', env) == \
+        wtypes.Integer(1)
+
+
+def test_filter():
+    """Ensure filter keeps the elements the predicate is true of."""
+    env = prelude.env()
+    run('(((0 (((2 x /) 2 *) x -) eq?) (x) lambda) even? define)', env)
+    assert run('(((1 2 3 4) quote) even? filter)', env) == \
+        parser.read('(2 4)')
+    run('(((((1 n +) ints) n lazy-cons) (n) lambda) ints define)', env)
+    assert run('((((1 ints) even? filter) cdr) car)', env) == \
+        wtypes.Integer(4)
+
+
+def test_reduce():
+    """Ensure reduce folds the function over the lists from a value."""
+    env = prelude.env()
+    assert run('(((1 2 3 4) quote) 10 + reduce)', env) == wtypes.Integer(20)
+    assert run('(((1 2) quote) ((3 4) quote) 0 + reduce)', env) == \
+        wtypes.Integer(10)
+    assert run('(() 7 + reduce)', env) == wtypes.Integer(7)
+    assert run('(((1 2 3) quote) () ((acc x cons) (acc x) lambda) reduce)',
+               env) == \
+        parser.read('(3 2 1)')
+
+
+def test_apply():
+    """Ensure apply spreads the list after any other arguments."""
+    env = prelude.env()
+    assert run('(((1 2 3) quote) 10 + apply)', env) == wtypes.Integer(16)
+    assert run('(((2) quote) 3 - apply)', env) == wtypes.Integer(1)
+    with pytest.raises(exceptions.WispException, match='requires 2'):
+        run('(((1 2 3) quote) cons apply)', env)
+    with pytest.raises(exceptions.WispException):
+        run('(((1 2 3) quote) 1 apply)', env)
+
+
+def test_length():
+    """Ensure length counts the elements of any sequence."""
+    env = prelude.env()
+    assert run('(((1 2 3) quote) length)', env) == wtypes.Integer(3)
+    assert run('(() length)', env) == wtypes.Integer(0)
+    assert run('((5 range) length)', env) == wtypes.Integer(5)
+    assert run('(((3 range) 0 lazy-cons) length)', env) == \
+        wtypes.Integer(4)
+
+
+def test_nth():
+    """Ensure nth indexes sequences from zero."""
+    env = prelude.env()
+    assert run('(1 ((1 2 3) quote) nth)', env) == wtypes.Integer(2)
+    assert run('(3 (5 range) nth)', env) == wtypes.Integer(3)
+    run('(((((1 n +) ints) n lazy-cons) (n) lambda) ints define)', env)
+    assert run('(100 (0 ints) nth)', env) == wtypes.Integer(100)
+    with pytest.raises(exceptions.WispException, match='out of range'):
+        run('(3 ((1 2 3) quote) nth)', env)
+    with pytest.raises(exceptions.WispException, match='out of range'):
+        run('((1 0 -) ((1 2 3) quote) nth)', env)
+
+
+def test_append():
+    """Ensure append joins sequences in calling order."""
+    env = prelude.env()
+    assert run('(((3 4) quote) ((1 2) quote) append)', env) == \
+        parser.read('(1 2 3 4)')
+    assert run('(append)', env) == wtypes.List([])
+    assert isinstance(run('((2 range) (2 range) append)', env),
+                      wtypes.Vector)
+    run('(((((1 n +) ints) n lazy-cons) (n) lambda) ints define)', env)
+    assert run('(2 ((0 ints) ((1 2) quote) append) nth)', env) == \
+        wtypes.Integer(0)
+
+
+def test_reverse_and_last():
+    """Ensure reverse and last work from the end of sequences."""
+    env = prelude.env()
+    assert run('(((1 2 3) quote) reverse)', env) == parser.read('(3 2 1)')
+    assert run('((3 range) reverse)', env) == parser.read('(2 1 0)')
+    assert run('(((1 2 3) quote) last)', env) == wtypes.Integer(3)
+    assert run('((3 range) last)', env) == wtypes.Integer(2)
+    with pytest.raises(exceptions.WispException):
+        run('(() last)', env)
+
+
+def test_range():
+    """Ensure range counts like python's range."""
+    env = prelude.env()
+    assert run('(3 range)', env) == parser.read('(0 1 2)')
+    assert run('(5 2 range)', env) == parser.read('(2 3 4)')
+    assert run('((2 0 -) 0 4 range)', env) == parser.read('(4 2)')
+    with pytest.raises(exceptions.WispException):
+        run('(range)', env)
+    with pytest.raises(exceptions.WispException):
+        run('(0 5 0 range)', env)
+
+
+def test_range_lazy(monkeypatch):
+    """Ensure long ranges are lazy rather than held in memory."""
+    monkeypatch.setattr(prelude, 'RANGE_VECTOR_LIMIT', 2)
+    env = prelude.env()
+    assert isinstance(run('(2 range)', env), wtypes.Vector)
+    result = run('(3 range)', env)
+    assert isinstance(result, wtypes.LazySeq)
+    assert result == parser.read('(0 1 2)')
+
+
+def test_sort():
+    """Ensure sort orders by value, key or comparator, keeping ties."""
+    env = prelude.env()
+    assert run('(((3 1 2) quote) sort)', env) == parser.read('(1 2 3)')
+    assert run('((("b" "c" "a") quote) sort)', env) == \
+        parser.read('("a" "b" "c")')
+    assert run('(((1 0 -) 1 5 range) sort)', env) == parser.read('(2 3 4 5)')
+    assert run('(car (((3 a) (1 b) (3 c) (1 d)) quote) sort)', env) == \
+        parser.read('((1 b) (1 d) (3 a) (3 c))')
+    assert run('(((b a less?) (a b) lambda) ((3 1 2) quote) sort)',
+               env) == parser.read('(1 2 3)')
+    assert run('(((a b less?) (a b) lambda) ((3 1 2) quote) sort)',
+               env) == parser.read('(3 2 1)')
+    with pytest.raises(exceptions.WispException):
+        run('(((1 "a") quote) sort)', env)
+    with pytest.raises(exceptions.WispException):
+        run('((((1) (2)) quote) sort)', env)
+    with pytest.raises(exceptions.WispException, match='mixed types'):
+        run('(((1 #t) quote) sort)', env)
+    with pytest.raises(exceptions.WispException, match='mixed types'):
+        run('(car (((1) (#t)) quote) sort)', env)
+
+
+def run(source, env):
+    """Parse and evaluate the given source in the environment."""
+    return parser.parse_expr.parse_strict(source).eval(env)
+
+
 def quoted_list(elems):
     """Build a quoted list consisting of the given elements, safe from eval."""
     return wtypes.List([
@@ -0,0 +1,72 @@
+"""Tests for printing wisp values as wisp source."""
+
+import array
+import io
+import itertools
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.printer as printer
+import wisp.wtypes as wtypes
+
+
+def test_round_trip():
+    """Ensure printed values read back as the same value."""
+    source = '(1 (abc "a (b" ()) #t #f +)'
+    val = parser.read(source)
+    assert printer.dumps(val) == source
+    assert parser.read(printer.dumps(val)) == val
+
+
+def test_print_sequences():
+    """Ensure vectors and lazy sequences print as lists."""
+    val = wtypes.List([
+        wtypes.Vector(array.array('q', [1, 2])),
+        wtypes.LazySeq.from_iterable([wtypes.Symbol('x')]),
+    ])
+    assert printer.dumps(val) == '((1 2) (x))'
+
+
+def test_print_deeply_nested():
+    """Ensure lists nested past the recursion limit can be printed."""
+    source = '(' * 100000 + ')' * 100000
+    assert printer.dumps(parser.read(source)) == source
+
+
+def test_print_limit():
+    """Ensure long sequences are truncated, even infinite ones."""
+    numbers = wtypes.LazySeq.from_iterable(
+        map(wtypes.Integer, itertools.count())
+    )
+    assert printer.dumps(numbers, limit=3) == '(0 1 2 ...)'
+    val = parser.read('((1 2) (3))')
+    assert printer.dumps(val, limit=1) == '((1 ...) ...)'
+    assert printer.dumps(val, limit=2) == '((1 2) (3))'
+
+
+def test_writes_in_chunks(monkeypatch):
+    """Ensure output is written out as it is buffered."""
+    monkeypatch.setattr(printer, 'FLUSH_SIZE', 10)
+    writes = []
+
+    class File(io.StringIO):
+        def write(self, text):
+            writes.append(text)
+            return super().write(text)
+
+    f = File()
+    val = wtypes.List([wtypes.Integer(n) for n in range(100)])
+    printer.write(val, f)
+    assert len(writes) > 10
+    assert parser.read(f.getvalue()) == val
+
+
+def test_print_unreadable_values():
+    """Ensure values without a literal syntax are still printed."""
+    env = prelude.env()
+    assert printer.dumps(env[wtypes.Symbol('car')]) == '#<function>'
+    with pytest.raises(exceptions.WispException):
+        printer.dumps(wtypes.String('say "hi"'))
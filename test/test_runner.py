@@ -0,0 +1,68 @@
+"""Tests for running many source files."""
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.runner as runner
+
+
+@pytest.fixture
+def scripts(tmp_path):
+    """Write a library and some scripts using it, returning their paths."""
+    sources = {
+        'lib.wisp': '(((x x *) (x) lambda) square define)',
+        'a.wisp': '(3 x define)\n(x square)',
+        'b.wisp': '(x square)',
+        'c.wisp': '((1 2 3) quote)',
+    }
+    for name, source in sources.items():
+        (tmp_path / name).write_text(source)
+    return {name: str(tmp_path / name) for name in sources}
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_run_files(scripts, jobs):
+    """Ensure each file runs with the libraries, isolated from the others."""
+    paths = [scripts['a.wisp'], scripts['b.wisp'], scripts['c.wisp']]
+    results = list(runner.run_files(paths, jobs, [scripts['lib.wisp']]))
+    assert [result.path for result in results] == paths
+    assert [result.output for result in results] == ['9\n', '', '(1 2 3)\n']
+    assert results[0].error is None
+    assert 'x' in results[1].error
+    assert all(result.seconds >= 0 for result in results)
+
+
+def test_run_files_missing(scripts):
+    """Ensure a missing file fails on its own."""
+    results = list(runner.run_files(['missing.wisp', scripts['c.wisp']]))
+    assert results[0].error.startswith('can not open missing.wisp')
+    assert results[1].error is None
+
+
+def test_run_files_bad_library(scripts):
+    """Ensure libraries which can't be loaded fail the whole run."""
+    with pytest.raises(exceptions.WispException):
+        list(runner.run_files([scripts['a.wisp']], 1, ['missing.wisp']))
+
+
+def test_main(scripts, capsys):
+    """Ensure main reports each file in order, then their timings."""
+    status = runner.main([scripts['a.wisp'], scripts['b.wisp']], 1,
+                         [scripts['lib.wisp']])
+    out = capsys.readouterr().out.splitlines()
+    assert status == 1
+    assert out[0].startswith('==> %s: ok in ' % scripts['a.wisp'])
+    assert out[1] == '9'
+    assert out[2].startswith('==> %s: failed in ' % scripts['b.wisp'])
+    assert out[4] == '==> 2 files, 1 failed'
+    assert out[-1].startswith('total')
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_run_files_python_error(scripts, tmp_path, jobs):
+    """Ensure a file raising a non-wisp error fails on its own."""
+    (tmp_path / 'z.wisp').write_text('(0 1 /)')
+    paths = [scripts['c.wisp'], str(tmp_path / 'z.wisp')]
+    results = list(runner.run_files(paths, jobs))
+    assert results[0].error is None
+    assert results[1].error.startswith('ZeroDivisionError: ')
@@ -0,0 +1,88 @@
+"""Tests for the binary serialization format."""
+
+import array
+import io
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.serialize as serialize
+import wisp.wtypes as wtypes
+
+
+def test_round_trip():
+    """Ensure every kind of serializable value survives a round trip."""
+    expr = wtypes.List([
+        wtypes.Integer(0),
+        wtypes.Integer(-300),
+        wtypes.Integer(2 ** 70),
+        wtypes.String('snowman ☃'),
+        wtypes.Bool(True),
+        wtypes.Bool(False),
+        wtypes.Symbol('x'),
+        wtypes.List([]),
+        wtypes.List([wtypes.Symbol('x'), wtypes.List([wtypes.Symbol('y')])]),
+        wtypes.Vector(array.array('q', [1, -2, 3])),
+    ])
+    assert serialize.loads(serialize.dumps(expr)) == expr
+
+
+def test_symbols_are_shared():
+    """Ensure repeated symbols are written only once."""
+    once = serialize.dumps(wtypes.List([wtypes.Symbol('long-symbol')]))
+    twice = serialize.dumps(wtypes.List([wtypes.Symbol('long-symbol')] * 2))
+    assert len(twice) - len(once) == 2
+
+
+def test_lazy_seq():
+    """Ensure lazy sequences are written out and read back as lists."""
+    seq = wtypes.LazySeq.from_iterable(wtypes.Integer(i) for i in range(3))
+    assert serialize.loads(serialize.dumps(seq)) == wtypes.List([
+        wtypes.Integer(0), wtypes.Integer(1), wtypes.Integer(2)
+    ])
+
+
+def test_deep_nesting():
+    """Ensure deeply nested lists don't exhaust the python stack."""
+    expr = wtypes.List([])
+    for _ in range(10000):
+        expr = wtypes.List([expr])
+    data = serialize.dumps(expr)
+
+    decoded = serialize.loads(data)
+    for _ in range(10000):
+        decoded = decoded.items[0]
+    assert decoded == wtypes.List([])
+
+
+def test_stream(tmp_path):
+    """Ensure streams of values are read back lazily, in order."""
+    path = tmp_path / 'stream.bin'
+    values = [
+        wtypes.List([wtypes.Symbol('row'), wtypes.Integer(i)])
+        for i in range(100)
+    ]
+    with open(path, 'wb') as f:
+        serialize.dump_stream(iter(values), f)
+
+    with open(path, 'rb') as f:
+        assert list(serialize.load_stream(f)) == values
+
+    buf = io.BytesIO(path.read_bytes())
+    assert list(serialize.load_stream(buf)) == values
+
+
+def test_bad_input():
+    """Ensure we raise exceptions for malformed input."""
+    with pytest.raises(exceptions.WispException):
+        serialize.loads(b'nope')
+
+    data = serialize.dumps(wtypes.String('abc'))
+    with pytest.raises(exceptions.WispException):
+        serialize.loads(data[:-1])
+
+    with pytest.raises(exceptions.WispException, match='invalid string'):
+        serialize.loads(data[:-1] + b'\xff')
+
+    with pytest.raises(exceptions.WispException):
+        serialize.dumps(wtypes.Function(lambda args, env: args[0]))
@@ -0,0 +1,66 @@
+"""Tests for reading source files of many top-level forms."""
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.sources as sources
+import wisp.wtypes as wtypes
+
+SOURCE = '''(1 x define)
+("a (b" s define)
+
+  (((x 1 +)
+    (x) lambda) inc define)
+"c)" 42 y
+'''
+
+
+def test_split_forms():
+    """Ensure forms are split on balanced parens, skipping strings."""
+    assert sources.split_forms(SOURCE) == [
+        (1, '(1 x define)'),
+        (2, '("a (b" s define)'),
+        (4, '(((x 1 +)\n    (x) lambda) inc define)'),
+        (6, '"c)"'),
+        (6, '42'),
+        (6, 'y'),
+    ]
+
+
+@pytest.mark.parametrize('source', [
+    '(1 2', '(1 x define))', '("abc)', '"abc',
+])
+def test_split_forms_unbalanced(source):
+    """Ensure unbalanced parens and unterminated strings are reported."""
+    with pytest.raises(exceptions.WispException):
+        sources.split_forms(source)
+
+
+def test_read_forms():
+    """Ensure forms are parsed in order."""
+    forms = sources.read_forms(SOURCE)
+    assert forms[1] == wtypes.List([
+        wtypes.String('a (b'), wtypes.Symbol('s'), wtypes.Symbol('define')
+    ])
+    assert forms[3:] == [
+        wtypes.String('c)'), wtypes.Integer(42), wtypes.Symbol('y')
+    ]
+
+
+def test_read_forms_in_parallel():
+    """Ensure parsing across processes returns the same forms in order."""
+    text = '\n'.join('((%d x%d +) y%d define)' % (i, i, i) for i in range(50))
+    assert sources.read_forms(text, workers=2) == sources.read_forms(text)
+
+
+def test_read_forms_errors():
+    """Ensure parse errors report the line of the bad form."""
+    with pytest.raises(exceptions.WispException, match='line 2'):
+        sources.read_forms('(1 x define)\n(2x y define)', workers=2)
+
+
+def test_load(tmp_path):
+    """Ensure forms are read from a file."""
+    path = tmp_path / 'forms.wisp'
+    path.write_text(SOURCE)
+    assert sources.load(str(path)) == sources.read_forms(SOURCE)
@@ -0,0 +1,112 @@
+"""Tests for tasks and channels."""
+
+import asyncio
+
+import pytest  # type: ignore
+
+import wisp.exceptions as exceptions
+import wisp.interop as interop
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.tasks as tasks
+import wisp.wtypes as wtypes
+
+# Sends 1, 2 and 3 over the channel, returning 4.
+PRODUCER = """(((((((1 i +) recur) (i ch send) begin) else)
+                (i (4 i eq?)) cond) ((1 i)) loop) (ch) lambda)"""
+
+# Sends its name over the channel twice, yielding after each.
+TAKE_TURNS = """((((yield) (name ch send) (yield) (name ch send) begin)
+                 (name ch) lambda) take-turns define)"""
+
+
+def run(source, env):
+    """Parse and evaluate wisp source."""
+    return parser.read(source).eval(env)
+
+
+def test_channels():
+    """Ensure values sent by a task are received in order."""
+    env = prelude.env()
+    run('(%s producer define)' % PRODUCER, env)
+    run('((chan) ch define)', env)
+    run('((ch producer spawn) t define)', env)
+    assert run('(ch recv)', env) == wtypes.Integer(1)
+    assert run('(ch recv)', env) == wtypes.Integer(2)
+    assert run('(ch recv)', env) == wtypes.Integer(3)
+    assert run('(t join)', env) == wtypes.Integer(4)
+
+
+def test_tasks_take_turns():
+    """Ensure yielding lets the other tasks run."""
+    env = prelude.env()
+    run(TAKE_TURNS, env)
+    run('((10 chan) ch define)', env)
+    run('((ch "a" take-turns spawn) a define)', env)
+    run('((ch "b" take-turns spawn) b define)', env)
+    run('(b join)', env)
+    run('(a join)', env)
+    received = [run('(ch recv)', env).val for _ in range(4)]
+    assert received == ['a', 'b', 'a', 'b']
+
+
+def test_tasks_have_their_own_stacks():
+    """Ensure tasks blocked part way through a call keep their locals."""
+    env = prelude.env()
+    run('((chan) ch define)', env)
+    run('((((ch recv) x +) (x) lambda) add define)', env)
+    run('((1 add spawn) a define)', env)
+    run('((10 add spawn) b define)', env)
+    run('((200 ch send) (100 ch send) begin)', env)
+    assert run('(a join)', env) == wtypes.Integer(101)
+    assert run('(b join)', env) == wtypes.Integer(210)
+
+
+def test_sleep():
+    """Ensure sleeping tasks wake up in order of their deadlines."""
+    env = prelude.env()
+    run('((10 chan) ch define)', env)
+    run('((((name ch send) (ms sleep) begin) (name ms) lambda) later define)',
+        env)
+    run('((40 "slow" later spawn) slow define)', env)
+    run('((5 "fast" later spawn) fast define)', env)
+    run('(slow join)', env)
+    assert run('(ch recv)', env) == wtypes.String('fast')
+    assert run('(ch recv)', env) == wtypes.String('slow')
+
+
+def test_deadlock():
+    """Ensure waiting on a channel nothing will send to raises."""
+    env = prelude.env()
+    run('((chan) ch define)', env)
+    with pytest.raises(exceptions.WispException, match='deadlock'):
+        run('(ch recv)', env)
+    run('(((ch recv) (ch) lambda) stuck define)', env)
+    run('((ch stuck spawn) t define)', env)
+    with pytest.raises(exceptions.WispException, match='deadlock'):
+        run('(t join)', env)
+
+
+def test_join_raises_task_errors():
+    """Ensure errors raised in a task are raised by join."""
+    env = prelude.env()
+    run('((((x car) () lambda) spawn) t define)', env)
+    with pytest.raises(exceptions.WispException, match='No binding'):
+        run('(t join)', env)
+
+
+def test_eval_async():
+    """Ensure tasks waiting on coroutines only block themselves."""
+    env = prelude.env()
+
+    async def double(n: int) -> int:
+        await asyncio.sleep(0.01)
+        return n * 2
+
+    interop.register(env, 'double', double)
+    run('(((n double) (n) lambda) worker define)', env)
+    run('((1 worker spawn) a define)', env)
+    run('((2 worker spawn) b define)', env)
+    expr = parser.read('((a join) (b join) +)')
+    result = asyncio.run(tasks.eval_async(expr, env))
+    assert result == wtypes.Integer(6)
@@ -0,0 +1,71 @@
+"""Tests for re-evaluating the forms of edited sources."""
+
+import wisp.prelude as prelude
+import wisp.watch as watch
+import wisp.wtypes as wtypes
+
+
+def lines(outcomes):
+    """Return the lines of the forms evaluated."""
+    return [outcome.line for outcome in outcomes]
+
+
+def test_update_evaluates_every_form():
+    """Ensure the first version of a source has every form evaluated."""
+    watcher = watch.Watcher(prelude.env())
+    outcomes = watcher.update('(1 x define)\n((x 1 +) y define)\ny')
+    assert lines(outcomes) == [1, 2, 3]
+    assert outcomes[2].result == wtypes.Integer(2)
+    assert all(outcome.error is None for outcome in outcomes)
+
+
+def test_update_unchanged():
+    """Ensure forms which did not change are not evaluated again."""
+    watcher = watch.Watcher(prelude.env())
+    text = '(1 x define)\n((x 1 +) y define)'
+    watcher.update(text)
+    assert watcher.update(text) == []
+    assert watcher.update(text + '\n') == []
+
+
+def test_update_dependents():
+    """Ensure a changed form is evaluated again along with its dependents."""
+    env = prelude.env()
+    watcher = watch.Watcher(env)
+    watcher.update('(1 x define)\n((x 1 +) y define)\n'
+                   '((y 2 *) w define)\n(2 z define)')
+    outcomes = watcher.update('(5 x define)\n((x 1 +) y define)\n'
+                              '((y 2 *) w define)\n(2 z define)')
+    assert lines(outcomes) == [1, 2, 3]
+    assert env[wtypes.Symbol('w')] == wtypes.Integer(12)
+
+
+def test_update_removed():
+    """Ensure the names of removed forms are unbound."""
+    env = prelude.env()
+    watcher = watch.Watcher(env)
+    watcher.update('(1 x define)\n(2 z define)\n((z 1 +) y define)')
+    outcomes = watcher.update('(1 x define)\n((z 1 +) y define)')
+    assert lines(outcomes) == [2]
+    assert outcomes[0].error is not None
+    assert 'z' not in env.global_scope()
+
+
+def test_update_retries_failures():
+    """Ensure failing forms are evaluated again until they succeed."""
+    watcher = watch.Watcher(prelude.env())
+    outcomes = watcher.update('(x 1 +)\n(2 z define)')
+    assert outcomes[0].error is not None
+    text = '(1 x define)\n(x 1 +)\n(2 z define)'
+    assert lines(watcher.update(text)) == [1, 2]
+    assert watcher.update(text) == []
+
+
+def test_update_python_error():
+    """Ensure a form raising a non-wisp error fails on its own."""
+    watcher = watch.Watcher(prelude.env())
+    outcomes = watcher.update('(1 x define)\n(0 1 /)\n(x 1 +)')
+    assert lines(outcomes) == [1, 2, 3]
+    assert outcomes[1].error.startswith('ZeroDivisionError: ')
+    assert outcomes[2].result == wtypes.Integer(2)
+    assert lines(watcher.update('(1 x define)\n(1 1 /)\n(x 1 +)')) == [2]
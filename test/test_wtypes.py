@@ -55,3 +55,38 @@ def test_eval_list_without_a_func():
     """Ensure an error is raised when applying non-functions."""
     with pytest.raises(exceptions.WispException):
         wtypes.List([wtypes.Integer(1)]).eval({})
+
+
+def test_lazy_seq_equality():
+    """Ensure lazy sequences compare element-wise against lists."""
+    seq = wtypes.LazySeq.from_iterable(
+        wtypes.Integer(i) for i in range(3)
+    )
+    assert seq == wtypes.List([
+        wtypes.Integer(0), wtypes.Integer(1), wtypes.Integer(2)
+    ])
+    assert seq != wtypes.List([wtypes.Integer(0)])
+    assert wtypes.LazySeq.from_iterable([]) == wtypes.List([])
+
+
+def test_promise_memoizes():
+    """Ensure promises evaluate their expression only once."""
+    env = wisp.env.Environment({'a': wtypes.Integer(1)})
+    promise = wtypes.Promise(wtypes.Symbol('a'), {})
+    assert promise.force(env) == wtypes.Integer(1)
+
+    env.add_binding(wtypes.Symbol('a'), wtypes.Integer(2))
+    assert promise.force(env) == wtypes.Integer(1)
+
+
+def test_repr_deeply_nested_list():
+    """Ensure lists nested past the recursion limit can be printed."""
+    depth = 100000
+    val = wtypes.List([])
+    for _ in range(depth):
+        val = wtypes.List([val, wtypes.Integer(1)])
+    assert repr(val) == (
+        'List(items=[' * depth +
+        'List(items=[])' +
+        ', Integer(val=1)])' * depth
+    )
@@ -0,0 +1,213 @@
+"""Static analysis of wisp expressions."""
+
+from dataclasses import dataclass
+import typing
+
+import wisp.exceptions as exceptions
+import wisp.wtypes as wtypes
+
+BEGIN = wtypes.Symbol('begin')
+COND = wtypes.Symbol('cond')
+DEFINE = wtypes.Symbol('define')
+DEFMACRO = wtypes.Symbol('defmacro')
+LAMBDA = wtypes.Symbol('lambda')
+LOOP = wtypes.Symbol('loop')
+QUOTE = wtypes.Symbol('quote')
+RECUR = wtypes.Symbol('recur')
+
+ELSE = wtypes.Symbol('else')
+
+# The kinds of problem check_calls finds.
+ARITY = 'arity'
+UNBOUND = 'unbound'
+
+# Return the value a global name is bound to, or None if it is unbound.
+Lookup = typing.Callable[[str], typing.Optional[wtypes.Expression]]
+
+
+@dataclass
+class Problem:
+    """A problem found in a form without evaluating it."""
+    kind: str
+    message: str
+
+
+def symbols(form: wtypes.Expression) -> typing.Set[str]:
+    """Return the names of every symbol referenced by the form.
+
+    Symbols within quoted forms are data rather than references, so they
+    are skipped.
+    """
+    names = set()
+    stack = [form]
+    while stack:
+        expr = stack.pop()
+        if isinstance(expr, wtypes.Symbol):
+            names.add(expr.name)
+        elif isinstance(expr, wtypes.List):
+            if len(expr.items) == 2 and expr.items[-1] == QUOTE:
+                names.add(QUOTE.name)
+            else:
+                stack.extend(expr.items)
+    return names
+
+
+def defines(form: wtypes.Expression) -> typing.Set[str]:
+    """Return the names the form binds in the frame it is evaluated in.
+
+    Definitions within lambdas bind names in the lambda's own frame, and
+    those within quoted forms are data, so both are skipped.
+    """
+    names = set()
+    stack = [form]
+    while stack:
+        expr = stack.pop()
+        if not isinstance(expr, wtypes.List) or not expr.items:
+            continue
+        head, args = expr.items[-1], expr.args()
+        if head in (QUOTE, LAMBDA):
+            continue
+        elif head in (DEFINE, DEFMACRO) and args:
+            if isinstance(args[0], wtypes.Symbol):
+                names.add(args[0].name)
+        stack.extend(expr.items)
+    return names
+
+
+def check_recur(form: wtypes.Expression, tail: bool = False):
+    """Raise an exception if recur is used outside the tail of a loop.
+
+    A recur is in tail position when its value is the value of the body of
+    its enclosing loop, either directly or as the result of a cond clause
+    or the first expression of a begin. Lambdas start a fresh body, so a
+    recur may not jump out of one into a loop around it. Set tail when
+    checking the body of a loop itself.
+    """
+    stack = [(form, tail)]
+    while stack:
+        expr, tail = stack.pop()
+        if not isinstance(expr, wtypes.List) or not expr.items:
+            continue
+        head, args = expr.items[-1], expr.args()
+        name = head.name if isinstance(head, wtypes.Symbol) else None
+        if name == QUOTE.name:
+            continue
+        elif name == RECUR.name and not tail:
+            raise exceptions.WispException(
+                'recur outside of tail position: %s' % expr
+            )
+        elif name == LOOP.name and len(args) == 2:
+            bindings, body = args
+            stack.append((bindings, False))
+            stack.append((body, True))
+        elif name == COND.name:
+            for clause in args:
+                if isinstance(clause, wtypes.List) and len(clause.items) == 2:
+                    body, test = clause.items
+                    stack.append((test, False))
+                    stack.append((body, tail))
+                else:
+                    stack.append((clause, False))
+        elif name == BEGIN.name and args:
+            stack.extend((arg, False) for arg in args[:-1])
+            stack.append((args[-1], tail))
+        else:
+            stack.extend((item, False) for item in expr.items)
+
+
+def check_calls(form: wtypes.Expression,
+                lookup: Lookup,
+                shadowed: typing.AbstractSet[str] = frozenset()
+                ) -> typing.List[Problem]:
+    """Check the calls in an expanded form against what they call.
+
+    Calls to known functions, special forms and macros are checked for the
+    number of arguments they pass, and every symbol the form refers to is
+    checked to be bound. Symbols in shadowed, along with lambda parameters,
+    loop variables and local definitions, are bound locally, so calls to
+    them can't be checked. Calls which pass the check record the value
+    they were checked against, so may skip checking when they run.
+    """
+    problems = []
+    stack = [(form, shadowed)]
+    while stack:
+        expr, scope = stack.pop()
+        if isinstance(expr, wtypes.Symbol):
+            if expr.name not in scope and lookup(expr.name) is None:
+                problems.append(
+                    Problem(UNBOUND, 'unbound symbol %s' % expr.name)
+                )
+            continue
+        elif not isinstance(expr, wtypes.List) or not expr.items:
+            continue
+
+        head, args = expr.items[-1], expr.args()
+        if not isinstance(head, wtypes.Symbol) or head.name in scope:
+            stack.extend((item, scope) for item in expr.items)
+            continue
+        target = lookup(head.name)
+        if target is None:
+            problems.append(
+                Problem(UNBOUND, 'unbound symbol %s' % head.name)
+            )
+            stack.extend((arg, scope) for arg in args)
+            continue
+
+        arity = getattr(target, 'arity', None)
+        if arity is not None and len(args) != arity:
+            problems.append(Problem(
+                ARITY, '%s called with %d arguments, requires %d' % (
+                    head.name, len(args), arity)
+            ))
+        elif arity is not None:
+            expr.checked = target
+
+        if isinstance(target, wtypes.SpecialForm):
+            stack.extend(__special_form_args(head, args, scope))
+        elif not isinstance(target, wtypes.Macro):
+            stack.extend((arg, scope) for arg in args)
+    return problems
+
+
+def __special_form_args(head: wtypes.Symbol,
+                        args: typing.List[wtypes.Expression],
+                        scope: typing.AbstractSet[str]
+                        ) -> typing.List[typing.Tuple[
+                            wtypes.Expression, typing.AbstractSet[str]]]:
+    """Return the args of a special form which are evaluated as code.
+
+    Each is paired with the names bound locally where it is evaluated.
+    """
+    if head in (QUOTE, DEFMACRO):
+        return []
+    elif head == DEFINE and len(args) == 2:
+        return [(args[1], scope)]
+    elif head == LAMBDA and len(args) == 2:
+        params, body = args
+        if isinstance(params, wtypes.List):
+            names = {param.name for param in params.items
+                     if isinstance(param, wtypes.Symbol)}
+            return [(body, scope | names | defines(body))]
+    elif head == LOOP and len(args) == 2:
+        bindings, body = args
+        if isinstance(bindings, wtypes.List):
+            names = set()
+            evaluated = []
+            for binding in bindings.items:
+                if isinstance(binding, wtypes.List) and (
+                        len(binding.items) == 2):
+                    init, name = binding.items
+                    evaluated.append((init, scope))
+                    if isinstance(name, wtypes.Symbol):
+                        names.add(name.name)
+            return evaluated + [(body, scope | names)]
+    elif head == COND:
+        evaluated = []
+        for clause in args:
+            if isinstance(clause, wtypes.List) and len(clause.items) == 2:
+                body, test = clause.items
+                evaluated.append((body, scope))
+                if test != ELSE:
+                    evaluated.append((test, scope))
+        return evaluated
+    return [(arg, scope) for arg in args]
@@ -0,0 +1,105 @@
+"""Limit the work evaluating an expression may do.
+
+A budget caps the number of steps an evaluation may take, where every
+function call is a step, the depth of its call stack and the time it may
+run for. Running over any of them raises BudgetExceeded.
+
+Checking every limit on every step would slow evaluation down, so steps
+are counted down from an interval instead, and the limits are only
+checked when the interval runs out. The deadline may therefore be
+overrun by up to an interval's worth of steps. Compiled code counts its
+steps in a local variable, spending them against the budget an interval
+at a time, and whatever is left when it returns. Depth is checked as each
+frame is added.
+"""
+
+import time
+import typing
+
+import wisp.env
+import wisp.exceptions as exceptions
+import wisp.wtypes as wtypes
+
+# Check the limits once every this many steps.
+CHECK_INTERVAL = 1024
+
+
+class Budget:
+    """The limits on an evaluation, and how much of them is left.
+
+    Evaluation decrements countdown on each step, calling tick once it
+    goes negative, or spends many steps at once.
+    """
+    __slots__ = ('steps', 'depth', 'seconds', 'frames', 'deadline',
+                 'remaining', 'countdown')
+
+    def __init__(self,
+                 steps: typing.Optional[int] = None,
+                 depth: typing.Optional[int] = None,
+                 seconds: typing.Optional[float] = None,
+                 frames: int = 1):
+        self.steps = steps
+        self.depth = depth
+        self.seconds = seconds
+        # The most frames the environment may hold, counting those it
+        # held before the evaluation started.
+        self.frames = None if depth is None else frames + depth
+        self.deadline = None if seconds is None \
+            else time.monotonic() + seconds
+        # The steps left once the current interval is used up.
+        self.remaining = steps
+        self.countdown = 0
+        self.__refill()
+
+    def tick(self):
+        """Check the limits, then start counting down another interval.
+
+        The steps which overran the interval count against the new one.
+        Raises BudgetExceeded if the deadline has passed or too few steps
+        are left.
+        """
+        overrun = -self.countdown
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise exceptions.BudgetExceeded(
+                'evaluation exceeded its deadline of %gs' % self.seconds
+            )
+        elif self.remaining is not None and self.remaining < overrun:
+            raise exceptions.BudgetExceeded(
+                'evaluation exceeded its budget of %d steps' % self.steps
+            )
+        self.__refill()
+        self.countdown -= overrun
+
+    def spend(self, steps: int):
+        """Count steps taken all at once, at most an interval's worth."""
+        self.countdown -= steps
+        if self.countdown < 0:
+            self.tick()
+
+    def __refill(self):
+        """Start counting down the next interval."""
+        interval = CHECK_INTERVAL
+        if self.remaining is not None:
+            interval = min(interval, self.remaining)
+            self.remaining -= interval
+        self.countdown = interval
+
+
+def evaluate(expr: wtypes.Expression,
+             env: wisp.env.Environment,
+             steps: typing.Optional[int] = None,
+             depth: typing.Optional[int] = None,
+             seconds: typing.Optional[float] = None) -> wtypes.Expression:
+    """Evaluate an expression within a budget.
+
+    Steps is the most function calls the evaluation may make, depth the
+    most frames it may add to the call stack and seconds how long it may
+    run for. Any budget the environment already had is set aside until
+    the evaluation is done.
+    """
+    saved = env.budget
+    env.budget = Budget(steps, depth, seconds, len(env.frames))
+    try:
+        return expr.eval(env)
+    finally:
+        env.budget = saved
@@ -0,0 +1,93 @@
+"""Report the problems in a wisp source file without running it.
+
+Each top-level form is checked for calls to known functions with the wrong
+number of arguments and for references to unbound symbols. Lambdas defined
+at the top level of the file are known by the number of parameters they
+take, and every name the file defines counts as bound, wherever in the file
+it is defined. Macros are the exception to not running the file: they are
+defined as they are reached, as the forms using them can't be checked
+without expanding them.
+"""
+
+import typing
+
+import wisp.analysis as analysis
+import wisp.env
+import wisp.exceptions as exceptions
+import wisp.files as files
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.sources as sources
+import wisp.wtypes as wtypes
+
+
+def report(path: str) -> typing.List[str]:
+    """Return a message for each problem found in a source file.
+
+    Messages are prefixed with the path and the line of the top-level form
+    the problem was found in.
+    """
+    with files.open_file(path, 'r') as f:
+        try:
+            text = f.read()
+        except UnicodeDecodeError as e:
+            raise files.decode_error(path, e)
+    try:
+        forms = sources.split_forms(text)
+    except exceptions.WispException as e:
+        return ['%s:%s' % (path, e)]
+
+    messages = []
+    parsed = []
+    for line, source in forms:
+        try:
+            parsed.append((line, parser.read(source, line)))
+        except exceptions.WispException as e:
+            messages.append('%s:%s' % (path, e))
+
+    env = prelude.env()
+    declared: typing.Dict[str, wtypes.Expression] = {}
+    for _, form in parsed:
+        declared.update(__declarations(form))
+    for line, form in parsed:
+        try:
+            if isinstance(form, wtypes.List) and form.items and (
+                    form.items[-1] == analysis.DEFMACRO):
+                form.eval(env)
+            problems = [problem.message
+                        for problem in prelude.check(form, env, declared)]
+        except exceptions.WispException as e:
+            problems = [str(e)]
+        messages.extend('%s:line %d: %s' % (path, line, problem)
+                        for problem in problems)
+    return messages
+
+
+def __declarations(form: wtypes.Expression
+                   ) -> typing.Dict[str, wtypes.Expression]:
+    """Return stand-ins for the values of the names a form defines.
+
+    Lambdas defined directly by the form stand in as functions taking as
+    many arguments as they have parameters.
+    """
+    declared: typing.Dict[str, wtypes.Expression] = {
+        name: wtypes.Function(__not_run) for name in analysis.defines(form)
+    }
+    if not isinstance(form, wtypes.List) or len(form.items) != 3 or (
+            form.items[-1] != analysis.DEFINE):
+        return declared
+    val, name = form.items[:2]
+    if isinstance(val, wtypes.List) and len(val.items) == 3 and (
+            val.items[-1] == analysis.LAMBDA):
+        params = val.items[1]
+        if isinstance(name, wtypes.Symbol) and isinstance(
+                params, wtypes.List):
+            declared[name.name] = wtypes.Function(
+                __not_run, len(params.items))
+    return declared
+
+
+def __not_run(args: typing.List[wtypes.Expression],
+              env: wisp.env.Environment) -> wtypes.Expression:
+    """Stand in for a function defined by a file which is not run."""
+    raise exceptions.WispException('can not call functions while checking')
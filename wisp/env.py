@@ -5,6 +5,32 @@ import wisp.exceptions as exceptions
 import wisp.wtypes as wtypes
 
 
+class Cell(wtypes.Expression):
+    """A mutable box holding a variable captured by a closure.
+
+    Captured variables are stored as cells in the frames of both the
+    closure and the scope it was created in, so that mutations made
+    through set! are seen by each. Looking up a variable held in a cell
+    returns the cell's value.
+
+    A cell may be created empty for a variable which is yet to be defined,
+    so closures created before the definition still see it. Empty cells
+    are skipped when looking up variables.
+    """
+    __slots__ = ('val',)
+
+    def __init__(self, val: typing.Optional[wtypes.Expression] = None):
+        self.val = val
+
+    def eval(self, env: 'Environment') -> wtypes.Expression:
+        if self.val is None:
+            raise exceptions.WispException('unbound cell')
+        return self.val
+
+    def __repr__(self) -> str:
+        return 'Cell(%r)' % self.val
+
+
 class Environment:
     """An environment of wisp bindings in which expressions are evaluated.
 
@@ -14,11 +40,36 @@ class Environment:
     local scope frames to mess about it.
     """
     frames: typing.Deque[typing.Dict[str, wtypes.Expression]]
+    watchers: typing.Dict[str, typing.List[typing.Callable[[], None]]]
+    # The scheduler running tasks spawned in the env, once there are any.
+    scheduler: typing.Any
+    # The budget limiting the evaluation in progress, if it is limited.
+    budget: typing.Any
+    # The shared heap holding globals not yet looked up, if there is one.
+    heap: typing.Any
 
     def __init__(self,
                  frame: typing.Optional[
                      typing.Dict[str, wtypes.Expression]] = None):
         self.frames = collections.deque([frame or {}])
+        self.watchers = {}
+        self.scheduler = None
+        self.budget = None
+        self.heap = None
+
+    def fork(self) -> 'Environment':
+        """Return an environment with its own call stack.
+
+        The new environment shares the global scope, and everything else
+        global, with this one, so tasks may each run in their own.
+        """
+        env = Environment()
+        env.frames[0] = self.global_scope()
+        env.watchers = self.watchers
+        env.scheduler = self.scheduler
+        env.budget = self.budget
+        env.heap = self.heap
+        return env
 
     def global_scope(self) -> typing.Dict[str, wtypes.Expression]:
         """Return the frame representing the global scope."""
@@ -36,11 +87,39 @@ class Environment:
         else:
             return self.frames[0]
 
+    def capture(self, names: typing.Iterable[str]) -> typing.Dict[str, Cell]:
+        """Return cells for the local variables among the given names.
+
+        Captured variables are moved into cells in the local frame, if they
+        are not in one already, so they may be shared with a closure.
+        Globals are looked up when used, so never need capturing.
+        """
+        cells: typing.Dict[str, Cell] = {}
+        frame = self.local_scope()
+        for name in names:
+            if name in frame:
+                val = frame[name]
+                if isinstance(val, Cell):
+                    cells[name] = val
+                else:
+                    cells[name] = frame[name] = Cell(val)
+        return cells
+
     def add_frame(self,
                   env: typing.Optional[
                       typing.Dict[str, wtypes.Expression]] = None):
-        """Add a new frame to the environment. Defaults to an empty frame."""
+        """Add a new frame to the environment. Defaults to an empty frame.
+
+        Raises an exception if the budget allows no more frames.
+        """
         self.frames.appendleft(env or {})
+        budget = self.budget
+        if budget is not None and budget.frames is not None and (
+                len(self.frames) > budget.frames):
+            self.frames.popleft()
+            raise exceptions.BudgetExceeded(
+                'evaluation exceeded its call depth of %d' % budget.depth
+            )
 
     def pop_frame(self) -> typing.Dict[str, wtypes.Expression]:
         """Remove the current frame from the environment."""
@@ -49,17 +128,38 @@ class Environment:
     def __getitem__(self, key: wtypes.Symbol) -> wtypes.Expression:
         """Search each frame in the environment for the symbol.
 
+        Globals are loaded from the heap the first time they are looked up.
         Raises an exception if the symbol can not be found in any frame.
         """
         for frame in (self.local_scope(), self.global_scope()):
             if key.name in frame:
-                return frame[key.name]
-        else:
-            raise exceptions.WispException('No binding for %s' % key)
+                val = frame[key.name]
+                if not isinstance(val, Cell):
+                    return val
+                elif val.val is not None:
+                    return val.val
+        if self.__load(key.name):
+            return self.global_scope()[key.name]
+        raise exceptions.WispException('No binding for %s' % key)
+
+    def watch(self, name: str, callback: typing.Callable[[], None]):
+        """Call the callback the next time the global name is rebound."""
+        self.watchers.setdefault(name, []).append(callback)
 
     def add_binding(self, key: wtypes.Symbol, val: wtypes.Expression):
         """Bind the symbol to the given value in the current frame."""
-        self.frames[0][key.name] = val
+        cell = self.frames[0].get(key.name)
+        if isinstance(cell, Cell):
+            cell.val = val
+        else:
+            self.frames[0][key.name] = val
+        if len(self.frames) <= 1:
+            self.__notify(key.name)
+
+    def remove_binding(self, key: wtypes.Symbol):
+        """Remove the symbol's global binding, if it has one."""
+        if self.global_scope().pop(key.name, None) is not None:
+            self.__notify(key.name)
 
     def __setitem__(self, key: wtypes.Symbol, val: wtypes.Expression):
         """Set a symbol's value in whichever frame it is first bound.
@@ -68,7 +168,33 @@ class Environment:
         """
         for frame in (self.local_scope(), self.global_scope()):
             if key.name in frame:
-                frame[key.name] = val
-                break
+                cell = frame[key.name]
+                if not isinstance(cell, Cell):
+                    frame[key.name] = val
+                    break
+                elif cell.val is not None:
+                    cell.val = val
+                    break
         else:
-            raise exceptions.WispException('No binding for %s' % key)
+            if self.heap is None or key.name not in self.heap:
+                raise exceptions.WispException('No binding for %s' % key)
+            # Globals still in the heap are rebound without loading them.
+            frame = self.global_scope()
+            frame[key.name] = val
+        if frame is self.global_scope():
+            self.__notify(key.name)
+
+    def __load(self, name: str) -> bool:
+        """Bind a global to its value in the heap, if it is held there.
+
+        Returns whether it was.
+        """
+        if self.heap is None or name not in self.heap:
+            return False
+        self.global_scope()[name] = self.heap[name]
+        return True
+
+    def __notify(self, name: str):
+        """Call and forget the callbacks watching the global name."""
+        for callback in self.watchers.pop(name, []):
+            callback()
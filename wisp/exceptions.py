@@ -3,8 +3,32 @@ class WispException(Exception):
     pass
 
 
+class Recur(WispException):
+    """Raised by recur to run the enclosing loop again with new values.
+
+    Loops catch it, so one escaping them means recur was used outside of
+    a loop.
+    """
+
+    def __init__(self, vals):
+        super().__init__('recur outside of loop')
+        self.vals = vals
+
+
+class BudgetExceeded(WispException):
+    """Raised when an evaluation runs over one of the limits of its budget."""
+    pass
+
+
 def type_error(expected, val):
     """Build an exception message about how val should be a different type."""
     return WispException(
         'expected %s, not %s' % (expected, val)
     )
+
+
+def arity_error(given, required):
+    """Build an exception about a call with the wrong number of arguments."""
+    return WispException(
+        'called with %d arguments, requires %d' % (given, required)
+    )
@@ -0,0 +1,88 @@
+"""Stream the contents of files as wisp values.
+
+Files are read incrementally so that wisp code may fold over files far
+larger than memory.
+"""
+
+import mmap
+import os
+import typing
+
+import wisp.exceptions as exceptions
+import wisp.wtypes as wtypes
+
+
+def iter_lines(path: str,
+               encoding: str = 'utf-8') -> typing.Iterator[wtypes.String]:
+    """Iterate over the lines of the file at path as wisp strings.
+
+    The file is memory-mapped and lines are decoded one at a time, without
+    their trailing line endings. Raises an exception if the file can not be
+    opened.
+    """
+    f = open_file(path, 'rb')
+    return __mapped_lines(f, path, encoding)
+
+
+def iter_chunks(path: str,
+                size: int,
+                encoding: str = 'utf-8') -> typing.Iterator[wtypes.String]:
+    """Iterate over the file at path in strings of size characters.
+
+    The final chunk holds whatever remains and may be shorter. Raises an
+    exception if size is not positive or the file can not be opened.
+    """
+    if size <= 0:
+        raise exceptions.WispException(
+            'chunk size must be positive, not %d' % size
+        )
+    f = open_file(path, 'r', encoding=encoding)
+    return __chunks(f, path, size)
+
+
+def open_file(path: str, mode: str, **kwargs) -> typing.IO:
+    """Open the file at path, raising a WispException on failure."""
+    try:
+        return open(path, mode, **kwargs)
+    except OSError as e:
+        raise exceptions.WispException(
+            'can not open %s: %s' % (path, e.strerror)
+        )
+
+
+def decode_error(path: str,
+                 e: UnicodeDecodeError) -> exceptions.WispException:
+    """Build an exception about a file which isn't in the right encoding."""
+    return exceptions.WispException('can not decode %s: %s' % (path, e))
+
+
+def __mapped_lines(f: typing.IO,
+                   path: str,
+                   encoding: str) -> typing.Iterator[wtypes.String]:
+    """Yield each line in the memory-mapped file, closing it when done."""
+    with f:
+        # mmap refuses to map empty files.
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b''):
+                try:
+                    text = line.rstrip(b'\r\n').decode(encoding)
+                except UnicodeDecodeError as e:
+                    raise decode_error(path, e)
+                yield wtypes.String(text)
+
+
+def __chunks(f: typing.IO,
+             path: str,
+             size: int) -> typing.Iterator[wtypes.String]:
+    """Yield fixed-size chunks of the file, closing it when done."""
+    with f:
+        while True:
+            try:
+                chunk = f.read(size)
+            except UnicodeDecodeError as e:
+                raise decode_error(path, e)
+            if not chunk:
+                return
+            yield wtypes.String(chunk)
@@ -0,0 +1,137 @@
+"""Share one object between structurally equal immutable wisp values.
+
+Interning a value returns the one shared object equal to it, so interned
+values are equal exactly when they are the same object. Atoms and lists
+of them are interned, while values which may change or be realized later,
+such as vectors and lazy sequences, are left as they are and only shared
+by lists holding the very same object.
+
+Interning is off by default. When enabled, the reader interns the atoms
+it reads and quote interns the data it returns. Code is never interned,
+since lists used as code cache what is worked out about them, which must
+not be shared between call sites.
+
+Lists also cache their structural hash, which eq? uses to tell unequal
+lists apart without walking them.
+"""
+
+import typing
+import weakref
+
+import wisp.wtypes as wtypes
+
+# Whether the reader and quote intern the values they produce.
+enabled = False
+
+ATOM_TYPES = (wtypes.Integer, wtypes.String, wtypes.Bool, wtypes.Symbol)
+
+# The interned values, keyed by type and value for atoms, and by the ids
+# of their interned items for lists. The items of a list are kept alive
+# by the list, so their ids can't be reused while it is in the table.
+__table: typing.MutableMapping[
+    typing.Tuple[typing.Any, ...], wtypes.Expression
+] = weakref.WeakValueDictionary()
+
+
+def intern(expr: wtypes.Expression) -> wtypes.Expression:
+    """Return the shared object structurally equal to the value.
+
+    The value becomes the shared object if there is none yet, unless it
+    is a list holding items which are not themselves shared, in which case
+    a new list of the shared items is returned.
+    """
+    if type(expr) is not wtypes.List:
+        return __intern_atom(expr)
+
+    # The interned items of the lists being interned, and a stack of the
+    # values left to intern, each paired with the position of its first
+    # interned item once its items have been queued.
+    results: typing.List[wtypes.Expression] = []
+    stack: typing.List[typing.Tuple[wtypes.Expression, typing.Optional[int]]]
+    stack = [(expr, None)]
+    while stack:
+        val, start = stack.pop()
+        if start is not None:
+            items = results[start:]
+            del results[start:]
+            # Only lists are queued for their items.
+            results.append(__intern_list(val, items))  # type: ignore
+        elif type(val) is wtypes.List:
+            stack.append((val, len(results)))
+            stack.extend((item, None) for item in reversed(val.items))
+        else:
+            results.append(__intern_atom(val))
+    return results[0]
+
+
+def structural_hash(expr: wtypes.Expression) -> typing.Optional[int]:
+    """Return a hash of the value which equal values share.
+
+    The hashes of lists are cached on them. Returns None for values which
+    can't be hashed without realizing them, such as lazy sequences, and
+    for lists holding them.
+    """
+    if type(expr) is not wtypes.List:
+        return __atom_hash(expr)
+
+    # A stack of lists to hash, each paired with whether its sublists
+    # have been hashed already.
+    stack = [(expr, False)]
+    while stack:
+        val, ready = stack.pop()
+        if val.digest is not None:
+            continue
+        elif ready:
+            hashes = []
+            for item in val.items:
+                digest = (item.digest if type(item) is wtypes.List
+                          else __atom_hash(item))
+                if digest is None:
+                    break
+                hashes.append(digest)
+            else:
+                val.digest = hash((wtypes.List, *hashes))
+        else:
+            stack.append((val, True))
+            stack.extend((item, False) for item in val.items
+                         if type(item) is wtypes.List)
+    return expr.digest
+
+
+def __intern_atom(val: wtypes.Expression) -> wtypes.Expression:
+    """Return the shared object for an atom, or any other value as-is."""
+    if type(val) not in ATOM_TYPES:
+        return val
+    key = (type(val), val.name if type(val) is wtypes.Symbol
+           else val.val)  # type: ignore
+    return __table.setdefault(key, val)
+
+
+def __intern_list(val: wtypes.List,
+                  items: typing.List[wtypes.Expression]) -> wtypes.List:
+    """Return the shared list holding the given interned items."""
+    key = (wtypes.List, *map(id, items))
+    shared = __table.get(key)
+    if shared is None:
+        if all(new is old for new, old in zip(items, val.items)):
+            shared = val
+        else:
+            shared = wtypes.List(items)
+        structural_hash(shared)
+        __table[key] = shared
+    # Only lists are stored under list keys.
+    return shared  # type: ignore
+
+
+def __atom_hash(val: wtypes.Expression) -> typing.Optional[int]:
+    """Return the structural hash of a value which is not a list."""
+    if type(val) is wtypes.Symbol:
+        return hash((wtypes.Symbol, val.name))  # type: ignore
+    elif type(val) in ATOM_TYPES:
+        return hash((type(val), val.val))  # type: ignore
+    elif type(val) is wtypes.Vector:
+        # Vectors equal lists of the same integers, so must hash the same.
+        return hash((wtypes.List, *(
+            hash((wtypes.Integer, n)) for n in val.data)))  # type: ignore
+    else:
+        return None
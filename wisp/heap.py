@@ -0,0 +1,150 @@
+"""A read-only heap of wisp data shared between processes.
+
+A heap file holds named values, each encoded on its own in the binary
+encoding of wisp.serialize, followed by an index of where each one is.
+Processes memory-map the file rather than reading it, so the operating
+system keeps one copy of its pages however many processes attach to it.
+
+Values are only decoded when their name is first looked up, so each
+process pays only for the values it uses. Vectors are not decoded at all:
+they are views onto the mapped pages, so even huge ones are free to load
+and are never copied. Other values become python objects in each process
+which looks them up.
+
+Functions can't be encoded, so heaps hold data. Library code is better
+shipped as source, as wisp run does.
+"""
+
+import mmap
+import struct
+import typing
+
+import wisp.exceptions as exceptions
+import wisp.files as files
+import wisp.prelude as prelude
+import wisp.serialize as serialize
+import wisp.sources as sources
+import wisp.wtypes as wtypes
+
+MAGIC = b'WSH\x01'
+
+# The header is the magic followed by the offset of the index.
+HEADER = struct.Struct('<4sQ')
+
+# The types of values which may be written to a heap. Lazy sequences may
+# be infinite, so they are left out.
+DATA_TYPES = (wtypes.List, wtypes.Vector, wtypes.Integer, wtypes.String,
+              wtypes.Bool, wtypes.Symbol)
+
+
+class Heap:
+    """A heap file mapped into memory, decoding values as they are used.
+
+    Decoded values are kept, and shared by every environment the heap is
+    attached to. Vectors point into the map, so it stays open for as long
+    as the heap is around.
+    """
+
+    def __init__(self, path: str):
+        with files.open_file(path, 'rb') as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                raise exceptions.WispException(
+                    'can not map %s: %s' % (path, e)
+                )
+        self.view = memoryview(self.map)
+        if len(self.view) < HEADER.size or (
+                self.view[:len(MAGIC)] != MAGIC):
+            raise exceptions.WispException('%s is not a wisp heap' % path)
+        _, start = HEADER.unpack_from(self.view)
+        index = serialize.loads(self.view[start:])
+        self.index: typing.Dict[str, typing.Tuple[int, int]] = {}
+        for entry in wtypes.iterate(index):
+            name, begin, end = wtypes.iterate(entry)
+            self.index[name.val] = (begin.val, end.val)  # type: ignore
+        self.values: typing.Dict[str, wtypes.Expression] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, name: str) -> wtypes.Expression:
+        """Return the value of a name, decoding it on first use.
+
+        Raises KeyError if the heap doesn't hold the name.
+        """
+        val = self.values.get(name)
+        if val is None:
+            begin, end = self.index[name]
+            decoder = serialize.Decoder(self.view[begin:end], copy=False)
+            val = self.values[name] = decoder.decode()
+        return val
+
+    def names(self) -> typing.List[str]:
+        """Return the names the heap holds values for."""
+        return list(self.index)
+
+
+def write(path: str,
+          bindings: typing.Iterable[typing.Tuple[str, wtypes.Expression]]
+          ) -> int:
+    """Write named values to a heap file, returning its size in bytes.
+
+    Raises an exception if a value can't be encoded.
+    """
+    index: typing.List[wtypes.Expression] = []
+    with files.open_file(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 0))
+        pos = HEADER.size
+        for name, val in bindings:
+            data = serialize.dumps(val)
+            f.write(data)
+            index.append(wtypes.List([wtypes.String(name),
+                                      wtypes.Integer(pos),
+                                      wtypes.Integer(pos + len(data))]))
+            pos += len(data)
+        data = serialize.dumps(wtypes.List(index))
+        f.write(data)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, pos))
+    return pos + len(data)
+
+
+def build(path: str, paths: typing.Sequence[str]) -> typing.List[str]:
+    """Run source files, writing the data they define to a heap file.
+
+    Returns the names written, which are the globals bound to data once
+    every file has run. Functions and lazy sequences are left out.
+    """
+    env = prelude.env()
+    builtins = dict(env.global_scope())
+    for source in paths:
+        for form in sources.load(source):
+            form.eval(env)
+    bindings = [(name, val) for name, val in env.global_scope().items()
+                if builtins.get(name) is not val
+                and isinstance(val, DATA_TYPES)]
+    write(path, bindings)
+    return [name for name, _ in bindings]
+
+
+def main(path: str, paths: typing.Sequence[str]) -> int:
+    """Build a heap from source files, printing what went into it.
+
+    Returns the exit status, which is non-zero if the heap wasn't built.
+    """
+    try:
+        names = build(path, paths)
+    except exceptions.WispException as e:
+        print(e)
+        return 1
+    except Exception as e:
+        print('%s: %s' % (type(e).__name__, e))
+        return 1
+    for name in names:
+        print(name)
+    print('==> wrote %d values to %s' % (len(names), path))
+    return 0
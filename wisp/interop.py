@@ -0,0 +1,223 @@
+"""Convert between python objects and wisp values.
+
+Conversions walk nested structures with an explicit stack rather than by
+recursing, so deeply nested data converts without hitting the recursion
+limit. Values which are already wisp expressions are passed through as-is
+rather than being wrapped again.
+"""
+
+import array
+import functools
+import inspect
+import typing
+
+import wisp.env
+import wisp.exceptions as exceptions
+import wisp.tasks as tasks
+import wisp.wtypes as wtypes
+
+# The wisp types python parameters of each type are unboxed from.
+UNBOXED: typing.Dict[typing.Any, type] = {
+    int: wtypes.Integer,
+    str: wtypes.String,
+    bool: wtypes.Bool,
+}
+
+
+def to_wisp(obj: typing.Any, lazy: bool = False) -> wtypes.Expression:
+    """Wrap a python object as a wisp value.
+
+    Lists and tuples become lists, dicts become lists of (key value) pairs,
+    arrays of signed 64 bit integers become vectors sharing the array and
+    None becomes the empty list. Any other iterable, such as a generator,
+    becomes a lazy sequence, since it may never end.
+
+    When lazy is set, lists, tuples and dicts become lazy sequences too, so
+    only the parts of a structure wisp code actually walks are converted.
+    The structure must not be mutated while wisp still holds on to it.
+    """
+    if lazy:
+        return __to_lazy(obj)
+
+    root: typing.List[wtypes.Expression] = []
+    # A stack of iterators over the values left to convert, each paired
+    # with the items of the list they are converted into.
+    stack: typing.List[typing.Tuple[
+        typing.Iterator[typing.Any], typing.List[wtypes.Expression]]] = [
+            (iter([obj]), root)]
+    while stack:
+        it, items = stack[-1]
+        for val in it:
+            if isinstance(val, (list, tuple)):
+                children: typing.Iterable[typing.Any] = val
+            elif isinstance(val, dict):
+                children = val.items()
+            else:
+                items.append(__to_atom(val))
+                continue
+            converted = wtypes.List([])
+            items.append(converted)
+            stack.append((iter(children), converted.items))
+            break
+        else:
+            stack.pop()
+    return root[0]
+
+
+def to_python(expr: wtypes.Expression) -> typing.Any:
+    """Unwrap a wisp value into python objects.
+
+    Integers, strings and booleans are unboxed, symbols become their names
+    and sequences become lists, realizing lazy sequences in full. Other
+    values, such as functions, are returned as-is.
+    """
+    root: typing.List[typing.Any] = []
+    # A stack of iterators over the values left to convert, each paired
+    # with the list they are converted into.
+    stack: typing.List[typing.Tuple[
+        typing.Iterator[wtypes.Expression], typing.List[typing.Any]]] = [
+            (iter([expr]), root)]
+    while stack:
+        it, items = stack[-1]
+        for val in it:
+            if isinstance(val, wtypes.Vector):
+                items.append(val.data.tolist())
+            elif isinstance(val, (wtypes.List, wtypes.LazySeq)):
+                converted: typing.List[typing.Any] = []
+                items.append(converted)
+                stack.append((wtypes.iterate(val), converted))
+                break
+            elif isinstance(val, (wtypes.Integer, wtypes.String, wtypes.Bool)):
+                items.append(val.val)
+            elif isinstance(val, wtypes.Symbol):
+                items.append(val.name)
+            else:
+                items.append(val)
+        else:
+            stack.pop()
+    return root[0]
+
+
+def unboxed(func: typing.Callable[..., typing.Any]) -> wtypes.Callable:
+    """Adapt a plain python callable into a wisp builtin.
+
+    The builtin checks it is passed as many arguments as func accepts,
+    leaving it to its callers when that is a fixed number, and unboxes
+    them before calling func, wrapping its result with to_wisp.
+    Parameters annotated as int, str or bool must be passed the matching
+    wisp type and are passed its value, those annotated with a wisp type
+    must be passed that type and are passed it as-is, and any others are
+    passed the result of to_python.
+
+    Should func return an awaitable, as coroutine functions do, it is run
+    on the event loop by tasks.wait, blocking only the calling task.
+    """
+    params = [
+        param for param in inspect.signature(func).parameters.values()
+        if param.kind in (param.POSITIONAL_ONLY,
+                          param.POSITIONAL_OR_KEYWORD,
+                          param.VAR_POSITIONAL)
+    ]
+    hints = typing.get_type_hints(func)
+    unboxers = [__unboxer(hints.get(param.name)) for param in params]
+    variadic = bool(params) and params[-1].kind == params[-1].VAR_POSITIONAL
+    if variadic:
+        params.pop()
+        unbox_rest = unboxers.pop()
+    required = sum(param.default is param.empty for param in params)
+    maximum = None if variadic else len(params)
+    fixed = required == maximum
+
+    @functools.wraps(func)
+    def wrapper(args: typing.List[wtypes.Expression],
+                env: wisp.env.Environment) -> wtypes.Expression:
+        if not fixed and (len(args) < required or (
+                maximum is not None and len(args) > maximum)):
+            raise exceptions.WispException(
+                'called with %d arguments, requires %s' % (
+                    len(args), __arity(required, maximum))
+            )
+        vals = [unbox(arg) for unbox, arg in zip(unboxers, args)]
+        if variadic:
+            vals.extend(unbox_rest(arg) for arg in args[len(params):])
+        result = func(*vals)
+        if inspect.isawaitable(result):
+            result = tasks.scheduler(env).wait(result)
+        return to_wisp(result)
+
+    if fixed:
+        wrapper.arity = required  # type: ignore
+    return wrapper
+
+
+def register(env: wisp.env.Environment,
+             name: str,
+             func: typing.Callable[..., typing.Any]):
+    """Bind a plain python callable as a global wisp builtin."""
+    env.global_scope()[name] = wtypes.Function(unboxed(func))
+
+
+def __to_atom(val: typing.Any) -> wtypes.Expression:
+    """Wrap a python value which is not a list, tuple or dict."""
+    if isinstance(val, wtypes.Expression):
+        return val
+    # bool is a subclass of int, so must be checked first.
+    elif isinstance(val, bool):
+        return wtypes.Bool(val)
+    elif isinstance(val, int):
+        return wtypes.Integer(val)
+    elif isinstance(val, str):
+        return wtypes.String(val)
+    elif val is None:
+        return wtypes.List([])
+    elif isinstance(val, array.array) and val.typecode == 'q':
+        return wtypes.Vector(val)
+    elif isinstance(val, typing.Iterable) and not isinstance(
+            val, (bytes, bytearray)):
+        return wtypes.LazySeq.from_iterable(map(to_wisp, val))
+    else:
+        raise exceptions.WispException('can not represent %r' % (val,))
+
+
+def __to_lazy(val: typing.Any) -> wtypes.Expression:
+    """Wrap a python value, converting its elements only when realized."""
+    if isinstance(val, (list, tuple)):
+        return wtypes.LazySeq.from_iterable(map(__to_lazy, val))
+    elif isinstance(val, dict):
+        return wtypes.LazySeq.from_iterable(
+            wtypes.List([to_wisp(key), __to_lazy(item)])
+            for key, item in val.items()
+        )
+    else:
+        return __to_atom(val)
+
+
+def __unboxer(hint: typing.Any) -> typing.Callable[
+        [wtypes.Expression], typing.Any]:
+    """Return a function unboxing arguments for a parameter's annotation."""
+    if hint in UNBOXED:
+        expected = UNBOXED[hint]
+
+        def unbox_atom(arg: wtypes.Expression) -> typing.Any:
+            if not isinstance(arg, expected):
+                raise exceptions.type_error(expected, arg)
+            return arg.val  # type: ignore
+        return unbox_atom
+    elif isinstance(hint, type) and issubclass(hint, wtypes.Expression):
+        def check(arg: wtypes.Expression) -> wtypes.Expression:
+            if not isinstance(arg, hint):
+                raise exceptions.type_error(hint, arg)
+            return arg
+        return check
+    else:
+        return to_python
+
+
+def __arity(required: int, maximum: typing.Optional[int]) -> str:
+    """Describe how many arguments a builtin accepts."""
+    if maximum is None:
+        return 'at least %d' % required
+    elif maximum == required:
+        return '%d' % required
+    else:
+        return '%d to %d' % (required, maximum)
@@ -0,0 +1,453 @@
+"""Compile hot wisp lambdas to python.
+
+Lambdas count their calls and, once they have been called threshold times,
+their bodies are translated to python source and compiled. Integer
+arithmetic is done on unboxed python ints, cond becomes if/elif and calls
+a lambda makes to itself in tail position become loops. Loop bodies are
+compiled the same way once they have run threshold iterations, with recur
+taking the place of the self call.
+
+Each run of a compiled body counts as a step against the budget of the
+environment, if any, as the call it replaces would have, and each call to
+a compiled lambda adds a frame counting against its depth. Bodies are
+compiled twice over, so code running without a budget counts nothing.
+
+Globals referenced by the body are resolved when it is compiled. Should
+any of them be rebound through define or set!, the lambda is deoptimized
+back to the interpreter.
+"""
+
+import collections
+import itertools
+import typing
+
+import wisp.budgets as budgets
+import wisp.env
+import wisp.exceptions as exceptions
+import wisp.prelude as prelude
+import wisp.wtypes as wtypes
+
+# Whether hot lambdas are compiled at all.
+enabled = True
+
+# The number of calls after which a lambda is compiled.
+threshold = 100
+
+# Stop compiling a lambda once it has been deoptimized this many times.
+MAX_DEOPTS = 3
+
+STATS: typing.Counter[str] = collections.Counter()
+
+UNSPECIFIED = wtypes.Symbol('unspecified return value')
+
+# The types generated code may hold values as. Integers and booleans are
+# unboxed python values, objects are boxed wisp expressions.
+INT = 'int'
+BOOL = 'bool'
+OBJ = 'obj'
+
+
+def stats() -> typing.Dict[str, int]:
+    """Return counts of lambdas compiled, deoptimized and so on."""
+    return {
+        'compiled': STATS['compiled'],
+        'bailouts': STATS['bailouts'],
+        'deoptimized': STATS['deoptimized'],
+        'guard_failures': STATS['guard_failures'],
+    }
+
+
+def reset_stats():
+    """Zero the JIT statistics."""
+    STATS.clear()
+
+
+class Profile:
+    """Call counts and compilation state for a lambda or loop.
+
+    The lambda increments calls itself and asks for compilation when it
+    reaches the threshold. A loop counts iterations instead, and is given
+    the number of its leading params which recur rebinds, the rest being
+    local variables it reads from its enclosing scope.
+    """
+
+    def __init__(self,
+                 params: typing.List[wtypes.Symbol],
+                 body: wtypes.Expression,
+                 cells: typing.Dict[str, wisp.env.Cell],
+                 rebound: typing.Optional[int] = None):
+        self.params = params
+        self.body = body
+        self.cells = cells
+        self.rebound = rebound
+        self.calls = 0
+        self.deopts = 0
+        self.source: typing.Optional[str] = None
+
+    def compile(self,
+                function: wtypes.Function,
+                args: typing.List[wtypes.Expression],
+                env: wisp.env.Environment):
+        """Try to swap the function's implementation for compiled code.
+
+        The types of args are used to decide which parameters to unbox.
+        Bodies using features the compiler doesn't support stay
+        interpreted.
+        """
+        if not enabled or self.deopts >= MAX_DEOPTS:
+            return
+        if self.cells:
+            # Only lambdas which capture no local variables are compiled.
+            STATS['bailouts'] += 1
+            return
+
+        types = {
+            symbol.name: INT if type(arg) is wtypes.Integer else OBJ
+            for symbol, arg in zip(self.params, args)
+        }
+        returns = INT
+        try:
+            # Demote speculated int types until the code is consistent.
+            for _ in range(len(types) + 2):
+                compiler = _Compiler(self, function, env, types, returns)
+                source = compiler.compile()
+                if not compiler.demoted and compiler.returns == returns:
+                    break
+                types.update(dict.fromkeys(compiler.demoted, OBJ))
+                returns = compiler.returns
+            else:
+                raise _Bailout()
+        except _Bailout:
+            STATS['bailouts'] += 1
+            return
+
+        interpreted = function.func
+        namespace = dict(compiler.namespace, _interpreted=interpreted)
+        exec(compile(source, '<wisp jit>', 'exec'), namespace)
+        compiled = namespace['compiled']
+        self.source = source
+        function.func = compiled
+        STATS['compiled'] += 1
+
+        def deoptimize():
+            if function.func is compiled:
+                function.func = interpreted
+                self.calls = 0
+                self.deopts += 1
+                STATS['deoptimized'] += 1
+
+        for name in compiler.depends:
+            env.watch(name, deoptimize)
+
+
+class _Bailout(Exception):
+    """Raised when a lambda uses features the compiler doesn't support."""
+    pass
+
+
+class _Compiler:
+    """Translate the body of a lambda into python source.
+
+    Parameters typed INT are held unboxed. When the body passes something
+    other than an int to such a parameter, it is added to demoted and the
+    source must be regenerated. The same goes for the return type.
+    """
+
+    def __init__(self,
+                 profile: Profile,
+                 function: wtypes.Function,
+                 env: wisp.env.Environment,
+                 types: typing.Dict[str, str],
+                 returns: str):
+        self.function = function
+        self.loop = profile.rebound is not None
+        self.globals = env.global_scope()
+        self.params = [symbol.name for symbol in profile.params]
+        self.rebound = len(self.params) if profile.rebound is None \
+            else profile.rebound
+        self.body = profile.body
+        self.locals = {
+            name: 'v%d' % i for i, name in enumerate(self.params)
+        }
+        self.types = types
+        self.returns = returns
+        self.demoted: typing.Set[str] = set()
+        self.depends: typing.Set[str] = set()
+        self.namespace: typing.Dict[str, typing.Any] = {
+            '_g': self.globals,
+            '_Integer': wtypes.Integer,
+            '_Bool': wtypes.Bool,
+            '_TRUE': wtypes.Bool(True),
+            '_unbox': _unbox,
+            '_STATS': STATS,
+            '_INTERVAL': range(1, budgets.CHECK_INTERVAL + 1),
+        }
+        self.lines: typing.List[str] = []
+        self.temps = itertools.count()
+        self.arithmetic = {
+            prelude.add: ('+', 'add'),
+            prelude.sub: ('-', 'subtract'),
+            prelude.mul: ('*', 'multiply'),
+            prelude.div: ('//', 'divide'),
+        }
+
+    def compile(self) -> str:
+        """Return source defining compiled, a wisp function implementation.
+
+        compiled checks its arguments against the speculated types before
+        unboxing them and running the body in _run, falling back to the
+        interpreter when they don't match.
+        """
+        variables = ['v%d' % i for i in range(len(self.params))]
+        self.lines = [
+            'def _run(%s):' % ', '.join(variables + ['env']),
+            '    _budget = env.budget',
+            '    if _budget is None:',
+            '        while True:',
+        ]
+        self.tail(self.body, 3)
+        # Each iteration counts as a call against the budget. Iterations
+        # are counted off a range, an interval's worth at a time, which is
+        # far cheaper than counting them one by one.
+        if not self.loop:
+            # Loops run in the frame of the code running them.
+            self.lines.append('    env.add_frame()')
+        self.lines += [
+            '    _steps = 0',
+            '    try:',
+            '        while True:',
+            '            for _steps in _INTERVAL:',
+        ]
+        self.tail(self.body, 4)
+        self.lines += [
+            '            _budget.spend(_steps)',
+            '            _steps = 0',
+            '    finally:',
+        ]
+        if not self.loop:
+            self.lines.append('        env.pop_frame()')
+        self.lines.append('        _budget.spend(_steps)')
+
+        run = self.lines
+        self.lines = [
+            'def compiled(args, env):',
+            '    if env.global_scope() is not _g:',
+            '        return _interpreted(args, env)',
+        ]
+        unboxed = []
+        for i, name in enumerate(self.params):
+            if self.types[name] == INT:
+                self.lines += [
+                    '    if type(args[%d]) is not _Integer:' % i,
+                    '        _STATS["guard_failures"] += 1',
+                    '        return _interpreted(args, env)',
+                ]
+                unboxed.append('args[%d].val' % i)
+            else:
+                unboxed.append('args[%d]' % i)
+        call = '_run(%s)' % ', '.join(unboxed + ['env'])
+        self.lines.append('    return %s' % self.box(call, self.returns))
+        return '\n'.join(run + self.lines) + '\n'
+
+    def tail(self, form: wtypes.Expression, depth: int):
+        """Emit statements returning the value of a form in tail position."""
+        indent = '    ' * depth
+        call = self.call_target(form)
+        if call is not None and self.recurs(call[0]):
+            # A self call in tail position becomes another loop iteration.
+            args = self.self_args(call[1])
+            temps = ['t%d' % next(self.temps) for _ in args]
+            for temp, arg in zip(temps, args):
+                self.lines.append('%s%s = %s' % (indent, temp, arg))
+            if temps:
+                variables = ['v%d' % i for i in range(len(temps))]
+                self.lines.append('%s%s = %s' % (
+                    indent, ', '.join(variables), ', '.join(temps)
+                ))
+            self.lines.append('%scontinue' % indent)
+        elif call is not None and _is_form(call[0], prelude.cond):
+            tested, otherwise = self.clauses(call[1])
+            for i, (body, test) in enumerate(tested):
+                self.lines.append('%s%s %s:' % (
+                    indent, 'elif' if i else 'if', self.truth(test)
+                ))
+                self.tail(body, depth + 1)
+            if otherwise is None:
+                self.lines.append('%sreturn %s' % (
+                    indent, self.coerce_return(self.const(UNSPECIFIED), OBJ)
+                ))
+            else:
+                self.tail(otherwise, depth)
+        else:
+            self.lines.append('%sreturn %s' % (
+                indent, self.coerce_return(*self.expr(form))
+            ))
+
+    def expr(self, form: wtypes.Expression) -> typing.Tuple[str, str]:
+        """Return the source and type of an expression computing form."""
+        if isinstance(form, wtypes.Bool):
+            return repr(form.val), BOOL
+        elif isinstance(form, wtypes.Integer):
+            return repr(form.val), INT
+        elif isinstance(form, wtypes.Symbol):
+            if form.name in self.locals:
+                return self.locals[form.name], self.types[form.name]
+            else:
+                return self.const(self.global_value(form)), OBJ
+
+        call = self.call_target(form)
+        if call is None:
+            # Anything else, including the empty list, evaluates to itself.
+            return self.const(form), OBJ
+        fn, args = call
+        if self.recurs(fn):
+            if self.loop:
+                # Leave the interpreter to complain about a misplaced recur.
+                raise _Bailout()
+            return '_run(%s)' % ', '.join(self.self_args(args) + ['env']), \
+                self.returns
+        elif _is_form(fn, prelude.cond):
+            return self.cond(args)
+        elif _is_form(fn, prelude.quote) and len(args) == 1:
+            return self.const(args[0]), OBJ
+        elif not isinstance(fn, wtypes.Function):
+            raise _Bailout()
+        elif fn.func in self.arithmetic:
+            if not args:
+                return '0', INT
+            elif len(args) == 1:
+                return self.expr(args[0])
+            op, name = self.arithmetic[fn.func]
+            operands = [self.unbox(*self.expr(arg), name) for arg in args]
+            return '(%s)' % (' %s ' % op).join(operands), INT
+        elif fn.func is prelude.is_equal and len(args) == 2:
+            (a, a_type), (b, b_type) = map(self.expr, args)
+            if a_type == b_type == INT:
+                return '(%s == %s)' % (a, b), BOOL
+            return '(%s == %s)' % (self.box(a, a_type),
+                                   self.box(b, b_type)), BOOL
+        elif fn.arity is not None and len(args) != fn.arity:
+            # Leave the interpreter to complain about the call.
+            raise _Bailout()
+        else:
+            vals = [self.box(*self.expr(arg)) for arg in args]
+            return '%s.func([%s], env)' % (self.const(fn), ', '.join(vals)), \
+                OBJ
+
+    def cond(self,
+             args: typing.List[wtypes.Expression]) -> typing.Tuple[str, str]:
+        """Return a conditional expression for the clauses of a cond."""
+        tested, otherwise = self.clauses(args)
+        if otherwise is None:
+            result, result_type = self.const(UNSPECIFIED), OBJ
+        else:
+            result, result_type = self.expr(otherwise)
+        branches = [self.expr(body) for body, _ in tested]
+        if any(kind != result_type for _, kind in branches):
+            result, result_type = self.box(result, result_type), OBJ
+            branches = [(self.box(src, kind), OBJ) for src, kind in branches]
+        for (_, test), (src, _) in reversed(list(zip(tested, branches))):
+            result = '(%s if %s else %s)' % (src, self.truth(test), result)
+        return result, result_type
+
+    def clauses(self, args: typing.List[wtypes.Expression]) -> typing.Tuple[
+            typing.List[typing.Tuple[wtypes.Expression, wtypes.Expression]],
+            typing.Optional[wtypes.Expression]]:
+        """Split the clauses of a cond into (body, test) pairs and an else.
+
+        Clauses following an else clause are never reached so are dropped.
+        """
+        tested: typing.List[
+            typing.Tuple[wtypes.Expression, wtypes.Expression]] = []
+        for clause in args:
+            if not isinstance(clause, wtypes.List) or len(clause.items) != 2:
+                # Leave the interpreter to complain about bad forms.
+                raise _Bailout()
+            body, test = clause.items
+            if test == wtypes.Symbol('else'):
+                return tested, body
+            tested.append((body, test))
+        return tested, None
+
+    def call_target(self, form: wtypes.Expression) -> typing.Optional[
+            typing.Tuple[wtypes.Expression, typing.List[wtypes.Expression]]]:
+        """Return the global a list form calls, along with its arguments."""
+        if not isinstance(form, wtypes.List) or not form.items:
+            return None
+        head = form.items[-1]
+        if not isinstance(head, wtypes.Symbol) or head.name in self.locals:
+            raise _Bailout()
+        return self.global_value(head), form.args()
+
+    def self_args(self, args: typing.List[wtypes.Expression]
+                  ) -> typing.List[str]:
+        """Return the arguments of a self call, as the parameters' types."""
+        if len(args) != self.rebound:
+            raise _Bailout()
+        sources = []
+        for name, arg in zip(self.params, args):
+            src, kind = self.expr(arg)
+            if self.types[name] == INT and kind != INT:
+                self.demoted.add(name)
+            sources.append(src if self.types[name] == INT
+                           else self.box(src, kind))
+        return sources
+
+    def recurs(self, fn: wtypes.Expression) -> bool:
+        """Indicate whether calling fn runs the body again."""
+        if self.loop:
+            return isinstance(fn, wtypes.Function) and fn.func is prelude.recur
+        return fn is self.function
+
+    def global_value(self, symbol: wtypes.Symbol) -> wtypes.Expression:
+        """Resolve a global symbol, noting the compiled code depends on it."""
+        if symbol.name not in self.globals:
+            raise _Bailout()
+        self.depends.add(symbol.name)
+        return self.globals[symbol.name]
+
+    def const(self, val: typing.Any) -> str:
+        """Return the name of a constant holding the value."""
+        name = '_k%d' % len(self.namespace)
+        self.namespace[name] = val
+        return name
+
+    def coerce_return(self, src: str, kind: str) -> str:
+        """Convert a returned value to the return type."""
+        if self.returns == INT and kind != INT:
+            self.returns = OBJ
+        return src if self.returns == INT else self.box(src, kind)
+
+    def truth(self, test: wtypes.Expression) -> str:
+        """Return a python boolean for whether a cond test passes."""
+        src, kind = self.expr(test)
+        if kind == BOOL:
+            return src
+        return '(%s == _TRUE)' % self.box(src, kind)
+
+    @staticmethod
+    def box(src: str, kind: str) -> str:
+        """Wrap an unboxed value in its wisp type."""
+        if kind == INT:
+            return '_Integer(%s)' % src
+        elif kind == BOOL:
+            return '_Bool(%s)' % src
+        return src
+
+    def unbox(self, src: str, kind: str, op_name: str) -> str:
+        """Unwrap a value as a python int for arithmetic."""
+        if kind == INT:
+            return src
+        return '_unbox(%s, %r)' % (self.box(src, kind), op_name)
+
+
+def _is_form(fn: wtypes.Expression, func: wtypes.Callable) -> bool:
+    """Indicate whether fn is the special form implemented by func."""
+    return isinstance(fn, wtypes.SpecialForm) and fn.func is func
+
+
+def _unbox(val: wtypes.Expression, op_name: str) -> int:
+    """Return the int an Integer holds, raising an exception otherwise."""
+    if isinstance(val, wtypes.Integer):
+        return val.val
+    raise exceptions.WispException('Can not %s %s' % (op_name, val))
@@ -0,0 +1,324 @@
+"""Load CSV and JSON files straight into wisp values and write them back.
+
+Loaders build wisp values as they read, in a single pass over the input.
+Writers stream their input, so lazy sequences are realized only as they
+are written out.
+"""
+
+import array
+import csv
+import json
+import typing
+
+import wisp.exceptions as exceptions
+import wisp.files as files
+import wisp.interop as interop
+import wisp.wtypes as wtypes
+
+Coercion = typing.Callable[[str], wtypes.Expression]
+
+
+def __to_int(val: str) -> wtypes.Integer:
+    """Coerce a field to an Integer."""
+    try:
+        return wtypes.Integer(int(val))
+    except ValueError:
+        raise exceptions.type_error('an integer', repr(val))
+
+
+def __to_bool(val: str) -> wtypes.Expression:
+    """Coerce a field to a Bool."""
+    lowered = val.strip().lower()
+    if lowered in ('true', '#t', '1'):
+        return wtypes.Bool(True)
+    elif lowered in ('false', '#f', '0'):
+        return wtypes.Bool(False)
+    else:
+        raise exceptions.type_error('a boolean', repr(val))
+
+
+COERCIONS: typing.Dict[str, Coercion] = {
+    'str': wtypes.String,
+    'int': __to_int,
+    'bool': __to_bool,
+}
+
+
+def column_spec(spec: wtypes.Expression) -> typing.Tuple[
+        typing.List[str], typing.Dict[str, str]]:
+    """Read a wisp column selection into column names and their types.
+
+    Each element of spec is either a column name, or a list of a column
+    name and a type symbol such as ("age" int).
+    """
+    columns: typing.List[str] = []
+    types: typing.Dict[str, str] = {}
+    for item in wtypes.iterate(spec):
+        if isinstance(item, wtypes.String):
+            columns.append(item.val)
+        elif isinstance(item, wtypes.List) and len(item.items) == 2:
+            name, kind = item.items
+            if not isinstance(name, wtypes.String):
+                raise exceptions.type_error(wtypes.String, name)
+            elif not isinstance(kind, wtypes.Symbol):
+                raise exceptions.type_error(wtypes.Symbol, kind)
+            columns.append(name.val)
+            types[name.val] = kind.name
+        else:
+            raise exceptions.WispException('invalid column %s' % item)
+    return columns, types
+
+
+def iter_csv(path: str,
+             columns: typing.Optional[typing.Sequence[str]] = None,
+             types: typing.Optional[typing.Mapping[str, str]] = None
+             ) -> typing.Iterator[wtypes.List]:
+    """Iterate over the rows of a CSV file with a header as wisp lists.
+
+    Only the named columns are kept, in the order given, defaulting to
+    every column in the file. Fields are strings unless types maps their
+    column to one of the COERCIONS.
+    """
+    with files.open_file(path, 'r', newline='') as f:
+        reader = __csv_rows(f, path)
+        header = next(reader, None) or []
+        names, indices, coercions = __select(header, columns, types or {})
+        for lineno, row in enumerate(reader, 2):
+            try:
+                yield wtypes.List([
+                    coerce(row[i]) for i, coerce in zip(indices, coercions)
+                ])
+            except IndexError:
+                raise __short_row(path, lineno, header, row)
+
+
+def load_csv(path: str,
+             columns: typing.Optional[typing.Sequence[str]] = None,
+             types: typing.Optional[typing.Mapping[str, str]] = None
+             ) -> wtypes.List:
+    """Load a CSV file with a header into a wisp list of row lists."""
+    return wtypes.List(list(iter_csv(path, columns, types)))
+
+
+def load_csv_columns(path: str,
+                     columns: typing.Optional[typing.Sequence[str]] = None,
+                     types: typing.Optional[typing.Mapping[str, str]] = None,
+                     compact: bool = True) -> wtypes.List:
+    """Load a CSV file with a header as a list of (name values) columns.
+
+    When compact is set, integer columns are stored unboxed in Vectors
+    rather than as lists of Integers, unless they hold integers too large
+    for a Vector.
+    """
+    types = types or {}
+    with files.open_file(path, 'r', newline='') as f:
+        reader = __csv_rows(f, path)
+        header = next(reader, None) or []
+        names, indices, coercions = __select(header, columns, types)
+        values: typing.List[typing.Any] = []
+        for name in names:
+            if compact and types.get(name) == 'int':
+                values.append(array.array('q'))
+            else:
+                values.append([])
+
+        for lineno, row in enumerate(reader, 2):
+            try:
+                for n, (i, coerce) in enumerate(zip(indices, coercions)):
+                    column = values[n]
+                    if not isinstance(column, array.array):
+                        column.append(coerce(row[i]))
+                        continue
+                    val = __to_int(row[i]).val
+                    try:
+                        column.append(val)
+                    except OverflowError:
+                        # Too big to store unboxed, so box the whole column.
+                        values[n] = [wtypes.Integer(v) for v in column]
+                        values[n].append(wtypes.Integer(val))
+            except IndexError:
+                raise __short_row(path, lineno, header, row)
+
+    return wtypes.List([
+        wtypes.List([
+            wtypes.String(name),
+            (wtypes.Vector(column)
+             if isinstance(column, array.array)
+             else wtypes.List(column)),
+        ])
+        for name, column in zip(names, values)
+    ])
+
+
+def load_json(path: str) -> wtypes.Expression:
+    """Load a JSON document into wisp values.
+
+    Objects become lists of (key value) pairs, arrays become lists and
+    null becomes the empty list.
+    """
+    with files.open_file(path, 'r') as f:
+        try:
+            text = f.read()
+        except UnicodeDecodeError as e:
+            raise files.decode_error(path, e)
+    return __parse_json(text, path)
+
+
+def iter_json_lines(path: str) -> typing.Iterator[wtypes.Expression]:
+    """Iterate over the records of a JSON lines file as wisp values."""
+    with files.open_file(path, 'r') as f:
+        for line in __lines(f, path):
+            if line.strip():
+                yield __parse_json(line, path)
+
+
+def write_csv(rows: wtypes.Expression,
+              path: str,
+              header: typing.Optional[typing.Sequence[str]] = None) -> int:
+    """Write a sequence of row sequences out to a CSV file.
+
+    Returns the number of rows written, not counting the header.
+    """
+    count = 0
+    with files.open_file(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        if header is not None:
+            writer.writerow(header)
+        for row in wtypes.iterate(rows):
+            writer.writerow([__field(val) for val in wtypes.iterate(row)])
+            count += 1
+    return count
+
+
+def write_json(val: wtypes.Expression, path: str) -> None:
+    """Write a wisp value out to a JSON file.
+
+    Sequences are written element by element, so lazy sequences are never
+    fully realized in memory.
+    """
+    with files.open_file(path, 'w') as f:
+        __write_json(val, f)
+
+
+def write_json_lines(records: wtypes.Expression, path: str) -> int:
+    """Write each element of a sequence as a line of a JSON lines file.
+
+    Returns the number of records written.
+    """
+    count = 0
+    with files.open_file(path, 'w') as f:
+        for record in wtypes.iterate(records):
+            __write_json(record, f)
+            f.write('\n')
+            count += 1
+    return count
+
+
+def __select(header: typing.Sequence[str],
+             columns: typing.Optional[typing.Sequence[str]],
+             types: typing.Mapping[str, str]) -> typing.Tuple[
+                 typing.List[str], typing.List[int], typing.List[Coercion]]:
+    """Find the index and coercion of each selected column in the header."""
+    names = list(header if columns is None else columns)
+    indices = []
+    coercions = []
+    for name in names:
+        try:
+            indices.append(header.index(name))
+        except ValueError:
+            raise exceptions.WispException('no column named %s' % name)
+        kind = types.get(name, 'str')
+        try:
+            coercions.append(COERCIONS[kind])
+        except KeyError:
+            raise exceptions.WispException('unknown column type %s' % kind)
+    return names, indices, coercions
+
+
+def __lines(f: typing.IO, path: str) -> typing.Iterator[str]:
+    """Iterate over the lines of a text file, reporting decoding errors."""
+    try:
+        yield from f
+    except UnicodeDecodeError as e:
+        raise files.decode_error(path, e)
+
+
+def __csv_rows(f: typing.IO,
+               path: str) -> typing.Iterator[typing.List[str]]:
+    """Iterate over the rows of a CSV file, reporting decoding errors."""
+    try:
+        yield from csv.reader(f)
+    except UnicodeDecodeError as e:
+        raise files.decode_error(path, e)
+
+
+def __short_row(path: str,
+                lineno: int,
+                header: typing.Sequence[str],
+                row: typing.Sequence[str]) -> exceptions.WispException:
+    """Build an exception about a row with fewer fields than the header."""
+    return exceptions.WispException(
+        '%s:%d: expected %d fields, found %d' % (
+            path, lineno, len(header), len(row))
+    )
+
+
+def __parse_json(text: str, path: str) -> wtypes.Expression:
+    """Parse JSON text, building wisp values as objects are decoded."""
+    try:
+        val = json.loads(
+            text,
+            object_pairs_hook=__json_object,
+            parse_float=__json_float,
+            parse_int=lambda s: wtypes.Integer(int(s)),
+        )
+    except json.JSONDecodeError as e:
+        raise exceptions.WispException('%s: %s' % (path, e))
+    return interop.to_wisp(val)
+
+
+def __json_object(
+        pairs: typing.List[typing.Tuple[str, typing.Any]]) -> wtypes.List:
+    """Build a list of (key value) pairs from a decoded JSON object."""
+    return wtypes.List([
+        wtypes.List([wtypes.String(key), interop.to_wisp(val)])
+        for key, val in pairs
+    ])
+
+
+def __json_float(text: str) -> wtypes.Integer:
+    """Accept floats only when they hold integral values."""
+    val = float(text)
+    if val.is_integer():
+        return wtypes.Integer(int(val))
+    else:
+        raise exceptions.WispException('can not represent float %s' % text)
+
+
+def __field(val: wtypes.Expression) -> typing.Union[str, int]:
+    """Unwrap an atom for writing as a CSV field."""
+    if isinstance(val, wtypes.Bool):
+        return 'true' if val.val else 'false'
+    elif isinstance(val, (wtypes.Integer, wtypes.String)):
+        return val.val
+    elif isinstance(val, wtypes.Symbol):
+        return val.name
+    else:
+        raise exceptions.WispException('can not write %s to CSV' % val)
+
+
+def __write_json(val: wtypes.Expression, f: typing.IO) -> None:
+    """Stream a wisp value out as JSON."""
+    if isinstance(val, wtypes.SEQUENCE_TYPES):
+        f.write('[')
+        for i, item in enumerate(wtypes.iterate(val)):
+            if i:
+                f.write(', ')
+            __write_json(item, f)
+        f.write(']')
+    elif isinstance(val, (wtypes.Bool, wtypes.Integer, wtypes.String)):
+        f.write(json.dumps(val.val))
+    elif isinstance(val, wtypes.Symbol):
+        f.write(json.dumps(val.name))
+    else:
+        raise exceptions.WispException('can not write %s to JSON' % val)
@@ -0,0 +1,169 @@
+"""Report on the memory held by wisp values and environments.
+
+A snapshot counts the live instances of each wisp type and the bytes they
+take up, along with the depth of the environment's call stack and the
+sizes of its global frame and of the frames closures capture. Snapshots
+may be diffed to see what grew between them.
+
+Tracking, backed by tracemalloc, additionally attributes memory to the
+wisp lambdas which allocated it. Each call is charged with the memory it
+allocated and still held on to when it returned, less that of the calls
+it made in turn. Compiled lambdas are charged to their callers.
+"""
+
+from dataclasses import asdict, dataclass, field
+import gc
+import sys
+import tracemalloc
+import typing
+import weakref
+
+import wisp.env
+import wisp.jit as jit
+import wisp.wtypes as wtypes
+
+
+class Tracker:
+    """Charge the memory held by each call to the lambda making it."""
+
+    def __init__(self, started: bool = False) -> None:
+        # Whether tracking started tracemalloc, so should stop it.
+        self.started = started
+        self.allocated: typing.Counter[int] = typing.Counter()
+        # Weak references to the functions charged, by id, so their ids
+        # are forgotten rather than reused once they are collected.
+        self.functions: typing.Dict[int, weakref.ref] = {}
+        # The memory charged to functions which have since been collected.
+        self.collected = 0
+        # The traced memory when each call in progress started, and the
+        # memory held by the calls it has made so far.
+        self.calls: typing.List[typing.List[int]] = []
+
+    def enter(self):
+        """Note the start of a call."""
+        self.calls.append([tracemalloc.get_traced_memory()[0], 0])
+
+    def exit(self, function: wtypes.Function):
+        """Charge a call which has returned to the function called."""
+        start, nested = self.calls.pop()
+        held = tracemalloc.get_traced_memory()[0] - start
+        key = id(function)
+        self.allocated[key] += held - nested
+        if key not in self.functions:
+            self.functions[key] = weakref.ref(
+                function, lambda _: self.__forget(key))
+        if self.calls:
+            self.calls[-1][1] += held
+
+    def __forget(self, key: int):
+        """Move the memory charged to a collected function to collected."""
+        self.collected += self.allocated.pop(key, 0)
+        self.functions.pop(key, None)
+
+
+# The tracker lambdas report their calls to while tracking is on.
+tracker: typing.Optional[Tracker] = None
+
+
+@dataclass
+class Snapshot:
+    """The memory held by wisp at a point in time.
+
+    Counts and sizes are keyed by wisp type name, and allocations, which
+    are only recorded while tracking, by the global name of the lambda
+    which allocated them.
+    """
+    counts: typing.Dict[str, int] = field(default_factory=dict)
+    sizes: typing.Dict[str, int] = field(default_factory=dict)
+    depth: int = 0
+    global_bindings: int = 0
+    closures: int = 0
+    closure_cells: int = 0
+    allocations: typing.Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        """Return the snapshot as a dict of its fields."""
+        return asdict(self)
+
+
+def snapshot(env: wisp.env.Environment) -> Snapshot:
+    """Take a snapshot of the memory held by wisp values and the env."""
+    result = Snapshot(depth=len(env.frames),
+                      global_bindings=len(env.global_scope()))
+    gc.collect()
+    for obj in gc.get_objects():
+        if isinstance(obj, wtypes.Expression):
+            name = type(obj).__name__
+            result.counts[name] = result.counts.get(name, 0) + 1
+            result.sizes[name] = result.sizes.get(name, 0) + __size(obj)
+        elif isinstance(obj, jit.Profile) and obj.rebound is None:
+            result.closures += 1
+            result.closure_cells += len(obj.cells)
+
+    if tracker is not None:
+        names = {id(val): name
+                 for name, val in env.global_scope().items()
+                 if isinstance(val, wtypes.Function)}
+        for key, size in tracker.allocated.items():
+            name = names.get(key, 'lambda')
+            result.allocations[name] = result.allocations.get(name, 0) + size
+        if tracker.collected:
+            result.allocations['lambda'] = result.allocations.get(
+                'lambda', 0) + tracker.collected
+    return result
+
+
+def diff(old: Snapshot, new: Snapshot) -> Snapshot:
+    """Return how much each measure changed between two snapshots.
+
+    Keys whose values did not change are left out.
+    """
+    return Snapshot(
+        counts=__diff_counts(old.counts, new.counts),
+        sizes=__diff_counts(old.sizes, new.sizes),
+        depth=new.depth - old.depth,
+        global_bindings=new.global_bindings - old.global_bindings,
+        closures=new.closures - old.closures,
+        closure_cells=new.closure_cells - old.closure_cells,
+        allocations=__diff_counts(old.allocations, new.allocations),
+    )
+
+
+def start_tracking():
+    """Start attributing allocations to the lambdas which make them."""
+    global tracker
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracker = Tracker(started)
+
+
+def stop_tracking():
+    """Stop attributing allocations, forgetting those made so far.
+
+    Tracing is left on if it was already on when tracking started.
+    """
+    global tracker
+    if tracker is not None and tracker.started:
+        tracemalloc.stop()
+    tracker = None
+
+
+def __size(obj: wtypes.Expression) -> int:
+    """Return the bytes held by a wisp value, not counting its elements."""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    if isinstance(obj, wtypes.List):
+        size += sys.getsizeof(obj.items)
+    elif isinstance(obj, wtypes.Vector):
+        size += sys.getsizeof(obj.data)
+    return size
+
+
+def __diff_counts(old: typing.Dict[str, int],
+                  new: typing.Dict[str, int]) -> typing.Dict[str, int]:
+    """Subtract the old counts from the new, dropping those unchanged."""
+    changes = {key: new.get(key, 0) - old.get(key, 0)
+               for key in set(old) | set(new)}
+    return {key: change for key, change in changes.items() if change}
@@ -1,9 +1,26 @@
-"""Parser for the wisp language."""
+"""Parser for the wisp language.
+
+The parsec grammar below describes the language. read implements the same
+grammar by hand with an explicit stack rather than recursion, so it reads
+lists nested to any depth, in time linear in the length of the text. When
+interning is enabled, read shares the atoms it reads through wisp.hashcons.
+"""
+
+import re
+import typing
 
 import parsec  # type: ignore
 
+import wisp.exceptions as exceptions
+import wisp.hashcons as hashcons
 import wisp.wtypes as wtypes
 
+SYMBOL_CHARS = '+-/*?!'
+
+# Skips whitespace, then matches a paren, a string, an atom or, failing
+# those, the opening quote of an unterminated string.
+__TOKEN = re.compile(r'\s*(?:([()])|"([^"]*)"|([^\s()"]+)|("))')
+
 
 @parsec.generate
 def parse_string():
@@ -17,7 +34,7 @@ def parse_string():
 @parsec.generate
 def parse_symbol():
     """Parse a symbol as a non-digit followed by any characters."""
-    symbol_chars = parsec.letter() | parsec.one_of('+-/*?!')
+    symbol_chars = parsec.letter() | parsec.one_of(SYMBOL_CHARS)
     first = yield symbol_chars
     rest = yield parsec.many(symbol_chars | parsec.digit())
     return wtypes.Symbol(first + ''.join(rest))
@@ -65,3 +82,86 @@ parse_expr = (parse_bool |
               parse_symbol |
               parse_int |
               parse_list)
+
+
+def read(text: str, line: int = 1) -> wtypes.Expression:
+    """Read a single expression from the text.
+
+    Raises an exception if the text holds anything but one expression,
+    surrounded by any amount of whitespace. Errors are reported counting
+    lines from the given line, for text read out of a larger file.
+    """
+    # The items of each list still being read, innermost last.
+    stack: typing.List[typing.List[wtypes.Expression]] = []
+    result: typing.Optional[wtypes.Expression] = None
+    pos = 0
+    while True:
+        match = __TOKEN.match(text, pos)
+        if match is None:
+            # Every other character starts a token, so only whitespace
+            # is left.
+            break
+        paren, string, atom, _ = match.groups()
+        # One of the groups always matches, so lastindex is never None.
+        start = match.start(match.lastindex)  # type: ignore
+        pos = match.end()
+        val: wtypes.Expression
+        if paren == '(':
+            stack.append([])
+            continue
+        elif paren == ')':
+            if not stack:
+                raise __error(text, line, start, 'unexpected )')
+            val = wtypes.List(stack.pop())
+        elif string is not None:
+            val = wtypes.String(string)
+        elif atom is not None:
+            val = __read_atom(atom, text, line, start)
+        else:
+            raise __error(text, line, start, 'unterminated string')
+
+        if hashcons.enabled and type(val) is not wtypes.List:
+            val = hashcons.intern(val)
+
+        if stack:
+            stack[-1].append(val)
+        elif result is None:
+            result = val
+        else:
+            raise __error(text, line, start, 'expected end of input')
+
+    if stack:
+        raise __error(text, line, pos, 'unterminated list')
+    elif result is None:
+        raise __error(text, line, pos, 'expected an expression')
+    return result
+
+
+def __read_atom(atom: str,
+                text: str,
+                line: int,
+                pos: int) -> wtypes.Expression:
+    """Read a boolean, integer or symbol."""
+    if atom == '#t':
+        return wtypes.Bool(True)
+    elif atom == '#f':
+        return wtypes.Bool(False)
+    elif atom.isdecimal():
+        return wtypes.Integer(int(atom))
+    elif (atom[0].isalpha() or atom[0] in SYMBOL_CHARS) and all(
+            c.isalpha() or c.isdigit() or c in SYMBOL_CHARS for c in atom):
+        return wtypes.Symbol(atom)
+    else:
+        raise __error(text, line, pos, 'invalid token %s' % atom)
+
+
+def __error(text: str,
+            line: int,
+            pos: int,
+            message: str) -> exceptions.WispException:
+    """Build an exception about the text at the given position."""
+    line += text.count('\n', 0, pos)
+    column = pos - (text.rfind('\n', 0, pos) + 1) + 1
+    return exceptions.WispException(
+        'line %d, column %d: %s' % (line, column, message)
+    )
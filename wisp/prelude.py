@@ -1,33 +1,43 @@
 """Provide basic builtin wisp functions."""
 
+import array
 import functools
+import itertools
 import operator
 import typing
 
+import wisp.analysis as analysis
 import wisp.env
 import wisp.exceptions as exceptions
+import wisp.files as files
+import wisp.hashcons as hashcons
+import wisp.interop as interop
+import wisp.jit as jit
+import wisp.loaders as loaders
+import wisp.memory as memory
+import wisp.tasks as tasks
 import wisp.wtypes as wtypes
 
-T = typing.TypeVar('T')
+# The macro or quote, if any, each symbol called by a form was bound to.
+Heads = typing.Dict[str, typing.Optional[wtypes.Expression]]
+
+# Ranges of more than this many integers are lazy rather than vectors, so
+# huge ones are never held in memory all at once.
+RANGE_VECTOR_LIMIT = 1 << 20
+
+# The builtins every environment starts out with, once they are built.
+__builtins: typing.Optional[typing.Dict[str, wtypes.Expression]] = None
 
 
 def arity(n: int) -> typing.Callable[[wtypes.Callable], wtypes.Callable]:
-    """Decorator enforcing the function is called with right number of arguments.
+    """Decorator declaring the number of arguments the function requires.
 
-    Raise an exception if the decorated function is called with an arguments
-    list of length besides n.
+    The decorated function is left as-is. Calls are checked against the
+    arity when they are analyzed, or otherwise when they are made.
     """
     def decorator(func: wtypes.Callable) -> wtypes.Callable:
-        @functools.wraps(func)
-        def wrapper(args: typing.List[wtypes.Expression],
-                    env: wisp.env.Environment) -> wtypes.Expression:
-            if len(args) != n:
-                raise exceptions.WispException(
-                    'called with %d arguments, requires %d' % (len(args), n)
-                )
-            else:
-                return func(args, env)
-        return wrapper
+        func.arity = n  # type: ignore
+        return func
     return decorator
 
 
@@ -58,24 +68,52 @@ def div(args: typing.List[wtypes.Expression],
 @arity(2)
 def is_equal(args: typing.List[wtypes.Expression],
              env: wisp.env.Environment) -> wtypes.Bool:
-    """Return a boolean indicating if the two elements are equal."""
-    return wtypes.Bool(args[0] == args[1])
+    """Return a boolean indicating if the two elements are equal.
+
+    Lists whose structural hashes differ are unequal, so are told apart
+    without being walked once their hashes are cached.
+    """
+    a, b = args
+    if a is b:
+        return wtypes.Bool(True)
+    elif type(a) is wtypes.List and type(b) is wtypes.List:
+        a_hash = hashcons.structural_hash(a)
+        b_hash = hashcons.structural_hash(b)
+        if a_hash is not None and b_hash is not None and a_hash != b_hash:
+            return wtypes.Bool(False)
+    return wtypes.Bool(a == b)
 
 
 @arity(1)
 def quote(args: typing.List[wtypes.Expression],
           env: wisp.env.Environment) -> wtypes.Expression:
-    """Return the argument as-is, un-evaluated."""
-    return args[0]
+    """Return the argument as-is, un-evaluated.
+
+    When interning is enabled the shared copy of the argument is returned
+    instead, which is worked out once and cached on the argument.
+    """
+    val = args[0]
+    if not hashcons.enabled:
+        return val
+    elif not isinstance(val, wtypes.List):
+        return hashcons.intern(val)
+    if val.cache is None:
+        val.cache = {}
+    interned = val.cache.get('interned')
+    if interned is None:
+        interned = val.cache['interned'] = hashcons.intern(val)
+    return interned
 
 
 @arity(2)
 def cons(args: typing.List[wtypes.Expression],
-         env: wisp.env.Environment) -> wtypes.List:
+         env: wisp.env.Environment) -> wtypes.Expression:
     """Attach the first argument to the head of the list in the second."""
     head, rest = args
     if isinstance(rest, wtypes.List):
         return wtypes.List([head] + rest.items)
+    elif isinstance(rest, (wtypes.LazySeq, wtypes.Vector)):
+        return wtypes.LazySeq(lambda: (head, rest))
     else:
         raise exceptions.type_error(wtypes.List, rest)
 
@@ -84,21 +122,21 @@ def cons(args: typing.List[wtypes.Expression],
 def car(args: typing.List[wtypes.Expression],
         env: wisp.env.Environment) -> wtypes.Expression:
     """Return the first element of the given list."""
-    return __list_op(lambda wlst: wlst.items[0], args)
+    return __uncons('car', args)[0]
 
 
 @arity(1)
 def cdr(args: typing.List[wtypes.Expression],
-        env: wisp.env.Environment) -> wtypes.List:
+        env: wisp.env.Environment) -> wtypes.Expression:
     """Return all but the first element of the given list."""
-    return __list_op(lambda wlst: wtypes.List(wlst.items[1:]), args)
+    return __uncons('cdr', args)[1]
 
 
 @arity(1)
 def is_atom(args: typing.List[wtypes.Expression],
             env: wisp.env.Environment) -> wtypes.Bool:
     """Indicate whether we're passed a list or an atom."""
-    return wtypes.Bool(not isinstance(args[0], wtypes.List))
+    return wtypes.Bool(not isinstance(args[0], wtypes.SEQUENCE_TYPES))
 
 
 @arity(2)
@@ -131,7 +169,10 @@ def make_lamba(arg_def: typing.List[wtypes.Symbol],
                body: wtypes.List,
                closure: wisp.env.Environment) -> wtypes.Function:
     """Create a lambda for the argument list and body."""
-    closure_frame = closure.local_scope()
+    params = frozenset(symbol.name for symbol in arg_def)
+    expanded, free, defined = __analyze(body, closure, params)
+    cells = closure.capture(free)
+    profile = jit.Profile(arg_def, expanded, cells)
 
     @arity(len(arg_def))
     def func(args: typing.List[wtypes.Expression],
@@ -139,24 +180,120 @@ def make_lamba(arg_def: typing.List[wtypes.Symbol],
         """Bind arguments to a new frame and evaluate the body.
 
         This is the function which is actually called when the lambda
-        is evaluated. It creates a new stack frame, evaluates the
-        arguments passed, binds them according to the parameter list
-        and then evaluates the body in that frame.
+        is evaluated. It creates a new stack frame, binds the arguments
+        passed according to the parameter list and then evaluates the body
+        in that frame. Once the lambda is hot it is handed to the JIT.
         """
-        vals = [arg.eval(env) for arg in args]
+        profile.calls += 1
+        if profile.calls == jit.threshold:
+            profile.compile(w_function, args, env)
 
-        # add bindings for the closure
-        env.add_frame(closure_frame)
+        tracker = memory.tracker
+        if tracker is not None:
+            tracker.enter()
+        # add bindings for the closure, and empty cells for local
+        # definitions so closures created before them can see them
+        frame: typing.Dict[str, wtypes.Expression] = dict(cells)
+        for name in defined:
+            frame[name] = wisp.env.Cell()
+        env.add_frame(frame)
         try:
             # add bindings for the function arguments
-            for symbol, val in zip(arg_def, vals):
+            for symbol, val in zip(arg_def, args):
                 env.add_binding(symbol, val)
 
-            return body.eval(env)
+            return expanded.eval(env)
         finally:
             env.pop_frame()
+            if tracker is not None:
+                tracker.exit(w_function)
+
+    w_function = wtypes.Function(func)
+    return w_function
 
-    return wtypes.Function(func)
+
+@arity(3)
+def defmacro(args: typing.List[wtypes.Expression],
+             env: wisp.env.Environment) -> wtypes.Symbol:
+    """Bind a macro given a name, an argument list and a body.
+
+    When the macro is called, its arguments are bound un-evaluated and the
+    body is evaluated to produce the expression to run in its place.
+    """
+    name, arg_def, body = args
+    if not isinstance(name, wtypes.Symbol):
+        raise exceptions.type_error(wtypes.Symbol, name)
+    transformer = w_lambda([arg_def, body], env)
+    # w_lambda always returns a Function, which arity hides from mypy.
+    env.add_binding(name, wtypes.Macro(transformer.func))  # type: ignore
+    return name
+
+
+@arity(1)
+def macroexpand(args: typing.List[wtypes.Expression],
+                env: wisp.env.Environment) -> wtypes.Expression:
+    """Repeatedly expand the form while it is a macro call."""
+    form = args[0]
+    while True:
+        macro = __macro_call(form, env)
+        if macro is None:
+            return form
+        # __macro_call only finds macros at the head of non-empty lists.
+        form = macro.expand(form.args(), env)  # type: ignore
+
+
+def expand_all(form: wtypes.Expression,
+               env: wisp.env.Environment,
+               shadowed: typing.AbstractSet[str] = frozenset(),
+               heads: typing.Optional[Heads] = None) -> wtypes.Expression:
+    """Expand every macro call within the form, skipping quoted data.
+
+    Symbols in shadowed are bound locally and so never refer to macros.
+    Returns the form itself when it holds no macro calls. When heads is
+    given, the macro or quote each symbol called in the form was bound to,
+    if any, is recorded in it.
+    """
+    if not isinstance(form, wtypes.List) or not form.items:
+        return form
+
+    head = form.items[-1]
+    if isinstance(head, wtypes.Symbol) and head.name not in shadowed:
+        bound = __expansion_binding(head, env)
+        if heads is not None:
+            heads[head.name] = bound
+        if isinstance(bound, wtypes.Macro):
+            return expand_all(
+                bound.expand(form.args(), env), env, shadowed, heads
+            )
+        elif bound is not None:
+            # Quoted data is left as-is.
+            return form
+
+    items = [expand_all(item, env, shadowed, heads) for item in form.items]
+    if all(new is old for new, old in zip(items, form.items)):
+        return form
+    else:
+        return wtypes.List(items)
+
+
+def check(form: wtypes.Expression,
+          env: wisp.env.Environment,
+          declared: typing.Optional[
+              typing.Mapping[str, wtypes.Expression]] = None
+          ) -> typing.List[analysis.Problem]:
+    """Find problems in a top-level form without evaluating it.
+
+    Names in declared are looked up there before env, as when checking
+    forms ahead of those which define them.
+    """
+    declared = declared or {}
+
+    def lookup(name: str) -> typing.Optional[wtypes.Expression]:
+        if name in declared:
+            return declared[name]
+        return __lookup(wtypes.Symbol(name), env)
+
+    return analysis.check_calls(expand_all(form, env), lookup)
 
 
 def cond(args: typing.List[wtypes.Expression],
@@ -188,25 +325,683 @@ def w_set(args: typing.List[wtypes.Expression],
         raise exceptions.type_error(wtypes.Symbol, key)
 
 
+@arity(2)
+def loop(args: typing.List[wtypes.Expression],
+         env: wisp.env.Environment) -> wtypes.Expression:
+    """Evaluate the body, rebinding the loop variables each time it recurs.
+
+    Bindings are a list of (init name) pairs. The body is evaluated with
+    each name bound to its init, and evaluating a recur in tail position
+    rebinds the names to its arguments, in the order a call would bind
+    them, and runs the body again. Loop variables are rebound in place in
+    the current frame, so the loop runs without growing the stack, and hot
+    loops are handed to the JIT.
+    """
+    bindings, body = args
+    if not isinstance(bindings, wtypes.List):
+        raise exceptions.type_error(wtypes.List, bindings)
+    names, inits = __loop_bindings(bindings)
+    vals = [init.eval(env) for init in inits]
+    if len(env.frames) > 1:
+        return __run_loop(bindings, names, body, vals, env)
+
+    # Lambda bodies are checked when the lambda is created.
+    body = __analyze(body, env, frozenset(names), tail=True)[0]
+    env.add_frame()
+    try:
+        return __run_loop(bindings, names, body, vals, env)
+    finally:
+        env.pop_frame()
+
+
+def recur(args: typing.List[wtypes.Expression],
+          env: wisp.env.Environment) -> wtypes.Expression:
+    """Jump back to the start of the enclosing loop with new bindings."""
+    raise exceptions.Recur(args)
+
+
+@arity(1)
+def delay(args: typing.List[wtypes.Expression],
+          env: wisp.env.Environment) -> wtypes.Promise:
+    """Return a promise to evaluate the argument when it is forced."""
+    return wtypes.Promise(args[0], __capture(args[0], env))
+
+
+@arity(1)
+def force(args: typing.List[wtypes.Expression],
+          env: wisp.env.Environment) -> wtypes.Expression:
+    """Evaluate a promise, returning any non-promise argument as-is."""
+    val = args[0]
+    if isinstance(val, wtypes.Promise):
+        return val.force(env)
+    else:
+        return val
+
+
+@arity(2)
+def lazy_cons(args: typing.List[wtypes.Expression],
+              env: wisp.env.Environment) -> wtypes.LazySeq:
+    """Attach the head to a rest of the sequence which is evaluated lazily.
+
+    The head is evaluated immediately, while the rest is only evaluated
+    when the cdr of the resulting sequence is first realized.
+    """
+    head, rest = args
+    promise = wtypes.Promise(rest, __capture(rest, env))
+    val = head.eval(env)
+
+    def realize_rest() -> wtypes.Cell:
+        return wtypes.uncons(promise.force(env))
+
+    return wtypes.LazySeq(lambda: (val, wtypes.LazySeq(realize_rest)))
+
+
+def w_map(args: typing.List[wtypes.Expression],
+          env: wisp.env.Environment) -> wtypes.Expression:
+    """Call a function on each element of one or more lists in turn.
+
+    The function is passed an element from each list, until the shortest
+    runs out. Returns a list of the results, or a lazy sequence of them if
+    any of the lists is lazy, calling the function as it is realized.
+    """
+    __require_args(args, 2)
+    function = __function(args[0])
+    seqs = args[1:]
+    results = (function.apply(list(vals), env)
+               for vals in zip(*map(wtypes.iterate, seqs)))
+    if any(isinstance(seq, wtypes.LazySeq) for seq in seqs):
+        return wtypes.LazySeq.from_iterable(results)
+    return wtypes.List(list(results))
+
+
+@arity(2)
+def w_filter(args: typing.List[wtypes.Expression],
+             env: wisp.env.Environment) -> wtypes.Expression:
+    """Return the elements of a list for which a predicate returns true.
+
+    A lazy sequence is filtered lazily.
+    """
+    function, seq = __function(args[0]), args[1]
+    kept = (val for val in wtypes.iterate(seq)
+            if function.apply([val], env) == wtypes.Bool(True))
+    if isinstance(seq, wtypes.LazySeq):
+        return wtypes.LazySeq.from_iterable(kept)
+    return wtypes.List(list(kept))
+
+
+def reduce(args: typing.List[wtypes.Expression],
+           env: wisp.env.Environment) -> wtypes.Expression:
+    """Fold a function over one or more lists, starting from a value.
+
+    The function is passed the value so far followed by an element from
+    each list, until the shortest runs out, and returns the next value.
+    """
+    __require_args(args, 3)
+    function, val = __function(args[0]), args[1]
+    for vals in zip(*map(wtypes.iterate, args[2:])):
+        val = function.apply([val, *vals], env)
+    return val
+
+
+def w_apply(args: typing.List[wtypes.Expression],
+            env: wisp.env.Environment) -> wtypes.Expression:
+    """Call a function with any arguments given, then those in a list."""
+    __require_args(args, 2)
+    function = __function(args[0])
+    return function.apply(args[1:-1] + list(wtypes.iterate(args[-1])), env)
+
+
+@interop.unboxed
+def length(seq: wtypes.Expression) -> int:
+    """Return the number of elements in a sequence."""
+    if isinstance(seq, wtypes.List):
+        return len(seq.items)
+    elif isinstance(seq, wtypes.Vector):
+        return len(seq.data)
+    return sum(1 for _ in wtypes.iterate(seq))
+
+
+@interop.unboxed
+def nth(seq: wtypes.Expression, n: int) -> wtypes.Expression:
+    """Return the element of a sequence at an index, counting from zero."""
+    if n >= 0:
+        if isinstance(seq, wtypes.List) and n < len(seq.items):
+            return seq.items[n]
+        elif isinstance(seq, wtypes.Vector) and n < len(seq.data):
+            return wtypes.Integer(seq.data[n])
+        for val in itertools.islice(wtypes.iterate(seq), n, None):
+            return val
+    raise exceptions.WispException('index %d out of range' % n)
+
+
+@interop.unboxed
+def append(*seqs: wtypes.Expression) -> wtypes.Expression:
+    """Join sequences end to end.
+
+    Vectors join into a vector, and any lazy sequence makes the result a
+    lazy sequence, realizing the sequences as it is.
+    """
+    if all(isinstance(seq, wtypes.Vector) for seq in seqs):
+        data = array.array('q')
+        for seq in seqs:
+            data.extend(seq.data)  # type: ignore
+        return wtypes.Vector(data)
+    joined = itertools.chain.from_iterable(map(wtypes.iterate, seqs))
+    if any(isinstance(seq, wtypes.LazySeq) for seq in seqs):
+        return wtypes.LazySeq.from_iterable(joined)
+    return wtypes.List(list(joined))
+
+
+@interop.unboxed
+def reverse(seq: wtypes.Expression) -> wtypes.Expression:
+    """Return the elements of a sequence in reverse order."""
+    if isinstance(seq, wtypes.Vector):
+        return wtypes.Vector(seq.data[::-1])
+    return wtypes.List(list(wtypes.iterate(seq))[::-1])
+
+
+@interop.unboxed
+def last(seq: wtypes.Expression) -> wtypes.Expression:
+    """Return the last element of a sequence."""
+    if isinstance(seq, wtypes.List) and seq.items:
+        return seq.items[-1]
+    elif isinstance(seq, wtypes.Vector) and seq.data:
+        return wtypes.Integer(seq.data[-1])
+    val = None
+    for val in wtypes.iterate(seq):
+        pass
+    if val is None:
+        raise exceptions.WispException('can not apply last to an empty list')
+    return val
+
+
+@interop.unboxed
+def w_range(*bounds: int) -> wtypes.Expression:
+    """Return a vector of the integers from a start up to an end.
+
+    Takes an end, counting from zero, or a start and an end, and then
+    optionally a step, as python's range does. Ranges longer than
+    RANGE_VECTOR_LIMIT are lazy sequences instead.
+    """
+    if not 1 <= len(bounds) <= 3:
+        raise exceptions.WispException(
+            'called with %d arguments, requires 1 to 3' % len(bounds)
+        )
+    elif len(bounds) == 3 and bounds[2] == 0:
+        raise exceptions.WispException('range step must not be zero')
+    integers = range(*bounds)
+    if len(integers) > RANGE_VECTOR_LIMIT:
+        return wtypes.LazySeq.from_iterable(map(wtypes.Integer, integers))
+    return wtypes.Vector(array.array('q', integers))
+
+
+@interop.unboxed
+def is_less(a: wtypes.Expression, b: wtypes.Expression) -> bool:
+    """Indicate whether the first value sorts before the second.
+
+    Integers, strings and booleans compare by value, with each other only.
+    """
+    if type(a) is not type(b):
+        raise exceptions.WispException('can not compare %s and %s' % (a, b))
+    return __sort_key(a) < __sort_key(b)
+
+
+def sort(args: typing.List[wtypes.Expression],
+         env: wisp.env.Environment) -> wtypes.Expression:
+    """Sort a sequence, keeping equal elements in their original order.
+
+    Integers, strings and booleans are sorted by their values. Given a
+    function of two arguments, it is called as a comparator, returning
+    true when its first argument belongs before its second. Given any
+    other function, it is called once on each element for a key to sort
+    by, which must be an integer, string or boolean. Vectors sorted by
+    value are sorted in place of a copy, without boxing their elements.
+    """
+    if not 1 <= len(args) <= 2:
+        raise exceptions.WispException(
+            'called with %d arguments, requires 1 or 2' % len(args)
+        )
+    seq = args[0]
+    if len(args) == 1 and isinstance(seq, wtypes.Vector):
+        return wtypes.Vector(array.array('q', sorted(seq.data)))
+    vals = list(wtypes.iterate(seq))
+    if len(args) == 1:
+        keys = __sort_keys(vals)
+    else:
+        function = __function(args[1])
+        if function.arity == 2:
+            def compare(a: wtypes.Expression, b: wtypes.Expression) -> int:
+                # Sorting only ever asks if one value belongs before another.
+                return -1 if function.apply([a, b], env) == wtypes.Bool(
+                    True) else 0
+            return wtypes.List(
+                sorted(vals, key=functools.cmp_to_key(compare)))
+        keys = __sort_keys([function.apply([val], env) for val in vals])
+    order = sorted(range(len(vals)), key=keys.__getitem__)
+    return wtypes.List([vals[i] for i in order])
+
+
+@interop.unboxed
+def open_lines(path: str) -> wtypes.LazySeq:
+    """Return a lazy sequence of the lines in the file at the given path."""
+    return wtypes.LazySeq.from_iterable(files.iter_lines(path))
+
+
+@interop.unboxed
+def read_chunks(path: str, size: int) -> wtypes.LazySeq:
+    """Return a lazy sequence of fixed-size string chunks of a file."""
+    return wtypes.LazySeq.from_iterable(files.iter_chunks(path, size))
+
+
+def load_csv(args: typing.List[wtypes.Expression],
+             env: wisp.env.Environment) -> wtypes.List:
+    """Load a CSV file as a list of rows, optionally selecting columns."""
+    return loaders.load_csv(*__loader_args(args))
+
+
+def load_csv_columns(args: typing.List[wtypes.Expression],
+                     env: wisp.env.Environment) -> wtypes.List:
+    """Load a CSV file as a list of (name values) columns.
+
+    Integer columns are stored compactly in vectors.
+    """
+    return loaders.load_csv_columns(*__loader_args(args))
+
+
+@interop.unboxed
+def load_json(path: str) -> wtypes.Expression:
+    """Load a JSON file as wisp values."""
+    return loaders.load_json(path)
+
+
+@interop.unboxed
+def load_json_lines(path: str) -> wtypes.LazySeq:
+    """Return a lazy sequence of the records in a JSON lines file."""
+    return wtypes.LazySeq.from_iterable(loaders.iter_json_lines(path))
+
+
+@interop.unboxed
+def write_csv(path: str, rows: wtypes.Expression) -> int:
+    """Write a sequence of rows to a CSV file, returning the row count."""
+    return loaders.write_csv(rows, path)
+
+
+@interop.unboxed
+def write_json(path: str, val: wtypes.Expression) -> str:
+    """Write a value to a JSON file, returning the path written to."""
+    loaders.write_json(val, path)
+    return path
+
+
+@interop.unboxed
+def write_json_lines(path: str, records: wtypes.Expression) -> int:
+    """Write each record of a sequence to a JSON lines file.
+
+    Returns the number of records written.
+    """
+    return loaders.write_json_lines(records, path)
+
+
+def spawn(args: typing.List[wtypes.Expression],
+          env: wisp.env.Environment) -> tasks.Task:
+    """Start a task calling a function with the rest of the arguments."""
+    if not args:
+        raise exceptions.WispException('called with 0 arguments, requires 1')
+    function = args[0]
+    if not isinstance(function, wtypes.Function):
+        raise exceptions.type_error(wtypes.Function, function)
+    return tasks.scheduler(env).spawn(function, args[1:], env)
+
+
+@arity(0)
+def w_yield(args: typing.List[wtypes.Expression],
+            env: wisp.env.Environment) -> wtypes.Expression:
+    """Let the other tasks ready to run have a turn."""
+    tasks.scheduler(env).pause()
+    return tasks.UNSPECIFIED
+
+
+@arity(1)
+def sleep(args: typing.List[wtypes.Expression],
+          env: wisp.env.Environment) -> wtypes.Expression:
+    """Let other tasks run for at least the given number of milliseconds."""
+    millis = args[0]
+    if not isinstance(millis, wtypes.Integer):
+        raise exceptions.type_error(wtypes.Integer, millis)
+    tasks.scheduler(env).sleep(millis.val / 1000)
+    return tasks.UNSPECIFIED
+
+
+def chan(args: typing.List[wtypes.Expression],
+         env: wisp.env.Environment) -> tasks.Channel:
+    """Make a channel, buffering as many values as an optional capacity."""
+    if not args:
+        return tasks.Channel()
+    elif len(args) > 1:
+        raise exceptions.WispException(
+            'called with %d arguments, requires 0 or 1' % len(args)
+        )
+    elif not isinstance(args[0], wtypes.Integer):
+        raise exceptions.type_error(wtypes.Integer, args[0])
+    return tasks.Channel(args[0].val)
+
+
+@arity(2)
+def send(args: typing.List[wtypes.Expression],
+         env: wisp.env.Environment) -> wtypes.Expression:
+    """Send a value over a channel, returning the value."""
+    channel, val = args
+    tasks.scheduler(env).send(__channel(channel), val)
+    return val
+
+
+@arity(1)
+def recv(args: typing.List[wtypes.Expression],
+         env: wisp.env.Environment) -> wtypes.Expression:
+    """Receive the next value sent over a channel."""
+    return tasks.scheduler(env).receive(__channel(args[0]))
+
+
+@arity(1)
+def join(args: typing.List[wtypes.Expression],
+         env: wisp.env.Environment) -> wtypes.Expression:
+    """Wait for a task to finish, returning its result."""
+    task = args[0]
+    if not isinstance(task, tasks.Task):
+        raise exceptions.type_error(tasks.Task, task)
+    return tasks.scheduler(env).join(task)
+
+
+@arity(0)
+def memory_stats(args: typing.List[wtypes.Expression],
+                 env: wisp.env.Environment) -> wtypes.Expression:
+    """Return a snapshot of the memory held by wisp as (name value) pairs."""
+    return interop.to_wisp(memory.snapshot(env).as_dict())
+
+
 def begin(args: typing.List[wtypes.Expression],
           env: wisp.env.Environment) -> wtypes.Expression:
     """Return the last of the given arguments."""
     return args[-1]
 
 
-def __list_op(op: typing.Callable[[wtypes.List], T],
-              args: typing.List[wtypes.Expression]) -> T:
-    """Ensure args is a non-empty List and return the call of op on it."""
-    val = args[0]
-    if isinstance(val, wtypes.List):
-        if val.items:
-            return op(val)
-        else:
-            raise exceptions.WispException(
-                'can not apply cdr to an empty list'
-            )
+def __uncons(name: str,
+             args: typing.List[wtypes.Expression]) -> typing.Tuple[
+                 wtypes.Expression, wtypes.Expression]:
+    """Ensure args is a non-empty sequence and split it into head and rest."""
+    cell = wtypes.uncons(args[0])
+    if cell is None:
+        raise exceptions.WispException(
+            'can not apply %s to an empty list' % name
+        )
     else:
-        raise exceptions.type_error(wtypes.List, val)
+        return cell
+
+
+def __run_loop(bindings: wtypes.List,
+               names: typing.List[str],
+               body: wtypes.Expression,
+               vals: typing.List[wtypes.Expression],
+               env: wisp.env.Environment) -> wtypes.Expression:
+    """Run a loop in the local frame, starting from the given values.
+
+    The function running the loop is built the first time the loop form is
+    run and cached on its bindings, alongside the body it was built for.
+    """
+    if bindings.cache is None:
+        bindings.cache = {}
+    cached = bindings.cache.get('loop')
+    if cached is None or cached[0] is not body:
+        cached = bindings.cache['loop'] = (body,) + __make_loop(
+            names, body, env)
+    _, w_function, interpreted, free = cached
+
+    captured = __plain_locals(env.frames[0], free)
+    if captured is None:
+        return interpreted(vals, env)
+    return w_function.func(vals + captured, env)
+
+
+def __plain_locals(frame: typing.Dict[str, wtypes.Expression],
+                   names: typing.List[str]
+                   ) -> typing.Optional[typing.List[wtypes.Expression]]:
+    """Return the values of the names in the frame to pass compiled code.
+
+    Returns None if any of them are unbound or held in cells, which
+    compiled code can't read.
+    """
+    vals = []
+    for name in names:
+        val = frame.get(name)
+        if val is None or isinstance(val, wisp.env.Cell):
+            return None
+        vals.append(val)
+    return vals
+
+
+def __make_loop(names: typing.List[str],
+                body: wtypes.Expression,
+                env: wisp.env.Environment) -> typing.Tuple[
+                    wtypes.Function, wtypes.Callable, typing.List[str]]:
+    """Build the function running a loop body until it stops recurring.
+
+    The function is passed the values of the loop variables followed by
+    those of the local variables the body reads, which the JIT needs
+    should it compile the loop.
+    """
+    frame = env.frames[0]
+    free = sorted(name for name in analysis.symbols(body) - set(names)
+                  if name in frame)
+    cells: typing.Dict[str, wisp.env.Cell] = {}
+    for name in free:
+        val = frame[name]
+        if isinstance(val, wisp.env.Cell):
+            cells[name] = val
+    profile = jit.Profile(
+        [wtypes.Symbol(name) for name in names + free],
+        body,
+        cells,
+        rebound=len(names)
+    )
+
+    def func(args: typing.List[wtypes.Expression],
+             env: wisp.env.Environment) -> wtypes.Expression:
+        """Evaluate the body with the loop variables bound until done."""
+        frame = env.frames[0]
+        saved = {name: frame[name] for name in names if name in frame}
+        vals = args[:len(names)]
+        try:
+            while True:
+                for name, val in zip(names, vals):
+                    frame[name] = val
+                try:
+                    return body.eval(env)
+                except exceptions.Recur as e:
+                    if len(e.vals) != len(names):
+                        raise exceptions.WispException(
+                            'recur with %d arguments, loop binds %d' % (
+                                len(e.vals), len(names))
+                        )
+                    vals = e.vals
+
+                profile.calls += 1
+                if profile.calls == jit.threshold:
+                    captured = __plain_locals(frame, free)
+                    if captured is not None:
+                        profile.compile(w_function, vals + captured, env)
+                        if w_function.func is not func:
+                            # Run the remaining iterations compiled.
+                            return w_function.func(vals + captured, env)
+        finally:
+            for name in names:
+                if name in saved:
+                    frame[name] = saved[name]
+                else:
+                    del frame[name]
+
+    w_function = wtypes.Function(func)
+    return w_function, func, free
+
+
+def __loop_bindings(bindings: wtypes.List) -> typing.Tuple[
+        typing.List[str], typing.List[wtypes.Expression]]:
+    """Split a list of (init name) loop bindings into names and inits."""
+    names = []
+    inits = []
+    for binding in bindings.items:
+        if not isinstance(binding, wtypes.List) or len(binding.items) != 2:
+            raise exceptions.WispException('invalid loop binding %s' % binding)
+        init, name = binding.items
+        if not isinstance(name, wtypes.Symbol):
+            raise exceptions.type_error(wtypes.Symbol, name)
+        names.append(name.name)
+        inits.append(init)
+    return names, inits
+
+
+def __capture(expr: wtypes.Expression, env: wisp.env.Environment
+              ) -> typing.Dict[str, wtypes.Expression]:
+    """Return a frame of cells for the local variables expr refers to."""
+    return dict(env.capture(analysis.symbols(expr)))
+
+
+def __lookup(symbol: wtypes.Symbol,
+             env: wisp.env.Environment) -> typing.Optional[wtypes.Expression]:
+    """Return the symbol's binding, or None if it is unbound."""
+    try:
+        return env[symbol]
+    except exceptions.WispException:
+        return None
+
+
+def __analyze(body: wtypes.Expression,
+              env: wisp.env.Environment,
+              shadowed: typing.FrozenSet[str],
+              tail: bool = False) -> typing.Tuple[
+                  wtypes.Expression, typing.Set[str], typing.Set[str]]:
+    """Expand and check a lambda or loop body.
+
+    Raises an exception for calls to known functions with the wrong number
+    of arguments, marking those which are right as checked. Returns the
+    expanded body, along with its free symbols and the names it defines.
+    The results are cached on the body, and reused for as long
+    as each symbol it calls is bound to the same macro, or lack of one.
+    """
+    cached = body.cache.get('body') \
+        if isinstance(body, wtypes.List) and body.cache else None
+    if cached is not None and cached[:2] == (shadowed, tail):
+        bindings, analyzed = cached[2:]
+        if all(__expansion_binding(symbol, env) == bound
+               for symbol, bound in bindings):
+            return analyzed
+
+    heads: Heads = {}
+    expanded = expand_all(body, env, shadowed, heads)
+    analysis.check_recur(expanded, tail)
+    defined = analysis.defines(expanded)
+    # Globals may be defined after the body, so only arity is an error.
+    for problem in analysis.check_calls(
+            expanded, lambda name: __lookup(wtypes.Symbol(name), env),
+            shadowed | defined):
+        if problem.kind == analysis.ARITY:
+            raise exceptions.WispException(problem.message)
+    analyzed = (expanded, analysis.symbols(expanded) - shadowed, defined)
+    if isinstance(body, wtypes.List):
+        if body.cache is None:
+            body.cache = {}
+        bindings = [(wtypes.Symbol(name), bound)
+                    for name, bound in heads.items()]
+        body.cache['body'] = shadowed, tail, bindings, analyzed
+    return analyzed
+
+
+def __expansion_binding(symbol: wtypes.Symbol, env: wisp.env.Environment
+                        ) -> typing.Optional[wtypes.Expression]:
+    """Return the macro or quote the symbol is bound to, if either.
+
+    These are the only bindings which change how a call is expanded.
+    """
+    val = __lookup(symbol, env)
+    if isinstance(val, wtypes.Macro) or (
+            isinstance(val, wtypes.SpecialForm) and val.func is quote):
+        return val
+    return None
+
+
+def __macro_call(form: wtypes.Expression,
+                 env: wisp.env.Environment,
+                 shadowed: typing.AbstractSet[str] = frozenset()
+                 ) -> typing.Optional[wtypes.Macro]:
+    """Return the macro the form calls, if it is a macro call."""
+    if isinstance(form, wtypes.List) and form.items:
+        head = form.items[-1]
+        if isinstance(head, wtypes.Symbol) and head.name not in shadowed:
+            macro = __lookup(head, env)
+            if isinstance(macro, wtypes.Macro):
+                return macro
+    return None
+
+
+def __function(val: wtypes.Expression) -> wtypes.Function:
+    """Ensure val is a function."""
+    if isinstance(val, wtypes.Function):
+        return val
+    else:
+        raise exceptions.type_error(wtypes.Function, val)
+
+
+def __sort_key(val: wtypes.Expression) -> typing.Any:
+    """Unbox an integer, string or boolean to compare it."""
+    if isinstance(val, (wtypes.Integer, wtypes.String, wtypes.Bool)):
+        return val.val
+    raise exceptions.WispException('can not compare %s' % val)
+
+
+def __sort_keys(vals: typing.List[wtypes.Expression]
+                ) -> typing.List[typing.Any]:
+    """Unbox values of a single type to sort them, as less? compares them."""
+    keys = [__sort_key(val) for val in vals]
+    if len({type(val) for val in vals}) > 1:
+        raise exceptions.WispException('can not sort mixed types')
+    return keys
+
+
+def __require_args(args: typing.List[wtypes.Expression], n: int):
+    """Raise an exception if there are fewer than n args."""
+    if len(args) < n:
+        raise exceptions.WispException(
+            'called with %d arguments, requires at least %d' % (len(args), n)
+        )
+
+
+def __channel(val: wtypes.Expression) -> tasks.Channel:
+    """Ensure val is a channel."""
+    if isinstance(val, tasks.Channel):
+        return val
+    else:
+        raise exceptions.type_error(tasks.Channel, val)
+
+
+def __string(val: wtypes.Expression) -> str:
+    """Unwrap a String, raising an exception for any other type."""
+    if isinstance(val, wtypes.String):
+        return val.val
+    else:
+        raise exceptions.type_error(wtypes.String, val)
+
+
+def __loader_args(args: typing.List[wtypes.Expression]) -> typing.Tuple[
+        str, typing.Optional[typing.List[str]], typing.Dict[str, str]]:
+    """Read a path and an optional column selection for the loaders."""
+    if len(args) == 1:
+        return __string(args[0]), None, {}
+    elif len(args) == 2:
+        columns, types = loaders.column_spec(args[1])
+        return __string(args[0]), columns, types
+    else:
+        raise exceptions.WispException(
+            'called with %d arguments, requires 1 or 2' % len(args)
+        )
 
 
 def __wrap_operator(op,
@@ -219,8 +1014,20 @@ def __wrap_operator(op,
 
 
 def env() -> wisp.env.Environment:
-    """Build an environment with wisp builtin functions defined."""
-    return wisp.env.Environment({
+    """Build an environment with wisp builtin functions defined.
+
+    The builtins are built once and shared by every environment, so calls
+    checked against them in one stay checked in the next.
+    """
+    global __builtins
+    if __builtins is None:
+        __builtins = __make_builtins()
+    return wisp.env.Environment(dict(__builtins))
+
+
+def __make_builtins() -> typing.Dict[str, wtypes.Expression]:
+    """Build the builtin functions, by name."""
+    return {
         '+': wtypes.Function(add),
         '-': wtypes.Function(sub),
         '*': wtypes.Function(mul),
@@ -235,5 +1042,41 @@ def env() -> wisp.env.Environment:
         'lambda': wtypes.SpecialForm(w_lambda),
         'cond': wtypes.SpecialForm(cond),
         'set!': wtypes.SpecialForm(w_set),
+        'loop': wtypes.SpecialForm(loop),
+        'recur': wtypes.Function(recur),
+        'defmacro': wtypes.SpecialForm(defmacro),
+        'macroexpand': wtypes.Function(macroexpand),
         'begin': wtypes.Function(begin),
-    })
+        'delay': wtypes.SpecialForm(delay),
+        'force': wtypes.Function(force),
+        'lazy-cons': wtypes.SpecialForm(lazy_cons),
+        'open-lines': wtypes.Function(open_lines),
+        'read-chunks': wtypes.Function(read_chunks),
+        'load-csv': wtypes.Function(load_csv),
+        'load-csv-columns': wtypes.Function(load_csv_columns),
+        'load-json': wtypes.Function(load_json),
+        'load-json-lines': wtypes.Function(load_json_lines),
+        'write-csv': wtypes.Function(write_csv),
+        'write-json': wtypes.Function(write_json),
+        'write-json-lines': wtypes.Function(write_json_lines),
+        'memory-stats': wtypes.Function(memory_stats),
+        'spawn': wtypes.Function(spawn),
+        'yield': wtypes.Function(w_yield),
+        'sleep': wtypes.Function(sleep),
+        'chan': wtypes.Function(chan),
+        'send': wtypes.Function(send),
+        'recv': wtypes.Function(recv),
+        'join': wtypes.Function(join),
+        'map': wtypes.Function(w_map),
+        'filter': wtypes.Function(w_filter),
+        'reduce': wtypes.Function(reduce),
+        'apply': wtypes.Function(w_apply),
+        'length': wtypes.Function(length),
+        'nth': wtypes.Function(nth),
+        'append': wtypes.Function(append),
+        'reverse': wtypes.Function(reverse),
+        'last': wtypes.Function(last),
+        'range': wtypes.Function(w_range),
+        'sort': wtypes.Function(sort),
+        'less?': wtypes.Function(is_less),
+    }
@@ -0,0 +1,111 @@
+"""Print wisp values as wisp source.
+
+Values are written out incrementally, buffering text in chunks, so large
+results are never built up as one string in memory and lazy sequences are
+realized only as they are written. Nested sequences are walked with an
+explicit stack, so there is no limit on how deeply they may be nested.
+
+Printed data reads back as the same value, unless it was truncated or
+holds values with no literal syntax, such as functions, which are printed
+as #<function> and so on.
+"""
+
+import io
+import typing
+
+import wisp.exceptions as exceptions
+import wisp.wtypes as wtypes
+
+# Buffer this many characters before writing them out to the file.
+FLUSH_SIZE = 1 << 16
+
+ELLIPSIS = '...'
+
+
+class Writer:
+    """Write wisp values to a text file.
+
+    When limit is set, only the first limit elements of each sequence are
+    written, followed by an ellipsis if there were any more.
+    """
+
+    def __init__(self, fp: typing.TextIO, limit: typing.Optional[int] = None):
+        self.fp = fp
+        self.limit = limit
+        self.buf: typing.List[str] = []
+        self.size = 0
+
+    def write(self, expr: wtypes.Expression):
+        """Write the value out, buffering the text."""
+        # Iterators over the sequences being written, each paired with
+        # the number of elements written so far.
+        stack: typing.List[typing.List[typing.Any]] = []
+        val: typing.Optional[wtypes.Expression] = expr
+        while val is not None:
+            if isinstance(val, wtypes.SEQUENCE_TYPES):
+                self.__emit('(')
+                stack.append([wtypes.iterate(val), 0])
+            else:
+                self.__emit(self.__atom(val))
+
+            val = None
+            while stack and val is None:
+                it, count = stack[-1]
+                val = next(it, None)
+                if val is None:
+                    self.__emit(')')
+                    stack.pop()
+                    continue
+                if count:
+                    self.__emit(' ')
+                if count == self.limit:
+                    self.__emit(ELLIPSIS + ')')
+                    stack.pop()
+                    val = None
+                else:
+                    stack[-1][1] += 1
+
+    def flush(self):
+        """Write out any buffered text."""
+        self.fp.write(''.join(self.buf))
+        self.buf = []
+        self.size = 0
+
+    def __emit(self, text: str):
+        """Buffer text, writing it out once enough has built up."""
+        self.buf.append(text)
+        self.size += len(text)
+        if self.size >= FLUSH_SIZE:
+            self.flush()
+
+    def __atom(self, val: wtypes.Expression) -> str:
+        """Return the source of a value which is not a sequence."""
+        if isinstance(val, wtypes.Integer):
+            return str(val.val)
+        elif isinstance(val, wtypes.Bool):
+            return '#t' if val.val else '#f'
+        elif isinstance(val, wtypes.Symbol):
+            return val.name
+        elif isinstance(val, wtypes.String):
+            if '"' in val.val:
+                # There is no way to escape quotes within strings.
+                raise exceptions.WispException('can not print %s' % val)
+            return '"%s"' % val.val
+        else:
+            return '#<%s>' % type(val).__name__.lower()
+
+
+def write(expr: wtypes.Expression,
+          fp: typing.TextIO,
+          limit: typing.Optional[int] = None):
+    """Write a value out to a text file as wisp source."""
+    writer = Writer(fp, limit)
+    writer.write(expr)
+    writer.flush()
+
+
+def dumps(expr: wtypes.Expression, limit: typing.Optional[int] = None) -> str:
+    """Return a value as wisp source."""
+    f = io.StringIO()
+    write(expr, f, limit)
+    return f.getvalue()
@@ -1,14 +1,34 @@
 """The wisp REPL."""
 
-import parsec  # type: ignore
+import argparse
+import sys
 
+import wisp.analysis as analysis
+import wisp.checks as checks
 import wisp.exceptions as exceptions
+import wisp.heap
 import wisp.parser as parser
 import wisp.prelude as prelude
+import wisp.printer as printer
+import wisp.runner as runner
+import wisp.watch as watch
 
+# Print at most this many elements of each sequence in the REPL.
+PRINT_LIMIT = 100
 
-def main():
+
+def main(argv=None):
     """Implement the read-eval-print loop."""
+    args = __parse_args(argv)
+    if args.command == 'run':
+        exit(runner.main(args.files, args.jobs, args.lib, args.heap))
+    if args.command == 'heap':
+        exit(wisp.heap.main(args.output, args.files))
+    if args.check:
+        __check(args.check)
+    if args.watch:
+        watch.main(args.watch)
+        exit(0)
     env = prelude.env()
     while True:
         try:
@@ -18,12 +38,87 @@ def main():
             exit(0)
         else:
             try:
-                expr = parser.parse_expr.parse_strict(line)
-            except parsec.ParseError as e:
+                form = parser.read(line)
+                __warn(form, env)
+                result = form.eval(env)
+                __print(result, args)
+            except exceptions.WispException as e:
                 print(e)
-            else:
-                try:
-                    result = expr.eval(env)
-                    print(result)
-                except exceptions.WispException as e:
-                    print(e)
+
+
+def __parse_args(argv):
+    """Parse the command line options."""
+    arg_parser = argparse.ArgumentParser(prog='wisp')
+    arg_parser.add_argument(
+        '--print-format', choices=('repr', 'wisp'), default='repr',
+        help='print results as python reprs or as wisp source'
+    )
+    arg_parser.add_argument(
+        '--print-limit', type=int, default=PRINT_LIMIT,
+        help='print at most this many elements of each sequence when '
+             'printing wisp source, or all of them if negative'
+    )
+    arg_parser.add_argument(
+        '--check', nargs='+', metavar='FILE',
+        help='list the problems found in source files without running them'
+    )
+    arg_parser.add_argument(
+        '--watch', metavar='FILE',
+        help='evaluate a source file, then what changes each time it is saved'
+    )
+    commands = arg_parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser(
+        'run', help='run source files, each in its own environment'
+    )
+    run_parser.add_argument('files', nargs='+', metavar='FILE')
+    run_parser.add_argument(
+        '--jobs', type=int, default=1,
+        help='run files in a pool of this many worker processes'
+    )
+    run_parser.add_argument(
+        '--lib', action='append', default=[], metavar='FILE',
+        help='load a library before running each file, may be repeated'
+    )
+    run_parser.add_argument(
+        '--heap', metavar='FILE',
+        help='look up globals in a heap built by wisp heap, shared between '
+             'the workers'
+    )
+    heap_parser = commands.add_parser(
+        'heap', help='build a heap of the data source files define'
+    )
+    heap_parser.add_argument('output', metavar='OUT')
+    heap_parser.add_argument('files', nargs='+', metavar='FILE')
+    return arg_parser.parse_args(argv)
+
+
+def __check(paths):
+    """Print the problems found in source files, then exit."""
+    found = False
+    for path in paths:
+        try:
+            messages = checks.report(path)
+        except exceptions.WispException as e:
+            messages = [str(e)]
+        for message in messages:
+            print(message)
+        found = found or bool(messages)
+    exit(1 if found else 0)
+
+
+def __warn(form, env):
+    """Print a warning for each unbound symbol the form refers to."""
+    declared = {name: form for name in analysis.defines(form)}
+    for problem in prelude.check(form, env, declared):
+        if problem.kind == analysis.UNBOUND:
+            print('warning: %s' % problem.message)
+
+
+def __print(result, args):
+    """Print a result in the chosen format."""
+    if args.print_format == 'repr':
+        print(result)
+    else:
+        limit = args.print_limit if args.print_limit >= 0 else None
+        printer.write(result, sys.stdout, limit)
+        print()
@@ -0,0 +1,150 @@
+"""Run many wisp source files, each in its own environment.
+
+Files are run across a pool of worker processes which stay warm between
+files: each worker imports wisp and loads the shared libraries once, when
+it starts, rather than once per file. Libraries are parsed up front and
+handed to the workers in the binary encoding of wisp.serialize.
+
+Every file gets a fresh prelude environment with the libraries evaluated
+into it, so nothing a file defines or compiles can leak into the next
+one. Library forms are only parsed once and their lambda bodies analyzed
+once, so evaluating them again for each file is cheap.
+
+A heap of shared data, built by wisp.heap, may be attached to every
+environment, in which case each worker maps it into memory when it
+starts instead of the data being loaded for every file.
+
+A file's output is its last value, printed as wisp source, after anything
+it wrote to stdout along the way.
+"""
+
+import concurrent.futures
+import contextlib
+from dataclasses import dataclass
+import io
+import time
+import typing
+
+import wisp.exceptions as exceptions
+import wisp.heap
+import wisp.printer as printer
+import wisp.prelude as prelude
+import wisp.serialize as serialize
+import wisp.sources as sources
+import wisp.wtypes as wtypes
+
+# Print at most this many elements of each sequence a file results in.
+PRINT_LIMIT = 100
+
+
+@dataclass
+class Result:
+    """The outcome of running a source file.
+
+    Error is the message of the exception the file failed with, if any.
+    """
+    path: str
+    output: str
+    error: typing.Optional[str]
+    seconds: float
+
+
+# The forms of the libraries every file is run with, loaded by the worker
+# process when it starts.
+__libraries: typing.List[wtypes.Expression] = []
+
+# The heap attached to every file's environment, if there is one.
+__heap: typing.Optional[wisp.heap.Heap] = None
+
+
+def run_files(paths: typing.Sequence[str],
+              jobs: int = 1,
+              libraries: typing.Sequence[str] = (),
+              heap: typing.Optional[str] = None
+              ) -> typing.Iterator[Result]:
+    """Run each file after the libraries, yielding the results in order.
+
+    With more than one job, files are run in a pool of that many worker
+    processes, and results are yielded as soon as those of every earlier
+    file have been. Raises an exception if a library or the heap can't be
+    loaded.
+    """
+    f = io.BytesIO()
+    serialize.dump_stream(
+        (form for path in libraries for form in sources.load(path)), f)
+    if heap is not None:
+        # Fail here, rather than in every worker.
+        wisp.heap.Heap(heap)
+    if jobs <= 1 or len(paths) < 2:
+        __start_worker(f.getvalue(), heap)
+        yield from map(run_file, paths)
+        return
+    with concurrent.futures.ProcessPoolExecutor(
+            jobs, initializer=__start_worker,
+            initargs=(f.getvalue(), heap)) as pool:
+        yield from pool.map(run_file, paths)
+
+
+def run_file(path: str) -> Result:
+    """Run a file in a new environment holding the worker's libraries."""
+    start = time.perf_counter()
+    stdout = io.StringIO()
+    error = None
+    try:
+        with contextlib.redirect_stdout(stdout):
+            env = prelude.env()
+            env.heap = __heap
+            for form in __libraries:
+                form.eval(env)
+            result = None
+            for form in sources.load(path):
+                result = form.eval(env)
+            if result is not None:
+                printer.write(result, stdout, PRINT_LIMIT)
+                stdout.write('\n')
+    except exceptions.WispException as e:
+        error = str(e)
+    except RecursionError:
+        error = 'maximum recursion depth exceeded'
+    except Exception as e:
+        # A file failing in any other way fails on its own, not the batch.
+        error = '%s: %s' % (type(e).__name__, e)
+    return Result(path, stdout.getvalue(), error,
+                  time.perf_counter() - start)
+
+
+def main(paths: typing.Sequence[str],
+         jobs: int = 1,
+         libraries: typing.Sequence[str] = (),
+         heap: typing.Optional[str] = None) -> int:
+    """Run the files, printing each one's output and a summary of timings.
+
+    Returns the exit status, which is non-zero if any file failed.
+    """
+    results = []
+    for result in run_files(paths, jobs, libraries, heap):
+        results.append(result)
+        status = 'ok' if result.error is None else 'failed'
+        print('==> %s: %s in %.3fs' % (result.path, status, result.seconds))
+        print(result.output, end='')
+        if result.error is not None:
+            print(result.error)
+
+    failed = sum(result.error is not None for result in results)
+    print('==> %d files, %d failed' % (len(results), failed))
+    width = max((len(result.path) for result in results), default=0)
+    for result in results:
+        print('%-*s %8.3fs' % (width, result.path, result.seconds))
+    print('%-*s %8.3fs' % (
+        width, 'total', sum(result.seconds for result in results)))
+    return 1 if failed else 0
+
+
+def __start_worker(libraries: bytes, heap: typing.Optional[str]):
+    """Load the libraries and heap every file the worker runs is run with.
+
+    The library forms are decoded, and the heap mapped into memory.
+    """
+    global __libraries, __heap
+    __libraries = list(serialize.Decoder(libraries))
+    __heap = None if heap is None else wisp.heap.Heap(heap)
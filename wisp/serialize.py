@@ -0,0 +1,313 @@
+"""A compact binary encoding for wisp values.
+
+Every value is written as a one byte tag followed by its payload. Integers
+are zigzag-encoded varints, strings and lists are prefixed by their length
+and symbols are written out in full only once per stream, after which they
+are referred to by their index in a shared symbol table. Lazy sequences
+are written element by element and terminated by an END tag, so they are
+never realized in memory all at once.
+
+A stream starts with the MAGIC header and holds any number of values, so
+large datasets can be written and read back one record at a time.
+"""
+
+import array
+import io
+import mmap
+import sys
+import typing
+
+import wisp.exceptions as exceptions
+import wisp.wtypes as wtypes
+
+MAGIC = b'WSP\x01'
+
+END = 0x00
+INTEGER = 0x01
+STRING = 0x02
+TRUE = 0x03
+FALSE = 0x04
+SYMBOL = 0x05
+SYMBOL_REF = 0x06
+LIST = 0x07
+VECTOR = 0x08
+STREAM = 0x09
+
+# Buffer this many bytes before writing them out to the underlying file.
+FLUSH_SIZE = 1 << 16
+
+Buffer = typing.Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class Encoder:
+    """Write wisp values to a binary file, sharing one symbol table."""
+
+    def __init__(self, fp: typing.BinaryIO):
+        self.fp = fp
+        self.buf = bytearray(MAGIC)
+        self.symbols: typing.Dict[str, int] = {}
+
+    def encode(self, expr: wtypes.Expression):
+        """Append the encoding of the expression to the stream."""
+        # A stack of iterators over the values left to write, each paired
+        # with whether an END tag must be written once it is exhausted.
+        stack = [(iter([expr]), False)]
+        while stack:
+            for val in stack[-1][0]:
+                if isinstance(val, wtypes.List):
+                    self.buf.append(LIST)
+                    self.__write_varint(len(val.items))
+                    stack.append((iter(val.items), False))
+                    break
+                elif isinstance(val, wtypes.LazySeq):
+                    self.buf.append(STREAM)
+                    stack.append((wtypes.iterate(val), True))
+                    break
+                else:
+                    self.__write_atom(val)
+            else:
+                _, terminate = stack.pop()
+                if terminate:
+                    self.buf.append(END)
+            if len(self.buf) >= FLUSH_SIZE:
+                self.flush()
+
+    def flush(self):
+        """Write out any buffered bytes."""
+        self.fp.write(self.buf)
+        self.buf = bytearray()
+
+    def __write_atom(self, val: wtypes.Expression):
+        """Append the encoding of a non-list value."""
+        if isinstance(val, wtypes.Bool):
+            self.buf.append(TRUE if val.val else FALSE)
+        elif isinstance(val, wtypes.Integer):
+            self.buf.append(INTEGER)
+            n = val.val
+            self.__write_varint(n << 1 if n >= 0 else (-n << 1) - 1)
+        elif isinstance(val, wtypes.String):
+            data = val.val.encode('utf-8')
+            self.buf.append(STRING)
+            self.__write_varint(len(data))
+            self.buf += data
+        elif isinstance(val, wtypes.Symbol):
+            if val.name in self.symbols:
+                self.buf.append(SYMBOL_REF)
+                self.__write_varint(self.symbols[val.name])
+            else:
+                self.symbols[val.name] = len(self.symbols)
+                data = val.name.encode('utf-8')
+                self.buf.append(SYMBOL)
+                self.__write_varint(len(data))
+                self.buf += data
+        elif isinstance(val, wtypes.Vector):
+            packed = array.array('q', val.data)
+            if sys.byteorder == 'big':
+                packed.byteswap()
+            self.buf.append(VECTOR)
+            self.__write_varint(len(packed))
+            self.buf += packed.tobytes()
+        else:
+            raise exceptions.WispException('can not serialize %s' % val)
+
+    def __write_varint(self, n: int):
+        """Append a non-negative integer, seven bits per byte."""
+        while n >= 0x80:
+            self.buf.append((n & 0x7f) | 0x80)
+            n >>= 7
+        self.buf.append(n)
+
+
+class Decoder:
+    """Read wisp values out of a buffer holding an encoded stream.
+
+    Strings are decoded straight out of the buffer, which may be an mmap,
+    without first copying their bytes. Unless copy is set, vectors are
+    decoded as views onto the buffer itself on little-endian machines, so
+    the buffer must then outlive them and not change.
+    """
+
+    def __init__(self, buf: Buffer, copy: bool = True):
+        self.view = memoryview(buf)
+        self.copy = copy or sys.byteorder == 'big'
+        if self.view[:len(MAGIC)] != MAGIC:
+            raise exceptions.WispException('not a wisp binary stream')
+        self.pos = len(MAGIC)
+        self.symbols: typing.List[wtypes.Symbol] = []
+
+    def __iter__(self) -> typing.Iterator[wtypes.Expression]:
+        """Decode each value remaining in the stream."""
+        while self.pos < len(self.view):
+            yield self.decode()
+
+    def decode(self) -> wtypes.Expression:
+        """Decode the next value in the stream."""
+        # A stack of the lists being decoded, each paired with the number
+        # of items it holds or None for END terminated streams.
+        stack: typing.List[
+            typing.Tuple[typing.List[wtypes.Expression], typing.Optional[int]]
+        ] = []
+        while True:
+            tag = self.__read_byte()
+            val: wtypes.Expression
+            if tag == LIST:
+                count = self.__read_varint()
+                if count:
+                    stack.append(([], count))
+                    continue
+                val = wtypes.List([])
+            elif tag == STREAM:
+                stack.append(([], None))
+                continue
+            elif tag == END:
+                if not stack or stack[-1][1] is not None:
+                    raise exceptions.WispException('unexpected END tag')
+                val = wtypes.List(stack.pop()[0])
+            else:
+                val = self.__read_atom(tag)
+
+            while stack:
+                items, expected = stack[-1]
+                items.append(val)
+                if len(items) != expected:
+                    break
+                stack.pop()
+                val = wtypes.List(items)
+            else:
+                return val
+
+    def __read_atom(self, tag: int) -> wtypes.Expression:
+        """Decode the payload of a non-list value with the given tag."""
+        if tag == TRUE:
+            return wtypes.Bool(True)
+        elif tag == FALSE:
+            return wtypes.Bool(False)
+        elif tag == INTEGER:
+            n = self.__read_varint()
+            return wtypes.Integer(-((n + 1) >> 1) if n & 1 else n >> 1)
+        elif tag == STRING:
+            return wtypes.String(self.__read_text())
+        elif tag == SYMBOL:
+            symbol = wtypes.Symbol(self.__read_text())
+            self.symbols.append(symbol)
+            return symbol
+        elif tag == SYMBOL_REF:
+            index = self.__read_varint()
+            try:
+                return self.symbols[index]
+            except IndexError:
+                raise exceptions.WispException('unknown symbol %d' % index)
+        elif tag == VECTOR:
+            count = self.__read_varint()
+            data = array.array('q')
+            payload = self.__read_slice(count * data.itemsize)
+            if not self.copy:
+                return wtypes.Vector(payload.cast('q'))
+            data.frombytes(payload)
+            if sys.byteorder == 'big':
+                data.byteswap()
+            return wtypes.Vector(data)
+        else:
+            raise exceptions.WispException('unknown tag %d' % tag)
+
+    def __read_byte(self) -> int:
+        """Read a single byte, raising an exception past the end."""
+        try:
+            byte = self.view[self.pos]
+        except IndexError:
+            raise exceptions.WispException('unexpected end of stream')
+        self.pos += 1
+        return byte
+
+    def __read_varint(self) -> int:
+        """Read a non-negative integer stored seven bits per byte."""
+        n = shift = 0
+        while True:
+            byte = self.__read_byte()
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    def __read_bytes(self) -> memoryview:
+        """Read a length-prefixed slice of the buffer."""
+        return self.__read_slice(self.__read_varint())
+
+    def __read_text(self) -> str:
+        """Read a length-prefixed UTF-8 string."""
+        try:
+            return str(self.__read_bytes(), 'utf-8')
+        except UnicodeDecodeError:
+            raise exceptions.WispException(
+                'invalid string in wisp binary stream'
+            )
+
+    def __read_slice(self, size: int) -> memoryview:
+        """Read the next size bytes as a view onto the buffer."""
+        end = self.pos + size
+        if end > len(self.view):
+            raise exceptions.WispException('unexpected end of stream')
+        data = self.view[self.pos:end]
+        self.pos = end
+        return data
+
+
+def dumps(expr: wtypes.Expression) -> bytes:
+    """Encode a single value as bytes."""
+    f = io.BytesIO()
+    dump(expr, f)
+    return f.getvalue()
+
+
+def loads(data: Buffer) -> wtypes.Expression:
+    """Decode a single value from an encoded buffer."""
+    decoder = Decoder(data)
+    val = decoder.decode()
+    if decoder.pos != len(decoder.view):
+        raise exceptions.WispException('trailing data after value')
+    return val
+
+
+def dump(expr: wtypes.Expression, fp: typing.BinaryIO):
+    """Write a single encoded value to a binary file."""
+    dump_stream([expr], fp)
+
+
+def load(fp: typing.BinaryIO) -> wtypes.Expression:
+    """Read a single encoded value from a binary file."""
+    return loads(fp.read())
+
+
+def dump_stream(values: typing.Iterable[wtypes.Expression],
+                fp: typing.BinaryIO):
+    """Write each value in turn to a binary file.
+
+    Values are written out as they are produced, so the iterable may be
+    a generator over a dataset too large to hold in memory.
+    """
+    encoder = Encoder(fp)
+    for val in values:
+        encoder.encode(val)
+    encoder.flush()
+
+
+def load_stream(fp: typing.BinaryIO) -> typing.Iterator[wtypes.Expression]:
+    """Lazily decode each value from a binary file.
+
+    Regular files are memory-mapped so values are decoded in place, one at
+    a time, rather than reading the whole file up front.
+    """
+    try:
+        mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # Not a regular, non-empty file, so there is nothing to map.
+        yield from Decoder(fp.read())
+        return
+
+    with mm:
+        decoder = Decoder(mm)
+        try:
+            yield from decoder
+        finally:
+            # Views onto the map must be released before it can close.
+            decoder.view.release()
@@ -0,0 +1,135 @@
+"""Read wisp source files holding many top-level forms.
+
+The text is first scanned for the boundaries of its top-level forms, which
+only needs to balance parentheses and skip over strings, so is far cheaper
+than parsing. The forms may then be parsed in batches across a pool of
+worker processes. Workers hand back each batch in the compact binary
+encoding of wisp.serialize, which is quicker to send between processes
+than pickled expressions, and the forms are decoded in their original
+order.
+"""
+
+import concurrent.futures
+import io
+import re
+import typing
+
+import wisp.exceptions as exceptions
+import wisp.files as files
+import wisp.parser as parser
+import wisp.serialize as serialize
+import wisp.wtypes as wtypes
+
+# Hand each worker this many batches, so they finish at around the same
+# time even when some forms take longer to parse than others.
+BATCHES_PER_WORKER = 4
+
+__NON_SPACE = re.compile(r'\S')
+__ATOM = re.compile(r'[^\s()"]+')
+__DELIMITER = re.compile(r'[()"]')
+
+# A form's text along with the line it starts on.
+Form = typing.Tuple[int, str]
+
+
+def split_forms(text: str) -> typing.List[Form]:
+    """Split source text into the text of each top-level form.
+
+    Each form is returned along with the line it starts on. Raises an
+    exception for unbalanced parentheses or unterminated strings.
+    """
+    forms: typing.List[Form] = []
+    line = 1
+    pos = 0
+    while True:
+        match = __NON_SPACE.search(text, pos)
+        if match is None:
+            return forms
+        start = match.start()
+        line += text.count('\n', pos, start)
+        char = text[start]
+        if char == '(':
+            end = __list_end(text, start, line)
+        elif char == '"':
+            end = __string_end(text, start + 1, line)
+        elif char == ')':
+            raise exceptions.WispException('line %d: unexpected )' % line)
+        else:
+            # Any string was matched above, so this always matches.
+            end = __ATOM.match(text, start).end()  # type: ignore
+        forms.append((line, text[start:end]))
+        line += text.count('\n', start, end)
+        pos = end
+
+
+def read_forms(text: str,
+               workers: int = 1) -> typing.List[wtypes.Expression]:
+    """Parse each top-level form in the text, returning them in order.
+
+    With more than one worker, forms are parsed in a pool of that many
+    processes.
+    """
+    forms = split_forms(text)
+    if workers <= 1 or len(forms) < 2:
+        return __parse_forms(forms)
+
+    size = -(-len(forms) // (workers * BATCHES_PER_WORKER))
+    batches = [forms[i:i + size] for i in range(0, len(forms), size)]
+    parsed: typing.List[wtypes.Expression] = []
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        for encoded in pool.map(__parse_batch, batches):
+            parsed.extend(serialize.Decoder(encoded))
+    return parsed
+
+
+def load(path: str, workers: int = 1) -> typing.List[wtypes.Expression]:
+    """Parse each top-level form in a source file, returning them in order."""
+    with files.open_file(path, 'r') as f:
+        try:
+            text = f.read()
+        except UnicodeDecodeError as e:
+            raise files.decode_error(path, e)
+    try:
+        return read_forms(text, workers)
+    except exceptions.WispException as e:
+        raise exceptions.WispException('%s:%s' % (path, e))
+
+
+def __list_end(text: str, start: int, line: int) -> int:
+    """Return the index just past the list starting at start."""
+    depth = 0
+    pos = start
+    while True:
+        match = __DELIMITER.search(text, pos)
+        if match is None:
+            raise exceptions.WispException('line %d: unterminated list' % line)
+        pos = match.end()
+        char = match.group()
+        if char == '"':
+            pos = __string_end(text, pos, line)
+        elif char == '(':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def __string_end(text: str, pos: int, line: int) -> int:
+    """Return the index just past the string whose contents start at pos."""
+    end = text.find('"', pos)
+    if end < 0:
+        raise exceptions.WispException('line %d: unterminated string' % line)
+    return end + 1
+
+
+def __parse_forms(forms: typing.List[Form]) -> typing.List[wtypes.Expression]:
+    """Parse the text of each form."""
+    return [parser.read(form, line) for line, form in forms]
+
+
+def __parse_batch(forms: typing.List[Form]) -> bytes:
+    """Parse a batch of forms in a worker, returning them encoded."""
+    f = io.BytesIO()
+    serialize.dump_stream(__parse_forms(forms), f)
+    return f.getvalue()
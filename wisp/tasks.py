@@ -0,0 +1,295 @@
+"""Run lightweight wisp tasks cooperatively, communicating over channels.
+
+Each task evaluates a function in its own environment forked from the one
+it was spawned in, so it has its own call stack while sharing globals.
+Tasks take turns: exactly one runs at a time, until it yields, sleeps,
+blocks on a channel or another task, or finishes, at which point the
+scheduler hands over to the next task ready to run. The code which first
+spawns a task runs as the main task.
+
+The evaluator recurses through python, so tasks can't be suspended with
+generators. Instead each task is given a python thread, and the scheduler
+passes a baton between them, so only the thread holding it ever runs.
+
+Coroutines may be awaited by builtins through wait, when wisp code is
+evaluated by eval_async. The wisp code then runs off the event loop's
+thread, and a task waiting on a coroutine blocks only itself while the
+loop runs the coroutine.
+"""
+
+import asyncio
+import collections
+import heapq
+import itertools
+import threading
+import time
+import typing
+
+import wisp.env
+import wisp.exceptions as exceptions
+import wisp.wtypes as wtypes
+
+UNSPECIFIED = wtypes.Symbol('unspecified return value')
+
+
+class Task(wtypes.Expression):
+    """A wisp function running as a task, or the main task.
+
+    The main task runs in whichever thread first spawned a task and has
+    no function of its own.
+    """
+
+    def __init__(self,
+                 function: typing.Optional[wtypes.Function] = None,
+                 args: typing.Sequence[wtypes.Expression] = (),
+                 env: typing.Optional[wisp.env.Environment] = None):
+        self.function = function
+        self.args = list(args)
+        self.env = env
+        # Set when it is this task's turn to run.
+        self.turn = threading.Event()
+        self.done = False
+        self.result: typing.Optional[wtypes.Expression] = None
+        self.error: typing.Optional[exceptions.WispException] = None
+        # An error to raise in the task when it is next resumed.
+        self.interrupt: typing.Optional[exceptions.WispException] = None
+        # The tasks waiting for this one to finish.
+        self.joiners: typing.List[Task] = []
+        # The value handed over by the channel this task was waiting on.
+        self.received: typing.Optional[wtypes.Expression] = None
+
+    def __repr__(self) -> str:
+        return 'Task(done=%s)' % self.done
+
+
+class Channel(wtypes.Expression):
+    """A channel for tasks to send each other values.
+
+    Sending blocks until a receiver takes the value, unless the channel
+    has room in its buffer. Receiving blocks until a value is sent.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self.capacity = capacity
+        self.buffer: typing.Deque[wtypes.Expression] = collections.deque()
+        self.senders: typing.Deque[
+            typing.Tuple[Task, wtypes.Expression]] = collections.deque()
+        self.receivers: typing.Deque[Task] = collections.deque()
+
+    def __repr__(self) -> str:
+        return 'Channel(capacity=%d)' % self.capacity
+
+
+class Scheduler:
+    """Pass the turn to run between tasks."""
+
+    def __init__(self) -> None:
+        self.main = Task()
+        self.current = self.main
+        self.ready: typing.Deque[Task] = collections.deque()
+        # A heap of sleeping tasks by the time they wake up.
+        self.timers: typing.List[typing.Tuple[float, int, Task]] = []
+        self.sequence = itertools.count()
+        # The number of tasks waiting on coroutines.
+        self.pending = 0
+        self.condition = threading.Condition()
+        self.loop: typing.Optional[asyncio.AbstractEventLoop] = None
+
+    def spawn(self,
+              function: wtypes.Function,
+              args: typing.Sequence[wtypes.Expression],
+              env: wisp.env.Environment) -> Task:
+        """Start a task calling the function, ready to run in its turn."""
+        task = Task(function, args, env.fork())
+        thread = threading.Thread(target=self.__run, args=(task,))
+        thread.daemon = True
+        thread.start()
+        self.wake(task)
+        return task
+
+    def wake(self, task: Task):
+        """Make a task ready to run, from any thread."""
+        with self.condition:
+            self.ready.append(task)
+            self.condition.notify()
+
+    def pause(self):
+        """Let every other ready task run before the current one resumes."""
+        self.wake(self.current)
+        self.block()
+
+    def sleep(self, seconds: float):
+        """Run other tasks until the given time has passed."""
+        with self.condition:
+            heapq.heappush(self.timers, (
+                time.monotonic() + seconds, next(self.sequence), self.current
+            ))
+        self.block()
+
+    def block(self):
+        """Run other tasks until the current task is woken.
+
+        Raises an exception if the current task was interrupted while it
+        was blocked, or if no other task could ever wake it.
+        """
+        task = self.current
+        following = self.__next()
+        if following is None:
+            raise exceptions.WispException('deadlock: every task is blocked')
+        elif following is not task:
+            task.turn.clear()
+            self.current = following
+            following.turn.set()
+            task.turn.wait()
+        if task.interrupt is not None:
+            error, task.interrupt = task.interrupt, None
+            raise error
+
+    def join(self, task: Task) -> wtypes.Expression:
+        """Wait for a task to finish, returning its result.
+
+        Raises the error the task failed with, if it failed.
+        """
+        if not task.done:
+            task.joiners.append(self.current)
+            try:
+                self.block()
+            finally:
+                if self.current in task.joiners:
+                    task.joiners.remove(self.current)
+        if task.error is not None:
+            raise task.error
+        # Tasks which finished without an error have a result.
+        return task.result  # type: ignore
+
+    def send(self, channel: Channel, val: wtypes.Expression):
+        """Send a value, waiting for a receiver if the buffer is full."""
+        if channel.receivers:
+            receiver = channel.receivers.popleft()
+            receiver.received = val
+            self.wake(receiver)
+        elif len(channel.buffer) < channel.capacity:
+            channel.buffer.append(val)
+        else:
+            sender = (self.current, val)
+            channel.senders.append(sender)
+            try:
+                self.block()
+            finally:
+                if sender in channel.senders:
+                    channel.senders.remove(sender)
+
+    def receive(self, channel: Channel) -> wtypes.Expression:
+        """Receive a value, waiting for a sender if there is none."""
+        if channel.buffer or channel.senders:
+            if channel.senders:
+                sender, val = channel.senders.popleft()
+                channel.buffer.append(val)
+                self.wake(sender)
+            return channel.buffer.popleft()
+
+        task = self.current
+        channel.receivers.append(task)
+        try:
+            self.block()
+        finally:
+            if task in channel.receivers:
+                channel.receivers.remove(task)
+        # Senders hand their value over before waking the receiver.
+        received = task.received
+        task.received = None
+        return received  # type: ignore
+
+    def wait(self, awaitable: typing.Awaitable) -> typing.Any:
+        """Run an awaitable on the event loop, blocking the current task."""
+        if self.loop is None:
+            raise exceptions.WispException(
+                'can not wait on a coroutine outside of eval_async'
+            )
+
+        async def run() -> typing.Any:
+            return await awaitable
+
+        future = asyncio.run_coroutine_threadsafe(run(), self.loop)
+        task = self.current
+        with self.condition:
+            self.pending += 1
+
+        def done(_):
+            # Both at once, so the task is never seen as neither pending
+            # nor ready.
+            with self.condition:
+                self.pending -= 1
+                self.ready.append(task)
+                self.condition.notify()
+
+        future.add_done_callback(done)
+        self.block()
+        return future.result()
+
+    def __next(self) -> typing.Optional[Task]:
+        """Return the next task to run, waiting for one to be woken.
+
+        Returns None if no task is ready and none ever will be.
+        """
+        with self.condition:
+            while True:
+                if self.ready:
+                    return self.ready.popleft()
+                now = time.monotonic()
+                if self.timers and self.timers[0][0] <= now:
+                    return heapq.heappop(self.timers)[2]
+                elif not self.timers and not self.pending:
+                    return None
+                self.condition.wait(
+                    self.timers[0][0] - now if self.timers else None
+                )
+
+    def __run(self, task: Task):
+        """Run a task in its own thread, once it is given its turn."""
+        task.turn.wait()
+        try:
+            # Functions are applied directly, as their arguments are values.
+            function, env = task.function, task.env
+            # Only the main task has no function or env, nor a thread.
+            task.result = function.apply(task.args, env)  # type: ignore
+        except exceptions.WispException as e:
+            task.error = e
+        except Exception as e:
+            task.error = exceptions.WispException('task failed: %r' % e)
+        finally:
+            task.done = True
+            for joiner in task.joiners:
+                self.wake(joiner)
+            self.__finish()
+
+    def __finish(self):
+        """Hand the turn over from a task which has finished."""
+        following = self.__next()
+        if following is None:
+            # Every task left is blocked, including the main task, since
+            # it can't have finished. Wake it with the bad news.
+            following = self.main
+            following.interrupt = exceptions.WispException(
+                'deadlock: every task is blocked'
+            )
+        self.current = following
+        following.turn.set()
+
+
+def scheduler(env: wisp.env.Environment) -> Scheduler:
+    """Return the scheduler of the env, creating it if need be."""
+    if env.scheduler is None:
+        env.scheduler = Scheduler()
+    return env.scheduler
+
+
+async def eval_async(expr: wtypes.Expression,
+                     env: wisp.env.Environment) -> wtypes.Expression:
+    """Evaluate an expression without blocking the running event loop.
+
+    Builtins may then wait on coroutines, which are run on the loop.
+    """
+    loop = asyncio.get_running_loop()
+    scheduler(env).loop = loop
+    return await loop.run_in_executor(None, expr.eval, env)
@@ -0,0 +1,189 @@
+"""Keep a source file evaluated in a live environment as it is edited.
+
+Top-level forms are told apart by a hash of their text. When the file
+changes, only forms which are new or edited are parsed and evaluated,
+along with the forms depending on them: those referring to a name which
+a changed form defines, and in turn those depending on them. Forms which
+were removed have the names they defined unbound, unless some other form
+still defines them, and their dependents are evaluated again too.
+
+Forms which fail are evaluated again on every change, until they succeed.
+"""
+
+from dataclasses import dataclass
+import hashlib
+import os
+import sys
+import time
+import typing
+
+import wisp.analysis as analysis
+import wisp.env
+import wisp.exceptions as exceptions
+import wisp.files as files
+import wisp.parser as parser
+import wisp.prelude as prelude
+import wisp.printer as printer
+import wisp.sources as sources
+import wisp.wtypes as wtypes
+
+# Check the file for changes this often, in seconds.
+POLL_INTERVAL = 0.2
+
+# Print at most this many elements of each sequence a form results in.
+PRINT_LIMIT = 100
+
+
+@dataclass
+class Evaluation:
+    """The outcome of evaluating a top-level form.
+
+    Error is the message of the exception the form failed with, if any, in
+    which case there is no result.
+    """
+    line: int
+    result: typing.Optional[wtypes.Expression]
+    error: typing.Optional[str] = None
+
+
+@dataclass
+class _Form:
+    """A parsed top-level form, with the names it defines and refers to."""
+    expr: wtypes.Expression
+    defines: typing.Set[str]
+    symbols: typing.Set[str]
+
+
+class Watcher:
+    """Evaluate the forms of successive versions of a source's text."""
+
+    def __init__(self, env: wisp.env.Environment):
+        self.env = env
+        # The parsed forms of the current text, by the hashes of their text.
+        self.forms: typing.Dict[str, _Form] = {}
+        # The hashes of the forms evaluated without error.
+        self.evaluated: typing.Set[str] = set()
+
+    def update(self, text: str) -> typing.List[Evaluation]:
+        """Evaluate what changed in a new version of the text.
+
+        Returns how each form evaluated went, in the order they appear in
+        the text. Raises an exception if the text can't be split into forms.
+        """
+        outcomes = []
+        entries = []
+        forms: typing.Dict[str, _Form] = {}
+        for line, source in sources.split_forms(text):
+            digest = hashlib.sha1(source.encode()).hexdigest()
+            form = forms.get(digest) or self.forms.get(digest)
+            if form is None:
+                try:
+                    expr = parser.read(source, line)
+                except exceptions.WispException as e:
+                    outcomes.append(Evaluation(line, None, str(e)))
+                    continue
+                form = _Form(expr, analysis.defines(expr),
+                             analysis.symbols(expr))
+            forms[digest] = form
+            entries.append((line, digest, form))
+
+        removed = [self.forms[digest] for digest in self.evaluated
+                   if digest not in forms]
+        changed = set().union(*(form.defines for form in removed))
+        dirty = self.__dependents(entries, changed)
+        still_defined = set().union(*(form.defines for form in forms.values()))
+        for name in sorted(changed - still_defined):
+            self.env.remove_binding(wtypes.Symbol(name))
+        self.forms = forms
+        self.evaluated &= set(forms)
+
+        for line, digest, form in entries:
+            if digest not in dirty:
+                continue
+            try:
+                outcomes.append(Evaluation(line, form.expr.eval(self.env)))
+                self.evaluated.add(digest)
+            except exceptions.WispException as e:
+                outcomes.append(Evaluation(line, None, str(e)))
+                self.evaluated.discard(digest)
+            except Exception as e:
+                # One bad edit fails its own form, not the whole watch.
+                outcomes.append(Evaluation(
+                    line, None, '%s: %s' % (type(e).__name__, e)))
+                self.evaluated.discard(digest)
+        outcomes.sort(key=lambda outcome: outcome.line)
+        return outcomes
+
+    def __dependents(self,
+                     entries: typing.List[typing.Tuple[int, str, _Form]],
+                     changed: typing.Set[str]) -> typing.Set[str]:
+        """Return the hashes of the forms which need evaluating.
+
+        These are the forms not yet evaluated, along with every form which
+        refers to a changed name or a name such a form defines.
+        """
+        dirty = {digest for _, digest, _ in entries
+                 if digest not in self.evaluated}
+        pending = set(changed)
+        for _, digest, form in entries:
+            if digest in dirty:
+                pending |= form.defines
+        referring: typing.Dict[str, typing.List[typing.Tuple[str, _Form]]]
+        referring = {}
+        for _, digest, form in entries:
+            for name in form.symbols:
+                referring.setdefault(name, []).append((digest, form))
+
+        seen = set()
+        while pending:
+            name = pending.pop()
+            seen.add(name)
+            for digest, form in referring.get(name, []):
+                if digest not in dirty:
+                    dirty.add(digest)
+                    pending |= form.defines - seen
+        return dirty
+
+
+def main(path: str):
+    """Evaluate a file, then evaluate what changes each time it is saved."""
+    watcher = Watcher(prelude.env())
+    version = None
+    while True:
+        try:
+            stat = os.stat(path)
+            current = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            current = None
+        if current is not None and current != version:
+            version = current
+            __report(path, watcher)
+        try:
+            time.sleep(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            print('bye!')
+            return
+
+
+def __report(path: str, watcher: Watcher):
+    """Evaluate the latest version of the file, printing each outcome."""
+    start = time.perf_counter()
+    try:
+        with files.open_file(path, 'r') as f:
+            text = f.read()
+        outcomes = watcher.update(text)
+    except (exceptions.WispException, UnicodeDecodeError) as e:
+        print('%s: %s' % (path, e))
+        return
+    for outcome in outcomes:
+        if outcome.result is None:
+            shown = outcome.error
+        else:
+            try:
+                shown = printer.dumps(outcome.result, PRINT_LIMIT)
+            except exceptions.WispException:
+                shown = repr(outcome.result)
+        print('%s:line %d: %s' % (path, outcome.line, shown))
+    print('==> evaluated %d of %d forms in %.3fs' % (
+        len(outcomes), len(watcher.forms), time.perf_counter() - start))
+    sys.stdout.flush()
@@ -4,7 +4,9 @@ import typing
 if typing.TYPE_CHECKING:
     import wisp.env
 
-from dataclasses import dataclass
+import array
+from dataclasses import dataclass, field
+import itertools
 import operator
 import typing
 
@@ -84,18 +86,41 @@ class Function(Expression):
     """A wisp function.
 
     Implemented as a python function which accepts a list of Expressions
-    as arguments and returns an Expression.
+    as arguments and returns an Expression. The number of arguments the
+    function requires, if fixed, is taken from the arity the python
+    function was declared with.
     """
     func: Callable
+    arity: typing.Optional[int] = None
+
+    def __post_init__(self):
+        if self.arity is None:
+            self.arity = getattr(self.func, 'arity', None)
 
     def call(self,
              args: typing.List[Expression],
-             env: wisp.env.Environment) -> Expression:
-        """Evaluate the given args and call the function with them."""
+             env: wisp.env.Environment,
+             checked: bool = False) -> Expression:
+        """Evaluate the given args and call the function with them.
+
+        The number of args is checked first, unless the call was already
+        checked against this function when it was analyzed.
+        """
+        if not checked and self.arity is not None and len(args) != self.arity:
+            raise exceptions.arity_error(len(args), self.arity)
         args = [arg.eval(env) for arg in args]
         # mypy gets confused and thinks this is a method call.
         return self.func(args, env)  # type: ignore
 
+    def apply(self,
+              args: typing.List[Expression],
+              env: wisp.env.Environment) -> Expression:
+        """Call the function with already evaluated args."""
+        if self.arity is not None and len(args) != self.arity:
+            raise exceptions.arity_error(len(args), self.arity)
+        # mypy gets confused and thinks this is a method call.
+        return self.func(args, env)  # type: ignore
+
 
 @dataclass
 class SpecialForm(Expression):
@@ -105,38 +130,155 @@ class SpecialForm(Expression):
     evaluated before the function is called.
     """
     func: Callable
+    arity: typing.Optional[int] = None
+
+    def __post_init__(self):
+        if self.arity is None:
+            self.arity = getattr(self.func, 'arity', None)
 
     def call(self,
              args: typing.List[Expression],
-             env: wisp.env.Environment) -> Expression:
+             env: wisp.env.Environment,
+             checked: bool = False) -> Expression:
         """Call the function with the un-evaluated arguments list."""
+        if not checked and self.arity is not None and len(args) != self.arity:
+            raise exceptions.arity_error(len(args), self.arity)
+        # mypy gets confused and thinks this is a method call.
+        return self.func(args, env)  # type: ignore
+
+
+@dataclass
+class Macro(Expression):
+    """A wisp macro.
+
+    Called with the un-evaluated arguments list, returning an expression
+    to be evaluated in place of the macro call.
+    """
+    func: Callable
+    arity: typing.Optional[int] = None
+
+    def __post_init__(self):
+        if self.arity is None:
+            self.arity = getattr(self.func, 'arity', None)
+
+    def expand(self,
+               args: typing.List[Expression],
+               env: wisp.env.Environment) -> Expression:
+        """Return the expansion of a call with the given arguments."""
+        if self.arity is not None and len(args) != self.arity:
+            raise exceptions.arity_error(len(args), self.arity)
         # mypy gets confused and thinks this is a method call.
         return self.func(args, env)  # type: ignore
 
 
 @dataclass
 class List(Expression):
-    """A wisp list of expressions."""
+    """A wisp list of expressions.
+
+    Lists which call macros cache their expansion alongside the macro which
+    produced it, so each call site is only expanded once. Special forms
+    may also cache what they work out about the lists they are passed.
+
+    Lists are never mutated once built, so their structural hash may be
+    cached too, letting comparisons of lists with different hashes fail
+    without walking them. Calls whose argument count was checked when they
+    were analyzed record the function they were checked against, and skip
+    the check while they still call it.
+    """
     items: typing.List[Expression]
+    expansion: typing.Optional[typing.Tuple[Macro, Expression]] = field(
+        default=None, repr=False, compare=False
+    )
+    cache: typing.Optional[typing.Dict[str, typing.Any]] = field(
+        default=None, repr=False, compare=False
+    )
+    # The structural hash of the list, once something has worked it out.
+    digest: typing.Optional[int] = field(
+        default=None, repr=False, compare=False
+    )
+    checked: typing.Optional[Expression] = field(
+        default=None, repr=False, compare=False
+    )
 
     def eval(self, env: wisp.env.Environment) -> Expression:
         """Evaluate a list as a postfix function call.
 
         Treat the last item in the list as a symbol pointing to a function.
         Treat other members of the list as arguments to the function.
-        An empty list evaluates to an empty list.
+        If the function is a macro, evaluate its expansion instead.
+        An empty list evaluates to an empty list. Each call counts as a
+        step against the budget of the environment, if it has one.
         """
         if not self.items:
             return self
 
         fn = self.items[-1].eval(env)
-        if not isinstance(fn, (Function, SpecialForm)):
+        if isinstance(fn, Macro):
+            if self.expansion is None or self.expansion[0] is not fn:
+                self.expansion = fn, fn.expand(self.args(), env)
+            return self.expansion[1].eval(env)
+        elif not isinstance(fn, (Function, SpecialForm)):
             raise exceptions.WispException(
                 '%s is not applicable' % self.items[-1]
             )
 
-        args = list(reversed(self.items[:-1]))
-        return fn.call(args, env)
+        budget = env.budget
+        if budget is not None:
+            budget.countdown -= 1
+            if budget.countdown < 0:
+                budget.tick()
+        return fn.call(self.args(), env, fn is self.checked)
+
+    def args(self) -> typing.List[Expression]:
+        """Return the arguments of the list as a call, in calling order."""
+        return list(reversed(self.items[:-1]))
+
+    def __eq__(self, other: object) -> bool:
+        """Compare element-wise, without recursing into sublists."""
+        if not isinstance(other, List):
+            return NotImplemented
+        stack = [(self, other)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
+                continue
+            elif a.digest is not None and b.digest is not None and (
+                    a.digest != b.digest):
+                return False
+            elif len(a.items) != len(b.items):
+                return False
+            for x, y in zip(a.items, b.items):
+                if type(x) is List and type(y) is List:
+                    stack.append((x, y))
+                elif x != y:
+                    return False
+        return True
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        """Build the usual dataclass repr without recursing into sublists.
+
+        Nested lists are walked with an explicit stack, so lists nested
+        deeper than the recursion limit may still be printed.
+        """
+        parts = []
+        # The text and expressions left to print, the next one last.
+        stack: typing.List[typing.Union[str, Expression]] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif type(item) is List:
+                parts.append('List(items=[')
+                stack.append('])')
+                for i in range(len(item.items) - 1, -1, -1):
+                    stack.append(item.items[i])
+                    if i:
+                        stack.append(', ')
+            else:
+                parts.append(repr(item))
+        return ''.join(parts)
 
 
 @dataclass
@@ -147,3 +289,148 @@ class Symbol(Expression):
     def eval(self, env: wisp.env.Environment) -> Expression:
         """Evaluate a symbol by looking up its value in the environment."""
         return env[self]
+
+
+@dataclass(eq=False)
+class Promise(Expression):
+    """A delayed wisp expression, evaluated at most once when forced.
+
+    The expression is evaluated in the local frame the promise was created
+    in. The result is memoized so subsequent forces return the same value.
+    """
+    expr: Expression
+    frame: typing.Dict[str, Expression] = field(repr=False)
+    value: typing.Optional[Expression] = field(default=None, repr=False)
+
+    def force(self, env: wisp.env.Environment) -> Expression:
+        """Evaluate the delayed expression if we haven't already."""
+        if self.value is None:
+            env.add_frame(self.frame)
+            try:
+                self.value = self.expr.eval(env)
+            finally:
+                env.pop_frame()
+            # The frame is no longer needed, let it be collected.
+            self.frame = {}
+        return self.value
+
+
+Cell = typing.Optional[typing.Tuple[Expression, Expression]]
+
+
+class LazySeq(Expression):
+    """A wisp sequence whose elements are realized on demand.
+
+    A lazy sequence wraps a thunk which returns either None for an empty
+    sequence or a pair of the first element and the rest of the sequence.
+    The thunk is called at most once and its result memoized, so walking a
+    sequence which nothing else holds on to runs in constant memory.
+    """
+    def __init__(self, thunk: typing.Callable[[], Cell]):
+        self.thunk: typing.Optional[typing.Callable[[], Cell]] = thunk
+        self.cell: Cell = None
+
+    @classmethod
+    def from_iterable(cls, iterable: typing.Iterable[Expression]) -> LazySeq:
+        """Build a lazy sequence realizing elements from the iterable."""
+        it = iter(iterable)
+
+        def step() -> Cell:
+            for val in it:
+                return val, cls(step)
+            return None
+
+        return cls(step)
+
+    def realize(self) -> Cell:
+        """Return the first element and rest, calling the thunk if needed."""
+        if self.thunk is not None:
+            self.cell = self.thunk()
+            self.thunk = None
+        return self.cell
+
+    def __eq__(self, other: object) -> bool:
+        """Compare element-wise against another list or lazy sequence."""
+        if not isinstance(other, SEQUENCE_TYPES):
+            return NotImplemented
+        return sequences_equal(self, other)
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return 'LazySeq(...)'
+
+
+@dataclass(eq=False)
+class Vector(Expression):
+    """A compact wisp sequence of integers backed by a python array.
+
+    Elements are boxed into Integers only as they are accessed. The data
+    may instead be a read-only memoryview of 64-bit integers, such as one
+    onto a shared heap.
+    """
+    data: typing.Union[array.array, memoryview]
+
+    def __eq__(self, other: object) -> bool:
+        """Compare element-wise against any other wisp sequence."""
+        if isinstance(other, Vector):
+            return self.data == other.data
+        elif isinstance(other, (List, LazySeq)):
+            return sequences_equal(self, other)
+        else:
+            return NotImplemented
+
+    __hash__ = None  # type: ignore
+
+
+SEQUENCE_TYPES = (List, LazySeq, Vector)
+
+
+def uncons(seq: Expression) -> Cell:
+    """Split a list or lazy sequence into its first element and the rest.
+
+    Returns None for an empty sequence. Raises an exception if seq is not
+    a sequence.
+    """
+    if isinstance(seq, LazySeq):
+        return seq.realize()
+    elif isinstance(seq, List):
+        if seq.items:
+            return seq.items[0], List(seq.items[1:])
+        else:
+            return None
+    elif isinstance(seq, Vector):
+        if seq.data:
+            return Integer(seq.data[0]), Vector(seq.data[1:])
+        else:
+            return None
+    else:
+        raise exceptions.type_error(List, seq)
+
+
+def iterate(seq: Expression) -> typing.Iterator[Expression]:
+    """Iterate over the elements of a list or lazy sequence.
+
+    Lazy sequences are realized as they are iterated over and cells already
+    visited are not held on to.
+    """
+    while isinstance(seq, LazySeq):
+        cell = seq.realize()
+        if cell is None:
+            return
+        first, seq = cell
+        yield first
+    if isinstance(seq, List):
+        yield from seq.items
+    elif isinstance(seq, Vector):
+        yield from map(Integer, seq.data)
+    else:
+        raise exceptions.type_error(List, seq)
+
+
+def sequences_equal(a: Expression, b: Expression) -> bool:
+    """Compare two sequences element-wise, realizing lazy ones as needed."""
+    missing = object()
+    return all(x == y for x, y in itertools.zip_longest(
+        iterate(a), iterate(b), fillvalue=missing
+    ))